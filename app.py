@@ -6,7 +6,9 @@ Versão: 2.0 - Com visualização individual de móveis
 
 import streamlit as st
 import pandas as pd
+import io
 import json
+import tempfile
 from datetime import datetime
 from typing import Dict, List
 import plotly.express as px
@@ -15,7 +17,11 @@ import plotly.graph_objects as go
 # Importar módulos do sistema
 from auth_manager import AuthManager
 from file_analyzer import FileAnalyzer
-from orcamento_engine import OrcamentoEngine
+from orcamento_engine import OrcamentoEngine, OrcamentoIncremental
+from catalogo_precos import CatalogoPrecos
+from relatorio_pdf import ExportacaoPDF
+from exportacao import PERFIS as PERFIS_EXPORTACAO
+from geometria import RepositorioGeometria
 from config import Config
 
 # Configuração da página
@@ -114,23 +120,65 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def carregar_servicos():
+    """Serviços compartilhados por todas as sessões do processo, criados uma única vez
+
+    O schema é migrado na primeira chamada; as contas demo são criadas pelo
+    comando de setup (python auth_manager.py usuarios.db --demo), não pelo app.
+    """
+    return (
+        AuthManager(Config.DATABASE_PATH, Config.SECURITY_CONFIG['session_timeout_hours']),
+        FileAnalyzer(),
+        OrcamentoEngine(CatalogoPrecos(Config.CATALOGO_PRECOS_PATH))
+    )
+
 def main():
     """Função principal da aplicação"""
     
-    # Inicializar componentes
-    auth_manager = AuthManager()
-    file_analyzer = FileAnalyzer()
-    orcamento_engine = OrcamentoEngine()
+    # Componentes do processo (cacheados entre reruns e sessões)
+    auth_manager, file_analyzer, orcamento_engine = carregar_servicos()
     
     # Verificar autenticação
     if 'usuario_logado' not in st.session_state:
         st.session_state.usuario_logado = False
     
-    if not st.session_state.usuario_logado:
+    usuario = verificar_sessao(auth_manager)
+    if usuario is None:
         mostrar_tela_login(auth_manager)
     else:
-        usuario = st.session_state.usuario_atual
-        mostrar_aplicacao_principal(file_analyzer, orcamento_engine, usuario)
+        mostrar_aplicacao_principal(auth_manager, file_analyzer, orcamento_engine, usuario)
+
+def verificar_sessao(auth_manager: AuthManager):
+    """Usuário da sessão atual, validada pelo token a cada rerun (em cache, sem ir ao banco)
+    
+    O token fica só no estado da sessão do Streamlit. A URL (?sessao=...) leva
+    um ticket de uso único: recarregar a página ou reconectar a outro processo
+    do app troca o ticket por um token novo e põe um ticket novo na URL.
+    """
+    token = st.session_state.get('token_sessao')
+    if not token and st.query_params.get('sessao'):
+        trocado = auth_manager.trocar_ticket(st.query_params['sessao'])
+        if trocado:
+            token, st.query_params['sessao'] = trocado
+    if not token:
+        st.query_params.pop('sessao', None)
+        return None
+    
+    usuario = auth_manager.validar_sessao(token)
+    if usuario is None:
+        # Sessão expirada ou encerrada (logout em outra aba ou processo)
+        st.session_state.usuario_logado = False
+        st.session_state.usuario_atual = None
+        st.session_state.token_sessao = None
+        st.query_params.pop('sessao', None)
+        return None
+    
+    # Sempre o usuário recém-validado: plano e uso do mês não ficam presos ao do login
+    st.session_state.usuario_logado = True
+    st.session_state.usuario_atual = usuario
+    st.session_state.token_sessao = token
+    return usuario
 
 def mostrar_tela_login(auth_manager: AuthManager):
     """Tela de login e registro"""
@@ -219,9 +267,14 @@ def mostrar_tela_login(auth_manager: AuthManager):
                 
                 if submitted:
                     usuario = auth_manager.fazer_login(email, senha)
-                    if usuario:
+                    token = auth_manager.criar_sessao(usuario['id']) if usuario else None
+                    if token:
                         st.session_state.usuario_logado = True
                         st.session_state.usuario_atual = usuario
+                        st.session_state.token_sessao = token
+                        ticket = auth_manager.criar_ticket(token)
+                        if ticket:
+                            st.query_params['sessao'] = ticket
                         st.success("Login realizado com sucesso!")
                         st.rerun()
                     else:
@@ -256,7 +309,8 @@ def mostrar_tela_login(auth_manager: AuthManager):
     with col3:
         st.info("**Marceneiro**\n\n📧 marceneiro@teste.com\n🔒 marc123")
 
-def mostrar_aplicacao_principal(file_analyzer: FileAnalyzer, orcamento_engine: OrcamentoEngine, usuario: Dict):
+def mostrar_aplicacao_principal(auth_manager: AuthManager, file_analyzer: FileAnalyzer,
+                                orcamento_engine: OrcamentoEngine, usuario: Dict):
     """Interface principal da aplicação"""
     
     # Sidebar com informações do usuário
@@ -265,15 +319,8 @@ def mostrar_aplicacao_principal(file_analyzer: FileAnalyzer, orcamento_engine: O
         st.markdown(f"**Plano:** {usuario['plano'].title()}")
         st.markdown(f"**Projetos este mês:** {usuario['projetos_mes']}")
         
-        # Limites por plano
-        limites = {
-            'gratuito': 3,
-            'basico': 50,
-            'profissional': 200,
-            'empresarial': 999999
-        }
-        
-        limite = limites.get(usuario['plano'], 3)
+        # Limite do plano; o uso é atualizado a cada projeto salvo
+        limite = auth_manager.obter_limites_plano(usuario['plano'])['projetos_mes']
         if limite < 999999:
             progresso = usuario['projetos_mes'] / limite
             st.progress(progresso)
@@ -284,17 +331,16 @@ def mostrar_aplicacao_principal(file_analyzer: FileAnalyzer, orcamento_engine: O
         # Configurações de orçamento
         st.markdown("### ⚙️ Configurações")
         
+        # Materiais e preços vêm do catálogo em uso
+        orcamento_engine.atualizar_catalogo()
+        precos_materiais = orcamento_engine.precos_materiais
         material = st.selectbox(
             "Material",
-            ["mdf_15mm", "mdf_18mm", "compensado_15mm", "compensado_18mm", "melamina_15mm", "melamina_18mm"],
-            format_func=lambda x: {
-                "mdf_15mm": "MDF 15mm - R$ 69,15/m²",
-                "mdf_18mm": "MDF 18mm - R$ 79,50/m²",
-                "compensado_15mm": "Compensado 15mm - R$ 64,00/m²",
-                "compensado_18mm": "Compensado 18mm - R$ 72,80/m²",
-                "melamina_15mm": "Melamina 15mm - R$ 89,50/m²",
-                "melamina_18mm": "Melamina 18mm - R$ 98,20/m²"
-            }[x]
+            list(precos_materiais),
+            format_func=lambda x: (
+                f"{Config.get_material_info(x).get('nome', x)} - "
+                f"R$ {f'{precos_materiais[x]:.2f}'.replace('.', ',')}/m²"
+            )
         )
         
         qualidade_acessorios = st.selectbox(
@@ -314,21 +360,51 @@ def mostrar_aplicacao_principal(file_analyzer: FileAnalyzer, orcamento_engine: O
             }[x]
         )
         
+        unidade_modelo = st.selectbox(
+            "Unidade do Modelo 3D",
+            ["auto", "mm", "cm", "m", "pol"],
+            format_func=lambda x: {
+                "auto": "Detectar automaticamente",
+                "mm": "Milímetros (mm)",
+                "cm": "Centímetros (cm)",
+                "m": "Metros (m)",
+                "pol": "Polegadas (pol)"
+            }[x]
+        )
+        
         margem_lucro = st.slider("Margem de Lucro (%)", 10, 50, 30)
         
+        usar_plano_corte = st.checkbox(
+            "Material por plano de corte",
+            value=True,
+            help="Calcula o consumo real de chapas em vez do desperdício fixo por material"
+        )
+        
+        modo_risco = st.checkbox(
+            "Simulação de risco",
+            value=False,
+            help="Simula variações de desperdício, preços e mão de obra e mostra a faixa provável do valor final"
+        )
+        
         st.markdown("---")
-        st.markdown("### 📊 Preços Léo Madeiras")
-        st.caption("Atualizado em 30/06/2025")
+        precos = orcamento_engine.obter_precos_atuais()
+        st.markdown(f"### 📊 Preços {precos['fonte']}")
+        st.caption(f"Atualizado em {precos['data_atualizacao']} · catálogo {precos['versao']}")
         st.markdown("[🔗 Visitar site](https://www.leomadeiras.com.br/)")
         
         if st.button("🚪 Logout", use_container_width=True):
+            auth_manager.encerrar_sessao(st.session_state.token_sessao)
             st.session_state.usuario_logado = False
             st.session_state.usuario_atual = None
+            st.session_state.token_sessao = None
+            st.query_params.pop('sessao', None)
             st.rerun()
     
     # Área principal
     st.markdown(f"# 🏠 Orca Interiores - {usuario['nome']}")
     
+    mostrar_meus_projetos(auth_manager, usuario)
+    
     # Upload de arquivo
     st.markdown("### 📁 Upload do Projeto 3D")
     
@@ -339,50 +415,166 @@ def mostrar_aplicacao_principal(file_analyzer: FileAnalyzer, orcamento_engine: O
     )
     
     if uploaded_file is not None:
-        # Verificar limite de projetos
-        limite = limites.get(usuario['plano'], 3)
-        if usuario['projetos_mes'] >= limite and limite < 999999:
-            st.error(f"Limite de {limite} projetos/mês atingido! Faça upgrade do seu plano.")
-            return
-        
-        # Processar arquivo
-        with st.spinner("Analisando arquivo 3D..."):
-            analise = file_analyzer.analisar_arquivo_3d(uploaded_file)
+        # Sem pré-checagem da cota: quem decide é salvar_projeto_com_cota, que zera
+        # o contador na virada do mês e lê o plano atual na mesma transação
+        
+        # Reanalisar só quando o arquivo ou a unidade mudam; nos demais reruns
+        # (ex.: mover o slider de margem) a análise em cache é reaproveitada
+        unidade_escolhida = None if unidade_modelo == "auto" else unidade_modelo
+        chave_analise = (
+            getattr(uploaded_file, 'file_id', None) or uploaded_file.name,
+            uploaded_file.size,
+            unidade_escolhida
+        )
+        
+        if st.session_state.get('analise_chave') != chave_analise:
+            # Malhas ficam no repositório de geometria; análise e orçamento guardam só os ids
+            st.session_state.geometria = RepositorioGeometria()
+            with st.spinner("Analisando arquivo 3D..."):
+                st.session_state.analise = file_analyzer.analisar_arquivo_3d(
+                    uploaded_file,
+                    unidade=unidade_escolhida,
+                    geometria=st.session_state.geometria
+                )
+            st.session_state.analise_chave = chave_analise
+            st.session_state.orcamento_incremental = OrcamentoIncremental(orcamento_engine)
+        
+        analise = st.session_state.analise
+        
+        if analise:
+            st.success("Arquivo analisado com sucesso!")
             
-            if analise:
-                st.session_state.analise = analise
-                st.success("Arquivo analisado com sucesso!")
+            unidade = analise.get('unidade')
+            if unidade:
+                origem = "detectada" if unidade['inferida'] else "informada"
+                st.caption(f"📏 Unidade do modelo {origem}: {unidade['unidade']}")
+            
+            # Configurações do orçamento
+            configuracoes = {
+                'material': material,
+                'qualidade_acessorios': qualidade_acessorios,
+                'complexidade': complexidade,
+                'margem_lucro': margem_lucro,
+                'usar_plano_corte': usar_plano_corte,
+                'modo_risco': modo_risco,
+                'centavos': True
+            }
+            
+            # Calcular orçamento (só as etapas afetadas pelas configurações alteradas)
+            orcamento_incremental = st.session_state.orcamento_incremental
+            orcamento = orcamento_incremental.calcular(analise, configuracoes)
+            
+            if orcamento:
+                st.session_state.orcamento = orcamento
                 
-                # Configurações do orçamento
-                configuracoes = {
-                    'material': material,
-                    'qualidade_acessorios': qualidade_acessorios,
-                    'complexidade': complexidade,
-                    'margem_lucro': margem_lucro
-                }
+                with st.expander("⏱️ Tempos de cálculo"):
+                    st.dataframe(
+                        pd.DataFrame.from_dict(orcamento_incremental.obter_tempos(), orient='index'),
+                        use_container_width=True
+                    )
                 
-                # Calcular orçamento
-                orcamento = orcamento_engine.calcular_orcamento_completo(analise, configuracoes)
+                salvar_projeto(auth_manager, usuario, uploaded_file.name, analise, orcamento,
+                               (chave_analise, json.dumps(configuracoes, sort_keys=True)))
                 
-                if orcamento:
-                    st.session_state.orcamento = orcamento
-                    mostrar_resultados(analise, orcamento, file_analyzer, orcamento_engine)
-                else:
-                    st.error("Erro ao calcular orçamento.")
+                mostrar_resultados(analise, orcamento, file_analyzer, orcamento_engine)
             else:
-                st.error("Erro ao analisar arquivo. Verifique o formato.")
+                st.error("Erro ao calcular orçamento.")
+        else:
+            st.error("Erro ao analisar arquivo. Verifique o formato.")
+
+def salvar_projeto(auth_manager: AuthManager, usuario: Dict, nome_arquivo: str, analise: Dict,
+                   orcamento: Dict, chave: tuple):
+    """Botão de salvar: reserva a cota e grava o projeto numa única operação"""
+    if st.session_state.get('projeto_salvo_chave') == chave:
+        st.caption("✅ Projeto salvo em Meus Projetos")
+        return
+    
+    if st.button("💾 Salvar Projeto"):
+        resultado = auth_manager.salvar_projeto_com_cota(
+            usuario['id'], nome_arquivo, analise, orcamento, st.session_state.get('geometria')
+        )
+        # Uso do mês devolvido pela própria gravação: a sidebar não consulta o banco de novo
+        if resultado['projetos_mes'] is not None:
+            usuario['projetos_mes'] = resultado['projetos_mes']
+        if resultado['salvo']:
+            st.session_state.projeto_salvo_chave = chave
+            st.session_state.projetos_cursores = [None]
+        else:
+            st.session_state.projeto_erro = resultado['erro'] or "Não foi possível salvar o projeto."
+        st.rerun()
+    
+    if st.session_state.get('projeto_erro'):
+        st.error(st.session_state.pop('projeto_erro'))
+
+def mostrar_meus_projetos(auth_manager: AuthManager, usuario: Dict, por_pagina: int = 20):
+    """Projetos salvos do usuário, página a página (cursores das páginas ficam na sessão)"""
+    with st.expander("📂 Meus Projetos"):
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            busca = st.text_input("Buscar pelo nome do arquivo", key="projetos_busca")
+        with col2:
+            formato = st.selectbox("Formato", ["Todos"] + [ext.lstrip('.').upper() for ext in Config.ALLOWED_EXTENSIONS],
+                                   key="projetos_formato")
+        
+        # Filtros novos voltam para a primeira página
+        filtros = (busca, formato)
+        if st.session_state.get('projetos_filtros') != filtros:
+            st.session_state.projetos_filtros = filtros
+            st.session_state.projetos_cursores = [None]
+        cursores = st.session_state.projetos_cursores
+        
+        pagina = auth_manager.listar_projetos_pagina(
+            usuario['id'],
+            limite=por_pagina,
+            cursor=cursores[-1],
+            formato=None if formato == "Todos" else formato,
+            busca=busca or None
+        )
+        
+        if not pagina['projetos']:
+            st.info("Nenhum projeto salvo encontrado.")
+        else:
+            st.dataframe(
+                pd.DataFrame([
+                    {
+                        'Arquivo': projeto['nome_arquivo'],
+                        'Formato': projeto['formato'],
+                        'Componentes': projeto['componentes'],
+                        'Área (m²)': projeto['area_total'],
+                        'Valor Final (R$)': projeto['valor_final'],
+                        'Criado em': projeto['data_criacao']
+                    }
+                    for projeto in pagina['projetos']
+                ]),
+                use_container_width=True,
+                hide_index=True
+            )
+        
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            if len(cursores) > 1 and st.button("← Anterior", key="projetos_anterior"):
+                cursores.pop()
+                st.rerun()
+        with col2:
+            st.caption(f"Página {len(cursores)}")
+        with col3:
+            if pagina['proximo_cursor'] and st.button("Próxima →", key="projetos_proxima"):
+                cursores.append(pagina['proximo_cursor'])
+                st.rerun()
 
 def mostrar_resultados(analise: Dict, orcamento: Dict, file_analyzer: FileAnalyzer, orcamento_engine: OrcamentoEngine):
     """Mostra os resultados do orçamento"""
     
     # Tabs para organizar informações
-    tab1, tab2, tab3, tab4, tab5 = st.tabs(["📊 Resumo", "🔧 Componentes", "📈 Gráficos", "📋 Relatório", "🎯 Visualização 3D"])
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs(["📊 Resumo", "🔧 Componentes", "📈 Gráficos", "📋 Relatório", "🎯 Visualização 3D", "🔀 Cenários", "✂️ Plano de Corte", "🏪 Fornecedores"])
     
     with tab1:
         mostrar_resumo(orcamento)
     
+    geometria = st.session_state.get('geometria')
+    
     with tab2:
-        mostrar_componentes(orcamento, file_analyzer)
+        mostrar_componentes(orcamento, file_analyzer, geometria)
     
     with tab3:
         mostrar_graficos(orcamento, orcamento_engine)
@@ -391,7 +583,17 @@ def mostrar_resultados(analise: Dict, orcamento: Dict, file_analyzer: FileAnalyz
         mostrar_relatorio(orcamento, orcamento_engine)
     
     with tab5:
-        mostrar_visualizacao_3d(analise, orcamento)
+        mostrar_visualizacao_3d(analise, orcamento, geometria)
+    
+    with tab6:
+        mostrar_cenarios(analise, orcamento, orcamento_engine)
+        mostrar_sensibilidade(st.session_state.orcamento_incremental)
+    
+    with tab7:
+        mostrar_plano_corte(orcamento)
+    
+    with tab8:
+        mostrar_fornecedores(analise, orcamento, orcamento_engine)
 
 def mostrar_resumo(orcamento: Dict):
     """Mostra resumo do orçamento"""
@@ -467,8 +669,60 @@ def mostrar_resumo(orcamento: Dict):
             <p>Margem de {}%</p>
         </div>
         """.format(resumo.get('valor_lucro', 0), resumo.get('margem_lucro_pct', 0)), unsafe_allow_html=True)
+    
+    if resumo.get('acrescimo_complexidade'):
+        st.caption(
+            f"Inclui acréscimo de complexidade ({resumo.get('multiplicador_complexidade', 1.0)}x): "
+            f"R$ {resumo.get('acrescimo_complexidade', 0):,.2f}"
+        )
+    
+    materiais = orcamento.get('materiais') or []
+    if len(materiais) > 1:
+        st.markdown("### 🪵 Materiais do Projeto")
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    'Material': Config.get_material_info(item['material']).get('nome', item['material']),
+                    'Componentes': item['componentes'],
+                    'Área (m²)': item['area_m2'],
+                    'Compra (m²)': item['area_compra_m2'],
+                    'Chapas': f"{item['chapas']}{' (estimado)' if item['chapas_estimadas'] else ''}",
+                    'Material (R$)': item['custo_material'],
+                    'Total (R$)': item['custo_total']
+                }
+                for item in materiais
+            ]),
+            use_container_width=True,
+            hide_index=True
+        )
+    
+    risco = orcamento.get('risco')
+    if risco:
+        st.markdown("### 🎲 Simulação de Risco")
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("P50", f"R$ {risco['p50']:,.2f}")
+        with col2:
+            st.metric("P90", f"R$ {risco['p90']:,.2f}", delta=f"R$ {risco['p90'] - risco['valor_base']:,.2f} vs. orçado", delta_color="inverse")
+        with col3:
+            st.metric("Chance de passar do orçado", f"{risco['probabilidade_acima_base'] * 100:.0f}%")
+        
+        limites = risco['histograma']['limites']
+        fig = go.Figure(go.Bar(
+            x=[(a + b) / 2 for a, b in zip(limites[:-1], limites[1:])],
+            y=risco['histograma']['contagens'],
+            marker_color='#667eea'
+        ))
+        for valor, nome in [(risco['valor_base'], 'Orçado'), (risco['p50'], 'P50'), (risco['p90'], 'P90')]:
+            fig.add_vline(x=valor, line_dash='dash', annotation_text=nome)
+        fig.update_layout(
+            xaxis_title="Valor final (R$)", yaxis_title="Amostras", bargap=0.05, height=350
+        )
+        st.plotly_chart(fig, use_container_width=True)
+        st.caption(f"{risco['amostras']:,} amostras de desperdício, preços e mão de obra".replace(',', '.'))
 
-def mostrar_componentes(orcamento: Dict, file_analyzer: FileAnalyzer):
+def mostrar_componentes(orcamento: Dict, file_analyzer: FileAnalyzer, geometria: RepositorioGeometria = None):
     """Mostra detalhes dos componentes com visualização individual"""
     
     componentes = orcamento.get('componentes', [])
@@ -518,7 +772,7 @@ def mostrar_componentes(orcamento: Dict, file_analyzer: FileAnalyzer):
                 
                 # Gerar visualização 3D simplificada do componente
                 try:
-                    fig_3d = gerar_visualizacao_componente_individual(comp, i)
+                    fig_3d = gerar_visualizacao_componente_individual(comp, i, geometria)
                     if fig_3d:
                         st.plotly_chart(fig_3d, use_container_width=True)
                     else:
@@ -526,27 +780,38 @@ def mostrar_componentes(orcamento: Dict, file_analyzer: FileAnalyzer):
                 except Exception as e:
                     st.warning("Erro ao gerar visualização 3D")
 
-def gerar_visualizacao_componente_individual(componente: Dict, index: int) -> go.Figure:
-    """Gera visualização 3D individual de um componente"""
+def gerar_visualizacao_componente_individual(componente: Dict, index: int,
+                                             geometria: RepositorioGeometria = None) -> go.Figure:
+    """Gera visualização 3D individual de um componente
+    
+    A malha real é buscada no repositório pelo geometria_id só neste momento;
+    sem ela, o componente é desenhado como um paralelepípedo estimado pela área.
+    """
     
     try:
-        # Simular dados 3D baseados nas dimensões do componente
-        area = componente.get('area_m2', 1.0)
-        
-        # Estimar dimensões baseadas na área (assumindo formato retangular)
-        largura = (area ** 0.5) * 1.2
-        altura = (area ** 0.5) * 0.8
-        profundidade = 0.02  # 2cm de espessura padrão
+        malha = geometria.triangulos(componente.get('geometria_id')) if geometria else None
         
-        # Criar pontos do cubo/paralelepípedo
-        x = [0, largura, largura, 0, 0, largura, largura, 0]
-        y = [0, 0, altura, altura, 0, 0, altura, altura]
-        z = [0, 0, 0, 0, profundidade, profundidade, profundidade, profundidade]
-        
-        # Definir as faces do cubo
-        i = [7, 0, 0, 0, 4, 4, 6, 6, 4, 0, 3, 2]
-        j = [3, 4, 1, 2, 5, 6, 5, 2, 0, 1, 6, 3]
-        k = [0, 7, 2, 3, 6, 7, 1, 1, 5, 5, 7, 6]
+        if malha is not None and len(malha['triangulos']):
+            x, y, z = malha['vertices'].T
+            i, j, k = malha['triangulos'].T
+        else:
+            # Simular dados 3D baseados nas dimensões do componente
+            area = componente.get('area_m2', 1.0)
+            
+            # Estimar dimensões baseadas na área (assumindo formato retangular)
+            largura = (area ** 0.5) * 1.2
+            altura = (area ** 0.5) * 0.8
+            profundidade = 0.02  # 2cm de espessura padrão
+            
+            # Criar pontos do cubo/paralelepípedo
+            x = [0, largura, largura, 0, 0, largura, largura, 0]
+            y = [0, 0, altura, altura, 0, 0, altura, altura]
+            z = [0, 0, 0, 0, profundidade, profundidade, profundidade, profundidade]
+            
+            # Definir as faces do cubo
+            i = [7, 0, 0, 0, 4, 4, 6, 6, 4, 0, 3, 2]
+            j = [3, 4, 1, 2, 5, 6, 5, 2, 0, 1, 6, 3]
+            k = [0, 7, 2, 3, 6, 7, 1, 1, 5, 5, 7, 6]
         
         # Cores baseadas no tipo de componente
         cores_tipo = {
@@ -613,34 +878,332 @@ def mostrar_relatorio(orcamento: Dict, orcamento_engine: OrcamentoEngine):
     
     st.markdown("### 📋 Relatório Detalhado")
     
-    relatorio = orcamento_engine.gerar_relatorio_detalhado(
-        orcamento, 
-        "Cliente Demo", 
-        "Ambiente Demo"
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        agrupar_por = st.selectbox(
+            "Agrupar componentes", [None, "tipo"],
+            format_func=lambda x: "Sem agrupamento" if x is None else "Por tipo"
+        )
+    with col2:
+        itens_por_pagina = st.selectbox("Componentes por página", [25, 50, 100, 250], index=1)
+    with col3:
+        paginas = orcamento_engine.gerador_relatorio.contar_paginas(orcamento, itens_por_pagina)
+        pagina = st.number_input("Página", min_value=1, max_value=paginas, value=1)
+    
+    # Prévia: só a página escolhida vai para a tela
+    st.markdown(orcamento_engine.gerar_relatorio_detalhado(
+        orcamento,
+        "Cliente Demo",
+        "Ambiente Demo",
+        agrupar_por=agrupar_por,
+        itens_por_pagina=itens_por_pagina,
+        pagina=pagina
+    ))
+    
+    # Documento completo: gerado só quando o download é clicado, fora do script da página
+    def relatorio_completo() -> bytes:
+        texto = io.StringIO()
+        orcamento_engine.escrever_relatorio(orcamento, texto, "Cliente Demo", "Ambiente Demo", agrupar_por=agrupar_por)
+        return texto.getvalue().encode('utf-8')
+    
+    st.download_button(
+        label="📝 Baixar relatório completo (.md)",
+        data=relatorio_completo,
+        file_name=f"relatorio_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
+        mime="text/markdown",
+        use_container_width=True
+    )
+    
+    # Exportação: perfis sem geometria, escritos em memória e entregues em bytes
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        perfil = st.selectbox("Formato de exportação", list(PERFIS_EXPORTACAO), format_func=PERFIS_EXPORTACAO.get)
+        if st.button("📥 Exportar", use_container_width=True):
+            if perfil == 'parquet':
+                arquivo = io.BytesIO()
+                exportado = orcamento_engine.exportar(orcamento, arquivo, perfil)
+                dados = arquivo.getvalue()
+            else:
+                texto = io.StringIO()
+                exportado = orcamento_engine.exportar(orcamento, texto, perfil)
+                dados = texto.getvalue().encode('utf-8')
+            
+            if not exportado:
+                st.error("Exportação Parquet requer o pacote pyarrow.")
+            else:
+                extensao, mime = {
+                    'resumo': ('json', 'application/json'),
+                    'json': ('json', 'application/json'),
+                    'jsonl': ('jsonl', 'application/x-ndjson'),
+                    'parquet': ('parquet', 'application/octet-stream')
+                }[perfil]
+                st.download_button(
+                    label=f"💾 Baixar .{extensao}",
+                    data=dados,
+                    file_name=f"orcamento_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extensao}",
+                    mime=mime,
+                    use_container_width=True
+                )
+    
+    with col2:
+        usuario = st.session_state.get('usuario_atual') or {}
+        if not Config.is_recurso_disponivel(usuario.get('plano', 'gratuito'), 'relatorios_pdf'):
+            st.button("📄 Gerar PDF", use_container_width=True, disabled=True)
+            st.caption("Relatórios em PDF disponíveis a partir do plano Básico")
+        else:
+            # Um PDF por orçamento e agrupamento: mudou o orçamento, o arquivo anterior não vale mais
+            chave = json.dumps([orcamento.get('configuracoes'), orcamento.get('resumo'), agrupar_por],
+                               sort_keys=True, default=str)
+            trabalho = st.session_state.get('exportacao_pdf')
+            if trabalho and trabalho['chave'] != chave:
+                # A thread do PDF antigo para e o arquivo dele é fechado (e apagado)
+                trabalho['exportacao'].cancelar()
+                trabalho = st.session_state.exportacao_pdf = None
+            
+            if st.button("📄 Gerar PDF", use_container_width=True, disabled=bool(trabalho and not trabalho['concluido'])):
+                if trabalho:
+                    trabalho['exportacao'].cancelar()
+                # Geração em thread, direto para arquivo temporário em disco; a tela só consulta o progresso
+                arquivo = tempfile.TemporaryFile(mode='w+b')
+                exportacao = ExportacaoPDF(orcamento_engine.gerador_pdf)
+                exportacao.iniciar(orcamento, arquivo, "Cliente Demo", "Ambiente Demo", agrupar_por)
+                trabalho = st.session_state.exportacao_pdf = {
+                    'chave': chave, 'exportacao': exportacao, 'arquivo': arquivo, 'concluido': False
+                }
+            
+            if trabalho and not trabalho['concluido']:
+                acompanhar_pdf(trabalho)
+            elif trabalho and trabalho['erro']:
+                st.error(f"Erro ao gerar PDF: {trabalho['erro']}")
+            elif trabalho:
+                def ler_pdf(arquivo=trabalho['arquivo']) -> bytes:
+                    # Lido do arquivo só no clique; os bytes não ficam na sessão
+                    arquivo.seek(0)
+                    return arquivo.read()
+                
+                st.download_button(
+                    label=f"💾 Baixar PDF ({trabalho['paginas']} páginas)",
+                    data=ler_pdf,
+                    file_name=f"orcamento_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
+                    mime="application/pdf",
+                    use_container_width=True
+                )
+
+@st.fragment(run_every=0.5)
+def acompanhar_pdf(trabalho: Dict):
+    """Progresso do PDF em geração, atualizado só neste trecho da página até o fim da thread"""
+    exportacao = trabalho['exportacao']
+    progresso = exportacao.progresso
+    
+    if not progresso['concluido']:
+        st.progress(progresso['pagina'] / max(progresso['total'], 1),
+                    text=f"Gerando PDF... página {progresso['pagina']} de {progresso['total']}")
+        return
+    
+    # Pronto: o PDF fica no arquivo temporário até ser substituído (o download lê
+    # dele) e a página roda de novo, já com o botão e sem este acompanhamento
+    if progresso['erro']:
+        exportacao.cancelar()
+    trabalho.update({'concluido': True, 'erro': progresso['erro'], 'paginas': progresso['total']})
+    st.rerun()
+
+def mostrar_cenarios(analise: Dict, orcamento: Dict, orcamento_engine: OrcamentoEngine):
+    """Mostra a comparação de todos os cenários de material, acessórios e complexidade"""
+    
+    st.markdown("### 🔀 Comparação de Cenários")
+    
+    configuracoes = orcamento.get('configuracoes', {})
+    margem_atual = configuracoes.get('margem_lucro', 30)
+    margens = sorted(set(orcamento_engine.margens_cenarios) | {margem_atual})
+    
+    cenarios = orcamento_engine.calcular_cenarios(analise, configuracoes, margens)
+    
+    if cenarios.empty:
+        st.warning("Nenhum componente encontrado para comparar cenários.")
+        return
+    
+    margem = st.select_slider("Margem de lucro dos cenários (%)", options=margens, value=margem_atual)
+    
+    # Valor final por material (linhas) e qualidade/complexidade (colunas)
+    tabela = cenarios[cenarios['margem_lucro'] == margem].pivot_table(
+        index='material',
+        columns=['qualidade_acessorios', 'complexidade'],
+        values='valor_final'
     )
+    tabela.columns = [f"{qualidade.title()} / {complexidade.title()}" for qualidade, complexidade in tabela.columns]
+    tabela.index = [Config.get_material_info(material).get('nome', material) for material in tabela.index]
     
-    st.markdown(relatorio)
+    st.caption("Valor final (R$) de cada combinação para a margem selecionada")
+    st.dataframe(tabela.round(2), use_container_width=True)
+    
+    mais_barato = cenarios[cenarios['margem_lucro'] == margem].nsmallest(1, 'valor_final').iloc[0]
+    st.info(
+        f"💡 Cenário mais econômico: {Config.get_material_info(mais_barato['material']).get('nome', mais_barato['material'])}, "
+        f"acessórios {mais_barato['qualidade_acessorios']}, complexidade {mais_barato['complexidade']} — "
+        f"R$ {mais_barato['valor_final']:,.2f}"
+    )
+    
+    with st.expander("📋 Todos os cenários"):
+        st.dataframe(cenarios, use_container_width=True, hide_index=True)
+
+def mostrar_sensibilidade(orcamento_incremental: OrcamentoIncremental):
+    """Mostra o gráfico tornado com o efeito de cada fator no valor final"""
+    
+    st.markdown("### 🌪️ Sensibilidade do Preço")
+    
+    variacao = st.slider("Variação de preços (%)", 5, 30, 10, step=5)
+    sensibilidade = orcamento_incremental.analisar_sensibilidade(variacao_pct=variacao)
+    
+    if not sensibilidade:
+        return
+    
+    fatores = sensibilidade['fatores'].iloc[::-1]
+    valor_base = sensibilidade['valor_base']
+    
+    fig = go.Figure()
+    for coluna, cenario, nome, cor in [
+        ('impacto_baixo', 'cenario_baixo', 'Cenário baixo', '#2ca02c'),
+        ('impacto_alto', 'cenario_alto', 'Cenário alto', '#d62728')
+    ]:
+        fig.add_trace(go.Bar(
+            y=fatores['fator'],
+            x=fatores[coluna],
+            base=valor_base,
+            orientation='h',
+            name=nome,
+            marker_color=cor,
+            text=fatores[cenario],
+            hovertemplate="%{y}<br>%{text}: R$ %{x:,.2f}<extra></extra>"
+        ))
+    fig.add_vline(x=valor_base, line_dash='dash', annotation_text="Atual")
+    fig.update_layout(
+        barmode='overlay',
+        xaxis_title="Valor final (R$)",
+        height=400,
+        legend={'orientation': 'h'}
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    
+    derivadas = sensibilidade['derivadas']
+    st.caption(
+        f"Cada 1% no preço do material muda o valor final em R$ {derivadas['preco_material_pct']:,.2f}; "
+        f"cada ponto de desperdício, em R$ {derivadas['desperdicio_pp']:,.2f}; "
+        f"cada ponto de margem, em R$ {derivadas['margem_pp']:,.2f}."
+    )
+
+def mostrar_plano_corte(orcamento: Dict):
+    """Mostra o plano de corte das chapas e a lista de cortes"""
+    
+    st.markdown("### ✂️ Plano de Corte")
+    
+    plano = orcamento.get('plano_corte')
+    if not plano:
+        st.info("Ative \"Material por plano de corte\" nas configurações para calcular o consumo real de chapas.")
+        return
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric(
+            "Chapas", plano['chapas'],
+            delta=f"{len(plano['por_material'])} materiais" if plano.get('por_material')
+            else f"{plano['dimensoes_chapa_mm'][0]}×{plano['dimensoes_chapa_mm'][1]} mm"
+        )
+    
+    with col2:
+        st.metric("Aproveitamento", f"{plano['aproveitamento_pct']}%")
+    
+    with col3:
+        st.metric("Desperdício Real", f"{plano['desperdicio_real_pct']}%")
+    
+    with col4:
+        st.metric("Custo das Chapas", f"R$ {plano['custo_chapas']:,.2f}")
+    
+    if plano['nao_alocados']:
+        st.warning(
+            f"{len(plano['nao_alocados'])} painel(is) maiores que a chapa precisam de emenda: "
+            f"{', '.join(sorted(set(plano['nao_alocados'])))}"
+        )
+    
+    if plano.get('por_material'):
+        st.markdown("**Chapas por Material:**")
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    'Material': Config.get_material_info(material).get('nome', material),
+                    'Chapas': item['chapas'],
+                    'Chapa (mm)': f"{item['dimensoes_chapa_mm'][0]}×{item['dimensoes_chapa_mm'][1]}",
+                    'Aproveitamento (%)': item['aproveitamento_pct'],
+                    'Custo (R$)': item['custo_chapas']
+                }
+                for material, item in plano['por_material'].items()
+            ]),
+            use_container_width=True,
+            hide_index=True
+        )
+    
+    st.markdown("**Lista de Cortes:**")
+    st.dataframe(pd.DataFrame(plano['cortes']), use_container_width=True, hide_index=True)
+
+def mostrar_fornecedores(analise: Dict, orcamento: Dict, orcamento_engine: OrcamentoEngine):
+    """Mostra a compra dividida entre os fornecedores do catálogo"""
+    
+    st.markdown("### 🏪 Compra por Fornecedor")
+    
+    fornecedores = orcamento_engine.catalogo.tabelas['fornecedores']
+    opcoes = [None] + fornecedores['ids']
+    nomes = dict(zip(fornecedores['ids'], fornecedores['nomes']))
     
-    # Botão para exportar JSON
     col1, col2 = st.columns(2)
+    with col1:
+        preferido = st.selectbox(
+            "Fornecedor preferido",
+            opcoes,
+            format_func=lambda x: "Nenhum (menor preço)" if x is None else nomes[x]
+        )
+    with col2:
+        tolerancia = st.slider(
+            "Pagar a mais pelo preferido até (%)", 0, 20, 5, disabled=preferido is None
+        )
+    
+    cotacao = orcamento_engine.cotar_fornecedores(
+        analise, orcamento.get('configuracoes', {}), preferido, tolerancia
+    )
+    
+    if not cotacao:
+        st.warning("Nenhum componente encontrado para cotar.")
+        return
+    
+    col1, col2, col3 = st.columns(3)
     
     with col1:
-        if st.button("📥 Exportar JSON", use_container_width=True):
-            json_data = orcamento_engine.exportar_json(orcamento)
-            st.download_button(
-                label="💾 Baixar JSON",
-                data=json_data,
-                file_name=f"orcamento_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-                mime="application/json",
-                use_container_width=True
-            )
+        st.metric("Total da Compra", f"R$ {cotacao['total']:,.2f}")
     
     with col2:
-        if st.button("📄 Gerar PDF", use_container_width=True):
-            st.info("Funcionalidade de PDF será implementada em breve!")
+        st.metric("Frete", f"R$ {cotacao['total_frete']:,.2f}")
+    
+    with col3:
+        if cotacao['economia'] is not None:
+            st.metric(
+                "Economia", f"R$ {cotacao['economia']:,.2f}",
+                delta=f"vs. só {fornecedores['nomes'][0]}"
+            )
+    
+    st.caption("Material e acessórios; mão de obra e complexidade não dependem do fornecedor.")
+    st.dataframe(pd.DataFrame(cotacao['fornecedores']), use_container_width=True, hide_index=True)
+    
+    if cotacao['descartados']:
+        st.info(f"Descartados por pedido mínimo ou frete: {', '.join(cotacao['descartados'])}")
+    
+    if cotacao['sem_fornecedor']:
+        st.warning(f"Sem fornecedor no catálogo: {', '.join(cotacao['sem_fornecedor'])}")
+    
+    with st.expander("📋 Itens por fornecedor"):
+        st.dataframe(cotacao['itens'], use_container_width=True, hide_index=True)
 
-def mostrar_visualizacao_3d(analise: Dict, orcamento: Dict):
-    """Mostra visualização 3D completa do projeto"""
+def mostrar_visualizacao_3d(analise: Dict, orcamento: Dict, geometria: RepositorioGeometria = None):
+    """Mostra visualização 3D completa do projeto (malhas reais quando disponíveis no repositório)"""
     
     st.markdown("### 🎯 Visualização 3D Completa")
     
@@ -654,26 +1217,33 @@ def mostrar_visualizacao_3d(analise: Dict, orcamento: Dict):
             cores = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7', '#DDA0DD', '#98D8C8', '#F7DC6F']
             
             for i, comp in enumerate(componentes):
-                # Simular posição de cada componente
-                offset_x = (i % 3) * 2
-                offset_y = (i // 3) * 2
-                
-                area = comp.get('area_m2', 1.0)
-                largura = (area ** 0.5) * 1.2
-                altura = (area ** 0.5) * 0.8
-                profundidade = 0.02
+                malha = geometria.triangulos(comp.get('geometria_id')) if geometria else None
                 
-                # Pontos do componente com offset
-                x = [offset_x, offset_x + largura, offset_x + largura, offset_x, 
-                     offset_x, offset_x + largura, offset_x + largura, offset_x]
-                y = [offset_y, offset_y, offset_y + altura, offset_y + altura,
-                     offset_y, offset_y, offset_y + altura, offset_y + altura]
-                z = [0, 0, 0, 0, profundidade, profundidade, profundidade, profundidade]
-                
-                # Faces do cubo
-                i_faces = [7, 0, 0, 0, 4, 4, 6, 6, 4, 0, 3, 2]
-                j_faces = [3, 4, 1, 2, 5, 6, 5, 2, 0, 1, 6, 3]
-                k_faces = [0, 7, 2, 3, 6, 7, 1, 1, 5, 5, 7, 6]
+                if malha is not None and len(malha['triangulos']):
+                    # Malha real, nas coordenadas do modelo
+                    x, y, z = malha['vertices'].T
+                    i_faces, j_faces, k_faces = malha['triangulos'].T
+                else:
+                    # Simular posição de cada componente
+                    offset_x = (i % 3) * 2
+                    offset_y = (i // 3) * 2
+                    
+                    area = comp.get('area_m2', 1.0)
+                    largura = (area ** 0.5) * 1.2
+                    altura = (area ** 0.5) * 0.8
+                    profundidade = 0.02
+                    
+                    # Pontos do componente com offset
+                    x = [offset_x, offset_x + largura, offset_x + largura, offset_x, 
+                         offset_x, offset_x + largura, offset_x + largura, offset_x]
+                    y = [offset_y, offset_y, offset_y + altura, offset_y + altura,
+                         offset_y, offset_y, offset_y + altura, offset_y + altura]
+                    z = [0, 0, 0, 0, profundidade, profundidade, profundidade, profundidade]
+                    
+                    # Faces do cubo
+                    i_faces = [7, 0, 0, 0, 4, 4, 6, 6, 4, 0, 3, 2]
+                    j_faces = [3, 4, 1, 2, 5, 6, 5, 2, 0, 1, 6, 3]
+                    k_faces = [0, 7, 2, 3, 6, 7, 1, 1, 5, 5, 7, 6]
                 
                 fig.add_trace(go.Mesh3d(
                     x=x, y=y, z=z,
@@ -3,72 +3,299 @@ Sistema de Autenticação - Orca Interiores SaaS
 Gerenciamento completo de usuários e planos de assinatura
 """
 
-import sqlite3
 import hashlib
 import json
-from datetime import datetime, timedelta
-from typing import Dict, Optional, List
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, List, Tuple
 import os
+import sys
+
+from banco import BancoDados
+from blobs import RepositorioBlobs
+from geometria import RepositorioGeometria
+from sessoes import CacheSessoes
+
+
+def preparar_analise(analise: Dict, blobs: RepositorioBlobs, geometria: Optional[RepositorioGeometria] = None,
+                     malhas_gravadas: Optional[Dict[str, str]] = None) -> Tuple[str, List[tuple], Dict[str, str]]:
+    """Separa a análise em blobs: um por malha e um para a análise sem geometria
+
+    Malhas ainda embutidas nos componentes (vertices/faces) ou em 'geometrias'
+    também são separadas; na análise gravada, 'geometrias' fica como
+    {geometria_id: hash do blob da malha}. Malhas em malhas_gravadas
+    (geometria_id -> hash já no banco) não são serializadas de novo.
+    Retorna o hash da análise, os blobs preparados para gravar e as
+    referências das malhas.
+    """
+    geometria = geometria or RepositorioGeometria()
+    malhas_gravadas = malhas_gravadas or {}
+    analise = dict(analise)
+    if 'componentes' in analise:
+        analise['componentes'] = [dict(comp) for comp in analise['componentes']]
+        geometria.registrar_componentes(analise['componentes'])
+
+    malhas = dict(analise.get('geometrias') or {})
+    malhas.update(geometria.exportar([
+        comp['geometria_id'] for comp in analise.get('componentes', [])
+        if comp.get('geometria_id') and comp['geometria_id'] not in malhas_gravadas
+    ]))
+    ids = dict.fromkeys(list(malhas) + [
+        comp['geometria_id'] for comp in analise.get('componentes', []) if comp.get('geometria_id')
+    ])
+
+    preparados = []
+    referencias = {}
+    for geometria_id in ids:
+        malha = malhas.get(geometria_id)
+        if geometria_id in malhas_gravadas:
+            referencias[geometria_id] = malhas_gravadas[geometria_id]
+        elif isinstance(malha, str):
+            referencias[geometria_id] = malha
+        elif malha is not None:
+            preparados.append(blobs.preparar(json.dumps(malha, sort_keys=True)))
+            referencias[geometria_id] = preparados[-1][0]
+    if referencias:
+        analise['geometrias'] = referencias
+
+    preparados.append(blobs.preparar(json.dumps(analise, sort_keys=True)))
+    return preparados[-1][0], preparados, referencias
+
+
+def resumir_projeto(nome_arquivo: str, analise: Dict, orcamento: Dict) -> Tuple:
+    """Colunas de resumo do projeto: (valor_final, area_total, componentes, formato)
+
+    Gravadas na própria linha do projeto, para listagens e filtros sem ler os
+    blobs da análise e do orçamento.
+    """
+    resumo = (orcamento or {}).get('resumo') or {}
+    componentes = (analise or {}).get('componentes') or []
+    area_total = resumo.get('area_total_m2')
+    if area_total is None and componentes:
+        area_total = round(sum(comp.get('area_m2', 0) for comp in componentes), 2)
+    formato = (analise or {}).get('formato') or os.path.splitext(nome_arquivo)[1].lstrip('.').upper() or None
+    return resumo.get('valor_final'), area_total, resumo.get('quantidade_componentes', len(componentes)), formato
+
+
+def _mover_dados_para_blobs(conn, tamanho_lote: int = 200):
+    """Migração de dados: análises e orçamentos gravados nas linhas de projetos vão para blobs"""
+    blobs = RepositorioBlobs()
+    malhas_gravadas = {}
+    ultimo_id = 0
+    while True:
+        linhas = conn.execute('''
+            SELECT id, dados_analise, dados_orcamento FROM projetos
+            WHERE id > ? AND (dados_analise IS NOT NULL OR dados_orcamento IS NOT NULL)
+            ORDER BY id
+            LIMIT ?
+        ''', (ultimo_id, tamanho_lote)).fetchall()
+        if not linhas:
+            break
+        ultimo_id = linhas[-1][0]
+
+        preparados, referencias = [], []
+        for projeto_id, dados_analise, dados_orcamento in linhas:
+            analise_hash = orcamento_hash = None
+            if dados_analise:
+                try:
+                    analise_hash, blobs_analise, referencias_malhas = preparar_analise(
+                        json.loads(dados_analise), blobs, malhas_gravadas=malhas_gravadas
+                    )
+                    # Os blobs do lote são gravados na mesma transação da migração
+                    malhas_gravadas.update(referencias_malhas)
+                except ValueError:
+                    # Conteúdo ilegível: preservado como está
+                    blobs_analise = [blobs.preparar(dados_analise)]
+                    analise_hash = blobs_analise[0][0]
+                preparados.extend(blobs_analise)
+            if dados_orcamento:
+                preparados.append(blobs.preparar(dados_orcamento))
+                orcamento_hash = preparados[-1][0]
+            referencias.append((analise_hash, orcamento_hash, projeto_id))
+
+        blobs.gravar(conn, preparados)
+        conn.executemany('''
+            UPDATE projetos
+            SET analise_hash = ?, orcamento_hash = ?, dados_analise = NULL, dados_orcamento = NULL
+            WHERE id = ?
+        ''', referencias)
+
+
+def _preencher_resumos(conn, tamanho_lote: int = 500):
+    """Migração de dados: colunas de resumo dos projetos já salvos, lidas dos blobs"""
+    blobs = RepositorioBlobs()
+    ultimo_id = 0
+    while True:
+        linhas = conn.execute('''
+            SELECT id, nome_arquivo, analise_hash, orcamento_hash FROM projetos
+            WHERE id > ?
+            ORDER BY id
+            LIMIT ?
+        ''', (ultimo_id, tamanho_lote)).fetchall()
+        if not linhas:
+            break
+        ultimo_id = linhas[-1][0]
+
+        conteudos = blobs.ler(conn, [hash_blob for linha in linhas for hash_blob in linha[2:]])
+        resumos = []
+        for projeto_id, nome_arquivo, analise_hash, orcamento_hash in linhas:
+            dados = []
+            for hash_blob in (analise_hash, orcamento_hash):
+                try:
+                    dados.append(json.loads(conteudos[hash_blob]) if hash_blob in conteudos else {})
+                except ValueError:
+                    dados.append({})
+            resumos.append(resumir_projeto(nome_arquivo, *dados) + (projeto_id,))
+
+        conn.executemany('''
+            UPDATE projetos SET valor_final = ?, area_total = ?, componentes = ?, formato = ?
+            WHERE id = ?
+        ''', resumos)
+
+
+# Migrações do schema: (versão, descrição, comandos). Nunca altere uma versão já
+# publicada; mudanças novas entram como uma versão seguinte.
+MIGRACOES = [
+    (1, "Tabelas de usuários, sessões e projetos", [
+        '''
+        CREATE TABLE IF NOT EXISTS usuarios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            senha_hash TEXT NOT NULL,
+            plano TEXT NOT NULL DEFAULT 'gratuito',
+            data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            data_ultimo_login TIMESTAMP,
+            ativo BOOLEAN DEFAULT 1,
+            projetos_mes INTEGER DEFAULT 0,
+            ultimo_reset_projetos DATE
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS sessoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario_id INTEGER,
+            token TEXT UNIQUE NOT NULL,
+            data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            data_expiracao TIMESTAMP,
+            ativo BOOLEAN DEFAULT 1,
+            FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS projetos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario_id INTEGER,
+            nome_arquivo TEXT NOT NULL,
+            dados_analise TEXT,
+            dados_orcamento TEXT,
+            data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
+        )
+        '''
+    ]),
+    (2, "Índices das consultas de projetos e sessões", [
+        # Listagem (ORDER BY data_criacao) e contagens por usuário e período
+        "CREATE INDEX IF NOT EXISTS idx_projetos_usuario_data ON projetos (usuario_id, data_criacao)",
+        "CREATE INDEX IF NOT EXISTS idx_sessoes_usuario ON sessoes (usuario_id, ativo)",
+        "CREATE INDEX IF NOT EXISTS idx_sessoes_expiracao ON sessoes (data_expiracao)"
+    ]),
+    (3, "Repositório de blobs e referências dos projetos", [
+        '''
+        CREATE TABLE IF NOT EXISTS blobs (
+            hash TEXT PRIMARY KEY,
+            tamanho INTEGER NOT NULL,
+            dados BLOB NOT NULL,
+            data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        "ALTER TABLE projetos ADD COLUMN analise_hash TEXT",
+        "ALTER TABLE projetos ADD COLUMN orcamento_hash TEXT",
+        "CREATE INDEX IF NOT EXISTS idx_projetos_analise_hash ON projetos (analise_hash)",
+        "CREATE INDEX IF NOT EXISTS idx_projetos_orcamento_hash ON projetos (orcamento_hash)"
+    ]),
+    (4, "Análises e orçamentos dos projetos movidos para blobs", [_mover_dados_para_blobs]),
+    (5, "Colunas de resumo dos projetos", [
+        "ALTER TABLE projetos ADD COLUMN valor_final REAL",
+        "ALTER TABLE projetos ADD COLUMN area_total REAL",
+        "ALTER TABLE projetos ADD COLUMN componentes INTEGER",
+        "ALTER TABLE projetos ADD COLUMN formato TEXT",
+        _preencher_resumos
+    ]),
+    (6, "Ticket de uso único para retomar a sessão pela URL", [
+        "ALTER TABLE sessoes ADD COLUMN ticket TEXT",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_sessoes_ticket ON sessoes (ticket)"
+    ])
+]
+
+
+def intervalo_mes(data: Optional[datetime] = None) -> Tuple[str, str]:
+    """Início do mês e início do mês seguinte, no formato de CURRENT_TIMESTAMP (UTC)
+
+    Usado como data_criacao >= inicio AND data_criacao < fim, que aproveita o
+    índice, no lugar de strftime('%Y-%m', data_criacao).
+    """
+    data = data or datetime.now(timezone.utc)
+    inicio = data.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    fim = inicio.replace(year=inicio.year + 1, month=1) if inicio.month == 12 else inicio.replace(month=inicio.month + 1)
+    return inicio.strftime('%Y-%m-%d %H:%M:%S'), fim.strftime('%Y-%m-%d %H:%M:%S')
+
+# Colunas das listagens de projetos, na ordem lida por _projeto_listado
+COLUNAS_LISTAGEM = "id, nome_arquivo, data_criacao, valor_final, area_total, componentes, formato"
+
+
+def _formatar_utc(instante: float) -> str:
+    """Instante (epoch) no formato de CURRENT_TIMESTAMP (UTC), comparável com as colunas de data"""
+    return datetime.fromtimestamp(instante, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _hash_token(token: str) -> str:
+    """O banco guarda só o sha256 do token: uma cópia do banco não dá acesso às sessões"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _projeto_listado(row: tuple) -> Dict:
+    return {
+        'id': row[0],
+        'nome_arquivo': row[1],
+        'data_criacao': row[2],
+        'valor_final': row[3],
+        'area_total': row[4],
+        'componentes': row[5],
+        'formato': row[6]
+    }
+
 
 class AuthManager:
-    def __init__(self, db_path: str = "usuarios.db"):
-        """Inicializa o gerenciador de autenticação"""
+    def __init__(self, db_path: str = "usuarios.db", duracao_sessao_horas: float = 24,
+                 intervalo_limpeza_s: float = 600):
+        """Inicializa o gerenciador de autenticação
+
+        As sessões duram duracao_sessao_horas (SECURITY_CONFIG['session_timeout_hours'])
+        e as vencidas são apagadas do banco, em lotes, no máximo a cada
+        intervalo_limpeza_s.
+        """
         self.db_path = db_path
+        self.banco = BancoDados.obter(db_path)
+        self.blobs = RepositorioBlobs()
+        # geometria_id -> hash do blob da malha já gravada, para não serializar malhas repetidas
+        self._malhas_gravadas = {}
+        self.limite_malhas_gravadas = 100_000
+        self.duracao_sessao_s = duracao_sessao_horas * 3600
+        self.cache_sessoes = CacheSessoes()
+        self.intervalo_limpeza_s = intervalo_limpeza_s
+        self._ultima_limpeza = time.monotonic()
+        self._trava_limpeza = threading.Lock()
         self.inicializar_banco()
-        self.criar_usuarios_demo()
     
     def inicializar_banco(self):
-        """Cria as tabelas necessárias no banco de dados"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Tabela de usuários
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS usuarios (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nome TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                senha_hash TEXT NOT NULL,
-                plano TEXT NOT NULL DEFAULT 'gratuito',
-                data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                data_ultimo_login TIMESTAMP,
-                ativo BOOLEAN DEFAULT 1,
-                projetos_mes INTEGER DEFAULT 0,
-                ultimo_reset_projetos DATE
-            )
-        ''')
-        
-        # Tabela de sessões
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sessoes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                usuario_id INTEGER,
-                token TEXT UNIQUE NOT NULL,
-                data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                data_expiracao TIMESTAMP,
-                ativo BOOLEAN DEFAULT 1,
-                FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
-            )
-        ''')
-        
-        # Tabela de projetos
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS projetos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                usuario_id INTEGER,
-                nome_arquivo TEXT NOT NULL,
-                dados_analise TEXT,
-                dados_orcamento TEXT,
-                data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        """Cria ou atualiza as tabelas do banco (migrações pendentes, uma vez por processo)"""
+        self.banco.migrar(MIGRACOES)
     
     def criar_usuarios_demo(self):
-        """Cria usuários demo para teste"""
+        """Cria usuários demo para teste (comando de setup: python auth_manager.py [banco] --demo)"""
         usuarios_demo = [
             {
                 'nome': 'Demo Orca Interiores',
@@ -105,13 +332,9 @@ class AuthManager:
     
     def usuario_existe(self, email: str) -> bool:
         """Verifica se usuário já existe"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT id FROM usuarios WHERE email = ?", (email,))
-        resultado = cursor.fetchone()
-        
-        conn.close()
+        resultado = self.banco.conexao().execute(
+            "SELECT id FROM usuarios WHERE email = ?", (email,)
+        ).fetchone()
         return resultado is not None
     
     def criar_usuario(self, nome: str, email: str, senha: str, plano: str = 'gratuito') -> bool:
@@ -120,18 +343,13 @@ class AuthManager:
             if self.usuario_existe(email):
                 return False
             
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
             senha_hash = self.hash_senha(senha)
             
-            cursor.execute('''
-                INSERT INTO usuarios (nome, email, senha_hash, plano, ultimo_reset_projetos)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (nome, email, senha_hash, plano, datetime.now().date()))
-            
-            conn.commit()
-            conn.close()
+            with self.banco.transacao() as conn:
+                conn.execute('''
+                    INSERT INTO usuarios (nome, email, senha_hash, plano, ultimo_reset_projetos)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (nome, email, senha_hash, plano, datetime.now().date().isoformat()))
             return True
             
         except Exception as e:
@@ -141,44 +359,28 @@ class AuthManager:
     def fazer_login(self, email: str, senha: str) -> Optional[Dict]:
         """Realiza login do usuário"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
             senha_hash = self.hash_senha(senha)
             
-            cursor.execute('''
-                SELECT id, nome, email, plano, projetos_mes, ultimo_reset_projetos
+            resultado = self.banco.conexao().execute('''
+                SELECT id, nome, email, plano, projetos_mes
                 FROM usuarios 
                 WHERE email = ? AND senha_hash = ? AND ativo = 1
-            ''', (email, senha_hash))
-            
-            resultado = cursor.fetchone()
+            ''', (email, senha_hash)).fetchone()
             
             if resultado:
-                usuario_id, nome, email, plano, projetos_mes, ultimo_reset = resultado
+                usuario_id, nome, email, plano, projetos_mes = resultado
                 
-                # Verificar se precisa resetar contador de projetos (novo mês)
-                hoje = datetime.now().date()
-                if ultimo_reset:
-                    ultimo_reset_date = datetime.strptime(ultimo_reset, '%Y-%m-%d').date()
-                    if hoje.month != ultimo_reset_date.month or hoje.year != ultimo_reset_date.year:
-                        # Resetar contador para novo mês
-                        cursor.execute('''
-                            UPDATE usuarios 
-                            SET projetos_mes = 0, ultimo_reset_projetos = ?
-                            WHERE id = ?
-                        ''', (hoje, usuario_id))
+                with self.banco.transacao() as conn:
+                    # Resetar contador de projetos se o mês virou
+                    if self._resetar_mes(conn, usuario_id):
                         projetos_mes = 0
-                
-                # Atualizar último login
-                cursor.execute('''
-                    UPDATE usuarios 
-                    SET data_ultimo_login = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', (usuario_id,))
-                
-                conn.commit()
-                conn.close()
+                    
+                    # Atualizar último login
+                    conn.execute('''
+                        UPDATE usuarios 
+                        SET data_ultimo_login = CURRENT_TIMESTAMP
+                        WHERE id = ?
+                    ''', (usuario_id,))
                 
                 return {
                     'id': usuario_id,
@@ -188,27 +390,180 @@ class AuthManager:
                     'projetos_mes': projetos_mes
                 }
             
-            conn.close()
             return None
             
         except Exception as e:
             print(f"Erro no login: {e}")
             return None
     
-    def incrementar_projeto(self, usuario_id: int) -> bool:
-        """Incrementa contador de projetos do usuário"""
+    def criar_sessao(self, usuario_id: int) -> Optional[str]:
+        """Abre uma sessão para o usuário e retorna o token (None em caso de erro)"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            token = secrets.token_urlsafe(32)
+            expiracao = time.time() + self.duracao_sessao_s
             
-            cursor.execute('''
-                UPDATE usuarios 
-                SET projetos_mes = projetos_mes + 1
-                WHERE id = ?
-            ''', (usuario_id,))
+            with self.banco.transacao() as conn:
+                conn.execute('''
+                    INSERT INTO sessoes (usuario_id, token, data_expiracao)
+                    VALUES (?, ?, ?)
+                ''', (usuario_id, _hash_token(token), _formatar_utc(expiracao)))
+            
+            self._limpar_se_devido()
+            return token
+            
+        except Exception as e:
+            print(f"Erro ao criar sessão: {e}")
+            return None
+    
+    def criar_ticket(self, token: str) -> Optional[str]:
+        """Ticket de uso único da sessão do token, para a URL (None se a sessão não vale mais)
+        
+        O token da sessão só fica no estado da sessão do Streamlit; a URL leva
+        o ticket, que recarregar a página troca por um token novo em
+        trocar_ticket. Um ticket novo invalida o anterior da mesma sessão.
+        """
+        try:
+            ticket = secrets.token_urlsafe(32)
+            with self.banco.transacao() as conn:
+                cursor = conn.execute('''
+                    UPDATE sessoes SET ticket = ?
+                    WHERE token = ? AND ativo = 1 AND data_expiracao > ?
+                ''', (_hash_token(ticket), _hash_token(token), _formatar_utc(time.time())))
+            return ticket if cursor.rowcount else None
+        
+        except Exception as e:
+            print(f"Erro ao criar ticket de sessão: {e}")
+            return None
+    
+    def trocar_ticket(self, ticket: str) -> Optional[Tuple[str, str]]:
+        """Troca o ticket da URL por (token, ticket novo) da mesma sessão, ou None
+        
+        O ticket vale uma vez: a troca gira o token e o ticket da sessão, então
+        uma URL já usada (histórico, logs, Referer) não abre a sessão de novo e
+        o token anterior deixa de valer (nos outros processos, após o TTL do
+        cache). A sessão mantém a expiração original.
+        """
+        if not ticket:
+            return None
+        
+        try:
+            token, novo_ticket = secrets.token_urlsafe(32), secrets.token_urlsafe(32)
+            with self.banco.transacao() as conn:
+                cursor = conn.execute('''
+                    UPDATE sessoes SET token = ?, ticket = ?
+                    WHERE ticket = ? AND ativo = 1 AND data_expiracao > ?
+                ''', (_hash_token(token), _hash_token(novo_ticket), _hash_token(ticket),
+                      _formatar_utc(time.time())))
+            return (token, novo_ticket) if cursor.rowcount else None
+        
+        except Exception as e:
+            print(f"Erro ao trocar ticket de sessão: {e}")
+            return None
+    
+    def validar_sessao(self, token: str) -> Optional[Dict]:
+        """Usuário da sessão do token, ou None se a sessão não existe, expirou ou foi encerrada
+        
+        Chamado a cada requisição: as sessões já validadas vêm do cache em
+        memória, sem consultar o banco; só a primeira validação do token neste
+        processo (ou a seguinte ao TTL do cache) lê a tabela sessoes.
+        """
+        if not token:
+            return None
+        
+        usuario = self.cache_sessoes.obter(token)
+        if usuario is not None:
+            return usuario
+        
+        try:
+            resultado = self.banco.conexao().execute('''
+                SELECT u.id, u.nome, u.email, u.plano, u.projetos_mes, u.ultimo_reset_projetos,
+                       s.data_expiracao
+                FROM sessoes s
+                JOIN usuarios u ON u.id = s.usuario_id
+                WHERE s.token = ? AND s.ativo = 1 AND s.data_expiracao > ? AND u.ativo = 1
+            ''', (_hash_token(token), _formatar_utc(time.time()))).fetchone()
+            
+            self._limpar_se_devido()
+            if not resultado:
+                return None
+            
+            usuario_id, nome, email, plano, projetos_mes, ultimo_reset, data_expiracao = resultado
+            # Contador de um mês anterior ainda não zerado (o reset é gravado no login ou ao salvar)
+            if not ultimo_reset or ultimo_reset < datetime.now().date().replace(day=1).isoformat():
+                projetos_mes = 0
+            usuario = {
+                'id': usuario_id,
+                'nome': nome,
+                'email': email,
+                'plano': plano,
+                'projetos_mes': projetos_mes
+            }
+            expiracao = datetime.strptime(data_expiracao, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+            self.cache_sessoes.guardar(token, usuario, expiracao.timestamp())
+            return usuario
             
-            conn.commit()
-            conn.close()
+        except Exception as e:
+            print(f"Erro ao validar sessão: {e}")
+            return None
+    
+    def encerrar_sessao(self, token: str) -> bool:
+        """Encerra a sessão (logout); outros processos ainda a aceitam até o TTL do cache deles"""
+        self.cache_sessoes.remover(token)
+        try:
+            with self.banco.transacao() as conn:
+                conn.execute("DELETE FROM sessoes WHERE token = ?", (_hash_token(token),))
+            return True
+            
+        except Exception as e:
+            print(f"Erro ao encerrar sessão: {e}")
+            return False
+    
+    def limpar_sessoes_expiradas(self, tamanho_lote: int = 500) -> int:
+        """Apaga do banco as sessões expiradas, em lotes, e retorna quantas foram apagadas
+        
+        Cada lote é uma transação curta (a busca usa idx_sessoes_expiracao),
+        então logins e gravações de projetos não esperam a limpeza inteira.
+        """
+        limite = _formatar_utc(time.time())
+        removidas = 0
+        try:
+            while True:
+                with self.banco.transacao() as conn:
+                    apagadas = conn.execute('''
+                        DELETE FROM sessoes WHERE id IN (
+                            SELECT id FROM sessoes WHERE data_expiracao <= ? LIMIT ?
+                        )
+                    ''', (limite, tamanho_lote)).rowcount
+                removidas += apagadas
+                if apagadas < tamanho_lote:
+                    break
+        except Exception as e:
+            print(f"Erro ao limpar sessões: {e}")
+        
+        self.cache_sessoes.remover_vencidas()
+        return removidas
+    
+    def _limpar_se_devido(self):
+        """Limpa as sessões expiradas se o intervalo passou; só uma thread limpa por vez"""
+        if time.monotonic() - self._ultima_limpeza < self.intervalo_limpeza_s:
+            return
+        if not self._trava_limpeza.acquire(blocking=False):
+            return
+        try:
+            self._ultima_limpeza = time.monotonic()
+            self.limpar_sessoes_expiradas()
+        finally:
+            self._trava_limpeza.release()
+    
+    def incrementar_projeto(self, usuario_id: int) -> bool:
+        """Incrementa contador de projetos do usuário"""
+        try:
+            with self.banco.transacao() as conn:
+                conn.execute('''
+                    UPDATE usuarios 
+                    SET projetos_mes = projetos_mes + 1
+                    WHERE id = ?
+                ''', (usuario_id,))
             return True
             
         except Exception as e:
@@ -242,67 +597,207 @@ class AuthManager:
         
         return limites.get(plano, limites['gratuito'])
     
-    def salvar_projeto(self, usuario_id: int, nome_arquivo: str, analise: Dict, orcamento: Dict) -> bool:
-        """Salva projeto do usuário"""
+    def salvar_projeto(self, usuario_id: int, nome_arquivo: str, analise: Dict, orcamento: Dict,
+                       geometria: Optional[RepositorioGeometria] = None) -> bool:
+        """Salva projeto do usuário, se houver cota no mês (ver salvar_projeto_com_cota)"""
+        return self.salvar_projeto_com_cota(usuario_id, nome_arquivo, analise, orcamento, geometria)['salvo']
+    
+    def salvar_projeto_com_cota(self, usuario_id: int, nome_arquivo: str, analise: Dict, orcamento: Dict,
+                                geometria: Optional[RepositorioGeometria] = None) -> Dict:
+        """Reserva a cota do mês e salva o projeto em uma única transação
+        
+        Análise, malhas (do repositório de geometria ou embutidas nos
+        componentes) e orçamento vão para o repositório de blobs; a linha do
+        projeto guarda só as referências. Na mesma transação o contador é zerado
+        se o mês virou e incrementado só se ainda estiver abaixo do limite do
+        plano (UPDATE condicional); sem vaga, nada é gravado. Uploads simultâneos
+        não ultrapassam o limite.
+        
+        Retorna {'salvo', 'projeto_id', 'projetos_mes', 'limite', 'erro'}, com o
+        uso do mês já atualizado para a interface.
+        """
+        resultado = {'salvo': False, 'projeto_id': None, 'projetos_mes': None, 'limite': None, 'erro': None}
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO projetos (usuario_id, nome_arquivo, dados_analise, dados_orcamento)
-                VALUES (?, ?, ?, ?)
-            ''', (
-                usuario_id,
-                nome_arquivo,
-                json.dumps(analise),
-                json.dumps(orcamento)
-            ))
+            # Serializar e comprimir antes de abrir a transação, para segurar a escrita o mínimo possível
+            analise_hash, preparados, referencias_malhas = preparar_analise(
+                analise, self.blobs, geometria, self._malhas_gravadas
+            )
+            preparados.append(self.blobs.preparar(json.dumps(orcamento)))
+            orcamento_hash = preparados[-1][0]
+            resumo = resumir_projeto(nome_arquivo, analise, orcamento)
+            
+            with self.banco.transacao() as conn:
+                usuario = conn.execute(
+                    "SELECT plano FROM usuarios WHERE id = ? AND ativo = 1", (usuario_id,)
+                ).fetchone()
+                if usuario is None:
+                    resultado['erro'] = "Usuário não encontrado"
+                    return resultado
+                
+                limite = self.obter_limites_plano(usuario[0])['projetos_mes']
+                self._resetar_mes(conn, usuario_id)
+                reservado = conn.execute('''
+                    UPDATE usuarios 
+                    SET projetos_mes = projetos_mes + 1
+                    WHERE id = ? AND projetos_mes < ?
+                ''', (usuario_id, limite)).rowcount
+                
+                if reservado:
+                    self.blobs.gravar(conn, preparados)
+                    resultado['projeto_id'] = conn.execute('''
+                        INSERT INTO projetos (usuario_id, nome_arquivo, analise_hash, orcamento_hash,
+                                              valor_final, area_total, componentes, formato)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', (usuario_id, nome_arquivo, analise_hash, orcamento_hash) + resumo).lastrowid
+                    resultado['salvo'] = True
+                else:
+                    resultado['erro'] = f"Limite de {limite} projetos/mês atingido"
+                
+                resultado['projetos_mes'] = conn.execute(
+                    "SELECT projetos_mes FROM usuarios WHERE id = ?", (usuario_id,)
+                ).fetchone()[0]
+                resultado['limite'] = limite
             
-            conn.commit()
-            conn.close()
+            if resultado['salvo']:
+                if len(self._malhas_gravadas) + len(referencias_malhas) > self.limite_malhas_gravadas:
+                    self._malhas_gravadas.clear()
+                self._malhas_gravadas.update(referencias_malhas)
+            return resultado
             
-            # Incrementar contador de projetos
-            self.incrementar_projeto(usuario_id)
+        except Exception as e:
+            print(f"Erro ao salvar projeto: {e}")
+            resultado['erro'] = str(e)
+            return resultado
+    
+    def _resetar_mes(self, conn, usuario_id: int) -> bool:
+        """Zera o contador de projetos se o último reset foi antes do mês atual"""
+        hoje = datetime.now().date()
+        return conn.execute('''
+            UPDATE usuarios 
+            SET projetos_mes = 0, ultimo_reset_projetos = ?
+            WHERE id = ? AND (ultimo_reset_projetos IS NULL OR ultimo_reset_projetos < ?)
+        ''', (hoje.isoformat(), usuario_id, hoje.replace(day=1).isoformat())).rowcount > 0
+    
+    def carregar_projeto(self, projeto_id: int, usuario_id: int, com_geometria: bool = False) -> Optional[Dict]:
+        """Carrega um projeto do usuário (análise e orçamento) a partir dos blobs
+        
+        Com com_geometria, 'geometrias' da análise traz as malhas em vez dos
+        hashes; sem, nenhuma malha é lida.
+        """
+        try:
+            conn = self.banco.conexao()
+            linha = conn.execute('''
+                SELECT nome_arquivo, analise_hash, orcamento_hash, data_criacao
+                FROM projetos
+                WHERE id = ? AND usuario_id = ?
+            ''', (projeto_id, usuario_id)).fetchone()
+            if linha is None:
+                return None
+            
+            nome_arquivo, analise_hash, orcamento_hash, data_criacao = linha
+            conteudos = self.blobs.ler(conn, [analise_hash, orcamento_hash])
+            analise = json.loads(conteudos[analise_hash]) if analise_hash in conteudos else {}
+            orcamento = json.loads(conteudos[orcamento_hash]) if orcamento_hash in conteudos else {}
+            
+            if com_geometria and analise.get('geometrias'):
+                malhas = self.blobs.ler(conn, analise['geometrias'].values())
+                analise['geometrias'] = {
+                    geometria_id: json.loads(malhas[hash_malha])
+                    for geometria_id, hash_malha in analise['geometrias'].items() if hash_malha in malhas
+                }
             
-            return True
+            return {
+                'id': projeto_id,
+                'nome_arquivo': nome_arquivo,
+                'data_criacao': data_criacao,
+                'analise': analise,
+                'orcamento': orcamento
+            }
             
         except Exception as e:
-            print(f"Erro ao salvar projeto: {e}")
-            return False
+            print(f"Erro ao carregar projeto: {e}")
+            return None
     
     def listar_projetos_usuario(self, usuario_id: int) -> List[Dict]:
-        """Lista projetos do usuário"""
+        """Lista todos os projetos do usuário (para telas, prefira listar_projetos_pagina)"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT id, nome_arquivo, data_criacao
+            cursor = self.banco.conexao().execute(f'''
+                SELECT {COLUNAS_LISTAGEM}
                 FROM projetos
                 WHERE usuario_id = ?
-                ORDER BY data_criacao DESC
+                ORDER BY data_criacao DESC, id DESC
             ''', (usuario_id,))
             
-            projetos = []
-            for row in cursor.fetchall():
-                projetos.append({
-                    'id': row[0],
-                    'nome_arquivo': row[1],
-                    'data_criacao': row[2]
-                })
-            
-            conn.close()
-            return projetos
+            return [_projeto_listado(row) for row in cursor.fetchall()]
             
         except Exception as e:
             print(f"Erro ao listar projetos: {e}")
             return []
     
+    def listar_projetos_pagina(self, usuario_id: int, limite: int = 20, cursor: Optional[str] = None,
+                               formato: Optional[str] = None, busca: Optional[str] = None,
+                               data_inicio: Optional[str] = None, data_fim: Optional[str] = None,
+                               valor_minimo: Optional[float] = None, valor_maximo: Optional[float] = None) -> Dict:
+        """Uma página dos projetos do usuário, do mais recente ao mais antigo
+        
+        cursor é o 'proximo_cursor' da página anterior (None na primeira): a
+        página continua do ponto (data_criacao, id) em que a anterior parou, com
+        uma busca no índice (usuario_id, data_criacao), então o custo não cresce
+        com o número de páginas já vistas. Filtros: formato ('OBJ'), busca no
+        nome do arquivo, período de criação ('AAAA-MM-DD', fim inclusive) e faixa
+        de valor_final. Retorna {'projetos': [...], 'proximo_cursor': str ou None}.
+        """
+        try:
+            condicoes = ["usuario_id = ?"]
+            parametros = [usuario_id]
+            
+            if cursor:
+                data_cursor, id_cursor = cursor.rsplit('|', 1)
+                condicoes.append("(data_criacao, id) < (?, ?)")
+                parametros += [data_cursor, int(id_cursor)]
+            if formato:
+                condicoes.append("formato = ?")
+                parametros.append(formato.upper())
+            if busca:
+                condicoes.append("nome_arquivo LIKE ? ESCAPE '\\'")
+                parametros.append('%' + busca.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+            if data_inicio:
+                condicoes.append("data_criacao >= ?")
+                parametros.append(str(data_inicio)[:10])
+            if data_fim:
+                condicoes.append("data_criacao < ?")
+                parametros.append((datetime.strptime(str(data_fim)[:10], '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d'))
+            if valor_minimo is not None:
+                condicoes.append("valor_final >= ?")
+                parametros.append(valor_minimo)
+            if valor_maximo is not None:
+                condicoes.append("valor_final <= ?")
+                parametros.append(valor_maximo)
+            
+            # Uma linha a mais indica se existe a próxima página
+            linhas = self.banco.conexao().execute(f'''
+                SELECT {COLUNAS_LISTAGEM}
+                FROM projetos
+                WHERE {' AND '.join(condicoes)}
+                ORDER BY data_criacao DESC, id DESC
+                LIMIT ?
+            ''', parametros + [limite + 1]).fetchall()
+            
+            projetos = [_projeto_listado(row) for row in linhas[:limite]]
+            proximo_cursor = None
+            if len(linhas) > limite:
+                proximo_cursor = f"{projetos[-1]['data_criacao']}|{projetos[-1]['id']}"
+            
+            return {'projetos': projetos, 'proximo_cursor': proximo_cursor}
+            
+        except Exception as e:
+            print(f"Erro ao listar projetos: {e}")
+            return {'projetos': [], 'proximo_cursor': None}
+    
     def obter_estatisticas_usuario(self, usuario_id: int) -> Dict:
         """Obtém estatísticas do usuário"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            cursor = self.banco.conexao().cursor()
             
             # Contar projetos totais
             cursor.execute('''
@@ -311,10 +806,11 @@ class AuthManager:
             total_projetos = cursor.fetchone()[0]
             
             # Contar projetos este mês
+            inicio_mes, fim_mes = intervalo_mes()
             cursor.execute('''
                 SELECT COUNT(*) FROM projetos 
-                WHERE usuario_id = ? AND strftime('%Y-%m', data_criacao) = strftime('%Y-%m', 'now')
-            ''', (usuario_id,))
+                WHERE usuario_id = ? AND data_criacao >= ? AND data_criacao < ?
+            ''', (usuario_id, inicio_mes, fim_mes))
             projetos_mes = cursor.fetchone()[0]
             
             # Obter dados do usuário
@@ -323,8 +819,6 @@ class AuthManager:
             ''', (usuario_id,))
             usuario_data = cursor.fetchone()
             
-            conn.close()
-            
             if usuario_data:
                 plano, data_criacao = usuario_data
                 return {
@@ -341,20 +835,21 @@ class AuthManager:
             return {}
     
     def validar_limite_projeto(self, usuario_id: int) -> bool:
-        """Valida se usuário pode criar novo projeto"""
+        """Valida se usuário pode criar novo projeto
+        
+        Só informativo: a cota é garantida por salvar_projeto_com_cota, na
+        mesma transação que grava o projeto.
+        """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT plano, projetos_mes FROM usuarios WHERE id = ?
-            ''', (usuario_id,))
-            
-            resultado = cursor.fetchone()
-            conn.close()
+            resultado = self.banco.conexao().execute('''
+                SELECT plano, projetos_mes, ultimo_reset_projetos FROM usuarios WHERE id = ?
+            ''', (usuario_id,)).fetchone()
             
             if resultado:
-                plano, projetos_mes = resultado
+                plano, projetos_mes, ultimo_reset = resultado
+                # Contador de um mês anterior ainda não zerado
+                if not ultimo_reset or ultimo_reset < datetime.now().date().replace(day=1).isoformat():
+                    projetos_mes = 0
                 limites = self.obter_limites_plano(plano)
                 return projetos_mes < limites['projetos_mes']
             
@@ -364,3 +859,19 @@ class AuthManager:
             print(f"Erro ao validar limite: {e}")
             return False
 
+
+if __name__ == "__main__":
+    # Setup da implantação: aplica as migrações; --demo cria as contas demo e
+    # --limpar-sessoes apaga as sessões expiradas e --vacuum devolve ao disco o
+    # espaço liberado (ex.: após mover os dados para blobs)
+    argumentos = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    auth = AuthManager(argumentos[0] if argumentos else "usuarios.db")
+    print(f"Schema na versão {auth.banco.versao_schema}")
+    if '--demo' in sys.argv[1:]:
+        auth.criar_usuarios_demo()
+        print("Usuários demo criados")
+    if '--limpar-sessoes' in sys.argv[1:]:
+        print(f"{auth.limpar_sessoes_expiradas()} sessões expiradas removidas")
+    if '--vacuum' in sys.argv[1:]:
+        auth.banco.conexao().execute("VACUUM")
+        print("Banco compactado")
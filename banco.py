@@ -0,0 +1,192 @@
+"""
+Banco de Dados - Orca Interiores SaaS
+Pool de conexões SQLite configuradas, em modo WAL, compartilhado pelo processo
+"""
+
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Tuple, Union
+
+
+class _ConexaoThread:
+    """Conexão emprestada do pool a uma thread; ao ser coletado (fim da thread) volta ao pool"""
+
+    def __init__(self, conn: sqlite3.Connection, devolver: Callable[[sqlite3.Connection], None]):
+        self.conexao = conn
+        self.devolver = weakref.finalize(self, devolver, conn)
+
+
+class BancoDados:
+    # Um gerenciador por arquivo de banco, compartilhado por todas as sessões do processo
+    _instancias: Dict[str, 'BancoDados'] = {}
+    _trava_instancias = threading.Lock()
+
+    def __init__(self, db_path: str, busy_timeout_ms: int = 5000, cache_kb: int = 16_384,
+                 mmap_bytes: int = 256 * 1024 * 1024, statements_em_cache: int = 256,
+                 tamanho_pool: int = 8):
+        """Pool de conexões SQLite já configuradas, emprestadas uma por thread
+
+        A primeira chamada de uma thread (rerun do Streamlit, job em segundo
+        plano) pega uma conexão ociosa do pool, com os PRAGMAs aplicados e o
+        cache de statements preparados dela, e só abre uma nova se o pool estiver
+        vazio. Quando a thread termina a conexão volta ao pool; acima de
+        tamanho_pool conexões ociosas ela é fechada. O banco roda em WAL:
+        leitores não bloqueiam o escritor e vice-versa; escritas concorrentes
+        esperam até busy_timeout_ms em vez de falhar com "database is locked".
+        """
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_kb = cache_kb
+        self.mmap_bytes = mmap_bytes
+        self.statements_em_cache = statements_em_cache
+        self.tamanho_pool = tamanho_pool
+        self._local = threading.local()
+        self._livres = []
+        self._conexoes = weakref.WeakSet()
+        self._trava = threading.Lock()
+        self._trava_migracao = threading.Lock()
+        self.versao_schema = None
+
+    @classmethod
+    def obter(cls, db_path: str) -> 'BancoDados':
+        """Gerenciador compartilhado do banco em db_path"""
+        with cls._trava_instancias:
+            if db_path not in cls._instancias:
+                cls._instancias[db_path] = cls(db_path)
+            return cls._instancias[db_path]
+
+    def conexao(self) -> sqlite3.Connection:
+        """Conexão desta thread (emprestada do pool na primeira chamada)
+
+        A conexão fica em autocommit: leituras não abrem transação e escritas
+        devem usar transacao().
+        """
+        atual = getattr(self._local, 'conexao', None)
+        if atual is None:
+            with self._trava:
+                conn = self._livres.pop() if self._livres else None
+            # Só o thread-local referencia o portador: ele some (e devolve a conexão) com a thread
+            atual = _ConexaoThread(conn or self._abrir(), self._devolver)
+            self._local.conexao = atual
+            with self._trava:
+                self._conexoes.add(atual)
+        return atual.conexao
+
+    def _abrir(self) -> sqlite3.Connection:
+        """Abre e configura uma conexão nova"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self.statements_em_cache
+        )
+        conn.execute("PRAGMA journal_mode = WAL")
+        # Em WAL, NORMAL só sincroniza nos checkpoints e continua seguro contra corrupção
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_kb)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_bytes)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    def _devolver(self, conn: sqlite3.Connection):
+        """Devolve ao pool a conexão de uma thread encerrada (ou a fecha, com o pool cheio)"""
+        try:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            with self._trava:
+                if len(self._livres) < self.tamanho_pool:
+                    self._livres.append(conn)
+                    return
+        except sqlite3.Error:
+            pass
+        conn.close()
+
+    @contextmanager
+    def transacao(self) -> Iterator[sqlite3.Connection]:
+        """Transação de escrita (BEGIN IMMEDIATE): commit ao sair, rollback em erro
+
+        IMMEDIATE reserva a escrita já no início, então duas sessões não ficam
+        presas tentando promover uma leitura a escrita ao mesmo tempo.
+        """
+        conn = self.conexao()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+    def migrar(self, migracoes: List[Tuple[int, str, List[Union[str, Callable]]]]) -> int:
+        """Aplica as migrações pendentes, em ordem de versão, e retorna a versão do schema
+
+        Cada migração é (versão, descrição, comandos) e fica registrada em
+        schema_version; um comando é SQL ou uma função que recebe a conexão,
+        para migrações de dados. A versão aplicada é guardada no gerenciador, então só a
+        primeira chamada do processo consulta o banco; as migrações pendentes
+        rodam numa única transação, e outro processo que chegue ao mesmo tempo
+        encontra a versão já atualizada.
+        """
+        alvo = max(versao for versao, _, _ in migracoes)
+        if self.versao_schema is not None and self.versao_schema >= alvo:
+            return self.versao_schema
+
+        with self._trava_migracao:
+            conn = self.conexao()
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    versao INTEGER PRIMARY KEY,
+                    descricao TEXT NOT NULL,
+                    data_aplicacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            atual = conn.execute("SELECT COALESCE(MAX(versao), 0) FROM schema_version").fetchone()[0]
+
+            if atual < alvo:
+                with self.transacao() as conn:
+                    # Relido dentro da transação: outro processo pode ter migrado nesse intervalo
+                    atual = conn.execute("SELECT COALESCE(MAX(versao), 0) FROM schema_version").fetchone()[0]
+                    for versao, descricao, comandos in sorted(migracoes):
+                        if versao <= atual:
+                            continue
+                        for comando in comandos:
+                            if callable(comando):
+                                comando(conn)
+                            else:
+                                conn.execute(comando)
+                        conn.execute(
+                            "INSERT INTO schema_version (versao, descricao) VALUES (?, ?)", (versao, descricao)
+                        )
+                        atual = versao
+
+            self.versao_schema = atual
+        return atual
+
+    def fechar(self):
+        """Fecha a conexão da thread atual (em vez de devolvê-la ao pool)"""
+        atual = getattr(self._local, 'conexao', None)
+        if atual is not None:
+            self._local.conexao = None
+            with self._trava:
+                self._conexoes.discard(atual)
+            atual.devolver.detach()
+            atual.conexao.close()
+
+    def fechar_todas(self):
+        """Fecha todas as conexões do gerenciador, emprestadas e ociosas (fim do processo ou testes)"""
+        with self._trava:
+            emprestadas, self._conexoes = list(self._conexoes), weakref.WeakSet()
+            ociosas, self._livres = self._livres, []
+        for atual in emprestadas:
+            atual.devolver.detach()
+        for conn in [atual.conexao for atual in emprestadas] + ociosas:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
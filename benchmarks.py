@@ -0,0 +1,1046 @@
+"""
+Benchmarks - Orca Interiores SaaS
+Medições de desempenho dos módulos do sistema
+
+Uso: python benchmarks.py [nome_do_benchmark ...]
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+import tracemalloc
+from decimal import Decimal
+from typing import Dict, List
+import numpy as np
+
+from plano_corte import OtimizadorCorte
+from catalogo_precos import CatalogoPrecos, CAMINHO_PADRAO
+from orcamento_engine import OrcamentoEngine
+from auth_manager import AuthManager, COLUNAS_LISTAGEM, preparar_analise
+from banco import BancoDados
+from reprecificacao import ReprecificadorProjetos
+
+
+def gerar_paineis_sinteticos(conjunto: str, quantidade: int, semente: int = 42) -> Dict[str, np.ndarray]:
+    """Gera conjuntos sintéticos de painéis (mm) com perfis típicos de projetos"""
+    rng = np.random.default_rng(semente)
+
+    if conjunto == 'cozinha':
+        # Laterais, bases, portas e gavetas de módulos de cozinha
+        larguras = rng.choice([300, 400, 450, 600, 800, 900, 1200], quantidade).astype(float)
+        alturas = rng.choice([150, 200, 350, 560, 700, 720], quantidade).astype(float)
+    elif conjunto == 'roupeiro':
+        # Painéis altos de roupeiros e closets
+        larguras = rng.uniform(400, 600, quantidade).round()
+        alturas = rng.choice([450, 550, 1800, 2100, 2400], quantidade).astype(float)
+    elif conjunto == 'comercial':
+        # Muitas peças pequenas de mobiliário comercial
+        larguras = rng.uniform(100, 700, quantidade).round()
+        alturas = rng.uniform(80, 500, quantidade).round()
+    else:
+        larguras = rng.uniform(50, 2500, quantidade).round()
+        alturas = rng.uniform(50, 1600, quantidade).round()
+
+    return {'largura_mm': larguras, 'altura_mm': alturas}
+
+
+def benchmark_plano_corte(quantidades: List[int] = (200, 2000, 5000), repeticoes: int = 3) -> List[Dict]:
+    """Tempo e aproveitamento do plano de corte para conjuntos sintéticos de painéis"""
+    otimizador = OtimizadorCorte()
+    resultados = []
+
+    for conjunto in ['cozinha', 'roupeiro', 'comercial', 'aleatorio']:
+        for quantidade in quantidades:
+            paineis = gerar_paineis_sinteticos(conjunto, quantidade)
+            tempos = []
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                plano = otimizador.otimizar(paineis['largura_mm'], paineis['altura_mm'])
+                tempos.append(time.perf_counter() - inicio)
+
+            resultados.append({
+                'conjunto': conjunto,
+                'paineis': quantidade,
+                'tempo_ms': round(min(tempos) * 1000, 1),
+                'chapas': plano['chapas'],
+                'aproveitamento_pct': plano['aproveitamento_pct']
+            })
+
+    return resultados
+
+
+def gerar_projetos_sinteticos(db_path: str, quantidade: int, componentes_por_projeto: int = 20,
+                              semente: int = 42):
+    """Cria um banco com projetos salvos (análise e orçamento) para os benchmarks"""
+    rng = np.random.default_rng(semente)
+    engine = OrcamentoEngine()
+    tipos = list(engine.codigos_tipos)
+    materiais = list(engine.codigos_materiais)
+
+    auth = AuthManager(db_path)
+    preparados = []
+
+    linhas = []
+    for i in range(quantidade):
+        analise = {'componentes': [
+            {'nome': f'{tipo}_{j}', 'tipo': tipo, 'area_m2': round(float(area), 3)}
+            for j, (tipo, area) in enumerate(zip(
+                rng.choice(tipos, componentes_por_projeto),
+                rng.uniform(0.1, 2.5, componentes_por_projeto)
+            ))
+        ]}
+        orcamento = {
+            'resumo': {'valor_final': round(float(rng.uniform(2000, 40000)), 2)},
+            'configuracoes': {
+                'material': materiais[i % len(materiais)],
+                'qualidade_acessorios': 'premium' if i % 3 == 0 else 'comum',
+                'complexidade': 'media',
+                'margem_lucro': 30
+            },
+            'versao_catalogo': 'antiga'
+        }
+        analise_hash, blobs_analise, _ = preparar_analise(analise, auth.blobs)
+        preparados.extend(blobs_analise)
+        preparados.append(auth.blobs.preparar(json.dumps(orcamento)))
+        linhas.append((i % 50 + 1, f'projeto_{i}.obj', analise_hash, preparados[-1][0]))
+
+    with auth.banco.transacao() as conn:
+        auth.blobs.gravar(conn, preparados)
+        conn.executemany(
+            "INSERT INTO projetos (usuario_id, nome_arquivo, analise_hash, orcamento_hash) VALUES (?, ?, ?, ?)",
+            linhas
+        )
+
+
+def benchmark_reprecificacao(quantidades: List[int] = (1000, 10000, 100000)) -> List[Dict]:
+    """Vazão da reprecificação em lote sobre bancos sintéticos de projetos salvos"""
+    resultados = []
+
+    for quantidade in quantidades:
+        with tempfile.TemporaryDirectory() as pasta:
+            db_path = os.path.join(pasta, 'projetos.db')
+            gerar_projetos_sinteticos(db_path, quantidade)
+            resumo = ReprecificadorProjetos(db_path).executar()
+            BancoDados.obter(db_path).fechar_todas()
+
+        resultados.append({
+            'projetos': quantidade,
+            'reprecificados': resumo['reprecificados'],
+            'tempo_s': resumo['tempo_s'],
+            'projetos_por_s': resumo['projetos_por_s']
+        })
+
+    return resultados
+
+
+def benchmark_fornecedores(fornecedores: List[int] = (1, 10, 40), componentes: List[int] = (500, 5000),
+                           semente: int = 42) -> List[Dict]:
+    """Tempo da cotação por fornecedor com catálogos sintéticos de N fornecedores"""
+    rng = np.random.default_rng(semente)
+    resultados = []
+    with open(CAMINHO_PADRAO, encoding='utf-8') as arquivo:
+        catalogo = json.load(arquivo)
+
+    for quantidade_fornecedores in fornecedores:
+        dados = json.loads(json.dumps(catalogo))
+        dados['fornecedores'] = {
+            f'fornecedor_{i}': {
+                'materiais': {
+                    material: round(float(preco * rng.uniform(0.85, 1.2)), 2)
+                    for material, preco in catalogo['materiais'].items() if rng.random() < 0.8
+                },
+                'acessorios': {
+                    tipo: {qualidade: {'kit': round(float(sum(itens.values()) * rng.uniform(0.8, 1.3)), 2)}
+                           for qualidade, itens in qualidades.items()}
+                    for tipo, qualidades in catalogo['acessorios'].items() if rng.random() < 0.7
+                },
+                'pedido_minimo': round(float(rng.uniform(0, 3000)), 2),
+                'frete': round(float(rng.uniform(0, 300)), 2),
+                'frete_gratis_acima': round(float(rng.uniform(2000, 20000)), 2)
+            }
+            for i in range(1, quantidade_fornecedores)
+        }
+
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, 'catalogo.json')
+            with open(caminho, 'w', encoding='utf-8') as arquivo:
+                json.dump(dados, arquivo)
+            engine = OrcamentoEngine(CatalogoPrecos(caminho))
+
+        tipos = list(engine.codigos_tipos)
+        for quantidade in componentes:
+            analise = {'componentes': [
+                {'nome': f'componente_{i}', 'tipo': tipo, 'area_m2': float(area)}
+                for i, (tipo, area) in enumerate(zip(rng.choice(tipos, quantidade), rng.uniform(0.1, 2.5, quantidade)))
+            ]}
+            inicio = time.perf_counter()
+            cotacao = engine.cotar_fornecedores(analise, {'material': 'mdf_18mm'})
+            tempo = time.perf_counter() - inicio
+
+            resultados.append({
+                'fornecedores': quantidade_fornecedores,
+                'componentes': quantidade,
+                'itens': len(cotacao['itens']),
+                'tempo_ms': round(tempo * 1000, 1),
+                'usados': len(cotacao['fornecedores']),
+                'economia': cotacao['economia']
+            })
+
+    return resultados
+
+
+def benchmark_risco(componentes: List[int] = (100, 1000, 5000), amostras: List[int] = (10000,),
+                    semente: int = 42) -> List[Dict]:
+    """Tempo e pico de memória da simulação de risco (Monte Carlo)"""
+    rng = np.random.default_rng(semente)
+    engine = OrcamentoEngine()
+    tipos = list(engine.codigos_tipos)
+    resultados = []
+
+    for quantidade in componentes:
+        colunas = engine.montar_colunas([
+            {'nome': f'componente_{i}', 'tipo': tipo, 'area_m2': float(area)}
+            for i, (tipo, area) in enumerate(zip(rng.choice(tipos, quantidade), rng.uniform(0.1, 2.5, quantidade)))
+        ])
+        for quantidade_amostras in amostras:
+            tracemalloc.start()
+            inicio = time.perf_counter()
+            risco = engine.simular_risco(colunas, 'mdf_15mm', 'comum', 'media', 0.3, amostras=quantidade_amostras)
+            tempo = time.perf_counter() - inicio
+            pico = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            resultados.append({
+                'componentes': quantidade,
+                'amostras': quantidade_amostras,
+                'tempo_ms': round(tempo * 1000, 1),
+                'pico_mb': round(pico / 1_000_000, 1),
+                'p50': risco['p50'],
+                'p90': risco['p90']
+            })
+
+    return resultados
+
+
+def verificar_centavos(projetos: int = 300, semente: int = 42) -> List[Dict]:
+    """Divergências dos totais em centavos e em float contra a referência em Decimal
+
+    Projetos aleatórios (tamanho, áreas, quantidades, perímetros e configurações);
+    mede a deriva do caminho em float. A referência e a garantia do modo em
+    centavos estão no teste tests/test_centavos.py (python -m pytest).
+    """
+    from tests.test_centavos import orcamento_decimal
+
+    rng = np.random.default_rng(semente)
+    engine = OrcamentoEngine()
+    tipos = list(engine.codigos_tipos) + ['desconhecido']
+    chaves = ['custo_material', 'custo_acessorios', 'custo_corte', 'subtotal', 'valor_lucro', 'valor_final']
+    divergencias_centavos = 0
+    divergencias_float = 0
+    maior_diferenca_float = 0.0
+
+    for _ in range(projetos):
+        n = int(rng.integers(1, 3000))
+        componentes = []
+        for tipo, area, quantidade, perimetro in zip(
+            rng.choice(tipos, n), rng.uniform(0.01, 6.0, n), rng.integers(1, 20, n), rng.uniform(0.5, 20, n)
+        ):
+            comp = {'nome': str(tipo), 'tipo': str(tipo), 'area_m2': float(area), 'quantidade': int(quantidade)}
+            if rng.random() < 0.5:
+                comp['perimetro_m'] = float(perimetro)
+            componentes.append(comp)
+
+        configuracoes = {
+            'material': str(rng.choice(list(engine.codigos_materiais))),
+            'qualidade_acessorios': str(rng.choice(list(engine.codigos_qualidades))),
+            'complexidade': str(rng.choice(list(engine.multiplicadores_complexidade))),
+            'margem_lucro': int(rng.integers(10, 51))
+        }
+        referencia = orcamento_decimal(engine, componentes, configuracoes)
+
+        for centavos in (True, False):
+            resumo = engine.calcular_orcamento_colunar(
+                {'componentes': componentes}, {**configuracoes, 'centavos': centavos}
+            )['resumo']
+            deriva = max(abs(Decimal(str(resumo[chave])) - referencia[chave]) for chave in chaves)
+            if centavos:
+                divergencias_centavos += deriva > 0
+            else:
+                divergencias_float += deriva > 0
+                maior_diferenca_float = max(maior_diferenca_float, float(deriva))
+
+    return [{
+        'projetos': projetos,
+        'divergencias_centavos': int(divergencias_centavos),
+        'divergencias_float': int(divergencias_float),
+        'maior_diferenca_float': round(maior_diferenca_float, 2)
+    }]
+
+
+def benchmark_centavos(componentes: List[int] = (1000, 100000, 1000000), repeticoes: int = 3,
+                       semente: int = 42) -> List[Dict]:
+    """Tempo do custeio colunar em float e em centavos inteiros"""
+    rng = np.random.default_rng(semente)
+    engine = OrcamentoEngine()
+    tipos = list(engine.codigos_tipos)
+    resultados = []
+
+    for quantidade in componentes:
+        colunas = engine.montar_colunas([
+            {'nome': f'componente_{i}', 'tipo': tipo, 'area_m2': float(area)}
+            for i, (tipo, area) in enumerate(zip(rng.choice(tipos, quantidade), rng.uniform(0.1, 2.5, quantidade)))
+        ])
+        resultado = {'componentes': quantidade}
+        for modo, centavos in (('float', False), ('centavos', True)):
+            tempos = []
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                custos = engine.calcular_custos_colunar(colunas, 'mdf_15mm', 'comum', 'media', centavos=centavos)
+                engine.resumir_custos(colunas, custos, 0.3)
+                tempos.append(time.perf_counter() - inicio)
+            resultado[f'{modo}_ms'] = round(min(tempos) * 1000, 2)
+        resultados.append(resultado)
+
+    return resultados
+
+
+def benchmark_pdf(componentes: List[int] = (50, 5000, 20000), semente: int = 42) -> List[Dict]:
+    """Tempo por página e pico de memória da exportação do orçamento em PDF
+
+    O PDF é escrito em arquivo temporário; o pico de memória deve acompanhar o
+    orçamento em si, não o número de páginas já escritas.
+    """
+    rng = np.random.default_rng(semente)
+    engine = OrcamentoEngine()
+    tipos = list(engine.codigos_tipos)
+    resultados = []
+
+    for quantidade in componentes:
+        orcamento = engine.calcular_orcamento_completo({'componentes': [
+            {'nome': f'componente_{i}', 'tipo': tipo, 'area_m2': float(area)}
+            for i, (tipo, area) in enumerate(zip(rng.choice(tipos, quantidade), rng.uniform(0.1, 2.5, quantidade)))
+        ]}, {'material': 'mdf_15mm', 'qualidade_acessorios': 'comum', 'complexidade': 'media', 'margem_lucro': 30})
+
+        with tempfile.TemporaryFile() as arquivo:
+            tracemalloc.start()
+            inicio = time.perf_counter()
+            paginas = engine.exportar_pdf(orcamento, arquivo, "Cliente", "Ambiente", agrupar_por='tipo')
+            tempo = time.perf_counter() - inicio
+            pico = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            tamanho = arquivo.tell()
+
+        resultados.append({
+            'componentes': quantidade,
+            'paginas': paginas,
+            'tempo_ms': round(tempo * 1000, 1),
+            'ms_por_pagina': round(tempo * 1000 / paginas, 2),
+            'pico_mb': round(pico / 1_000_000, 2),
+            'tamanho_kb': round(tamanho / 1024, 1)
+        })
+
+    return resultados
+
+
+def benchmark_exportacao(componentes: List[int] = (100, 1000), vertices: List[int] = (100, 1000),
+                         semente: int = 42) -> List[Dict]:
+    """Tamanho e tempo de cada perfil de exportação, variando itens e vértices por componente
+
+    O json.dumps do orçamento inteiro (exportação anterior) entra como referência;
+    os perfis devem depender só do número de itens.
+    """
+    rng = np.random.default_rng(semente)
+    engine = OrcamentoEngine()
+    tipos = list(engine.codigos_tipos)
+    resultados = []
+
+    for quantidade in componentes:
+        for quantidade_vertices in vertices:
+            malha = {
+                'vertices': rng.uniform(0, 1000, (quantidade_vertices, 3)).round(1).tolist(),
+                'faces': rng.integers(0, quantidade_vertices, (quantidade_vertices * 2, 3)).tolist()
+            }
+            orcamento = engine.calcular_orcamento_completo({'componentes': [
+                {'nome': f'componente_{i}', 'tipo': tipo, 'area_m2': float(area), **malha}
+                for i, (tipo, area) in enumerate(zip(rng.choice(tipos, quantidade), rng.uniform(0.1, 2.5, quantidade)))
+            ]}, {'material': 'mdf_15mm'})
+
+            resultado = {'componentes': quantidade, 'vertices': quantidade_vertices}
+            inicio = time.perf_counter()
+            tamanho = len(json.dumps(orcamento, indent=2, ensure_ascii=False).encode('utf-8'))
+            resultado['anterior_ms'] = round((time.perf_counter() - inicio) * 1000, 1)
+            resultado['anterior_kb'] = round(tamanho / 1024, 1)
+
+            for perfil in ('resumo', 'jsonl', 'parquet'):
+                with tempfile.TemporaryFile() as arquivo:
+                    inicio = time.perf_counter()
+                    if perfil == 'parquet':
+                        engine.exportar(orcamento, arquivo, perfil)
+                    else:
+                        texto = io.TextIOWrapper(arquivo, encoding='utf-8')
+                        engine.exportar(orcamento, texto, perfil)
+                        texto.flush()
+                    resultado[f'{perfil}_ms'] = round((time.perf_counter() - inicio) * 1000, 1)
+                    resultado[f'{perfil}_kb'] = round(arquivo.seek(0, 2) / 1024, 1)
+            resultados.append(resultado)
+
+    return resultados
+
+
+def gerar_obj_sintetico(componentes: int, vertices_por_componente: int, semente: int = 42) -> bytes:
+    """Arquivo OBJ com componentes nomeados, cada um com uma malha triangular aleatória"""
+    rng = np.random.default_rng(semente)
+    tipos = ['armario', 'gaveta', 'porta', 'prateleira', 'painel']
+    linhas = []
+    base = 1
+    for c in range(componentes):
+        linhas.append(f"o {tipos[c % len(tipos)]}_{c}")
+        pontos = rng.uniform(0, 600, (vertices_por_componente, 3)) + [c * 700, 0, 0]
+        linhas.extend(f"v {x:.2f} {y:.2f} {z:.2f}" for x, y, z in pontos)
+        faces = rng.integers(0, vertices_por_componente, (vertices_por_componente, 3)) + base
+        linhas.extend(f"f {a} {b} {d}" for a, b, d in faces)
+        base += vertices_por_componente
+    return "\n".join(linhas).encode()
+
+
+def benchmark_geometria(componentes: List[int] = (50, 200), vertices: List[int] = (500, 2000)) -> List[Dict]:
+    """Memória da sessão (análise + orçamento) e tamanho do orçamento serializado,
+    com a geometria copiada em cada componente e com o repositório de geometria"""
+    from file_analyzer import FileAnalyzer
+    from geometria import RepositorioGeometria
+
+    analisador = FileAnalyzer()
+    engine = OrcamentoEngine()
+    resultados = []
+
+    for quantidade in componentes:
+        for quantidade_vertices in vertices:
+            conteudo = gerar_obj_sintetico(quantidade, quantidade_vertices)
+            resultado = {'componentes': quantidade, 'vertices': quantidade_vertices}
+
+            for modo in ('copia', 'repositorio'):
+                arquivo = io.BytesIO(conteudo)
+                arquivo.name = 'sintetico.obj'
+                tracemalloc.start()
+                geometria = RepositorioGeometria() if modo == 'repositorio' else None
+                analise = analisador.analisar_arquivo_3d(arquivo, geometria=geometria)
+                orcamento = engine.calcular_orcamento_completo(analise, {'material': 'mdf_15mm'})
+                if modo == 'copia':
+                    # Modelo anterior: cada linha do orçamento com a própria cópia da malha
+                    for item, comp in zip(orcamento['componentes'], analise['componentes']):
+                        item['vertices'] = [list(v) for v in comp['vertices']]
+                        item['faces'] = [list(f) for f in comp['faces']]
+                memoria = tracemalloc.get_traced_memory()[0]
+                tracemalloc.stop()
+
+                inicio = time.perf_counter()
+                tamanho = len(json.dumps(orcamento))
+                resultado[f'{modo}_sessao_mb'] = round(memoria / 1_000_000, 1)
+                resultado[f'{modo}_orcamento_kb'] = round(tamanho / 1024, 1)
+                resultado[f'{modo}_serializacao_ms'] = round((time.perf_counter() - inicio) * 1000, 1)
+                del analise, orcamento, geometria
+            resultados.append(resultado)
+
+    return resultados
+
+
+def benchmark_materiais(componentes: List[int] = (1000, 10000, 100000), semente: int = 42) -> List[Dict]:
+    """Projeto com materiais mistos (usemtl): group-by vetorizado contra custeio componente a componente"""
+    rng = np.random.default_rng(semente)
+    engine = OrcamentoEngine()
+    tipos = list(engine.codigos_tipos)
+    materiais_modelo = ['MDF_Branco_15', 'MDF_18mm_Carcaca', 'Melamina_Carvalho', 'Compensado_Naval',
+                        'mdf_15mm', 'Frente_Laca', 'Vidro', 'Aluminio']
+    resultados = []
+
+    for quantidade in componentes:
+        projeto = [
+            {'nome': f'componente_{i}', 'tipo': tipo, 'area_m2': float(area), 'material_modelo': material}
+            for i, (tipo, area, material) in enumerate(zip(
+                rng.choice(tipos, quantidade), rng.uniform(0.1, 2.5, quantidade), rng.choice(materiais_modelo, quantidade)
+            ))
+        ]
+
+        inicio = time.perf_counter()
+        colunas = engine.montar_colunas_materiais(projeto, 'mdf_15mm')
+        custos = engine.calcular_custos_colunar(colunas, 'mdf_15mm', 'comum', 'media')
+        materiais = engine.resumir_materiais(colunas, custos, 'mdf_15mm')
+        tempo_agrupado = time.perf_counter() - inicio
+
+        # Referência: mapeamento e custeio por componente, com os dicionários de preço
+        nomes = list(engine.codigos_materiais) + ['mdf_15mm']
+        inicio = time.perf_counter()
+        por_componente = [
+            engine.calcular_custo_componente(comp, nomes[codigo], 'comum', 'media')
+            for comp, codigo in zip(projeto, engine.mapear_materiais(projeto, 'mdf_15mm').tolist())
+        ]
+        tempo_componentes = time.perf_counter() - inicio
+
+        resultados.append({
+            'componentes': quantidade,
+            'materiais': len(materiais),
+            'agrupado_ms': round(tempo_agrupado * 1000, 1),
+            'por_componente_ms': round(tempo_componentes * 1000, 1),
+            'diferenca_total': round(abs(sum(item['custo_total'] for item in por_componente) - float(custos['custo_total'].sum())), 2)
+        })
+
+    return resultados
+
+
+def _sessao_conexao_por_chamada(db_path: str, email: str, senha_hash: str, analise: str, orcamento: str):
+    """Login e salvamento como eram feitos antes: uma conexão nova por operação"""
+    conn = sqlite3.connect(db_path)
+    usuario = conn.execute(
+        "SELECT id FROM usuarios WHERE email = ? AND senha_hash = ? AND ativo = 1", (email, senha_hash)
+    ).fetchone()
+    conn.execute("UPDATE usuarios SET data_ultimo_login = CURRENT_TIMESTAMP WHERE id = ?", (usuario[0],))
+    conn.commit()
+    conn.close()
+
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "INSERT INTO projetos (usuario_id, nome_arquivo, dados_analise, dados_orcamento) VALUES (?, ?, ?, ?)",
+        (usuario[0], 'projeto.obj', analise, orcamento)
+    )
+    conn.commit()
+    conn.close()
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE usuarios SET projetos_mes = projetos_mes + 1 WHERE id = ?", (usuario[0],))
+    conn.commit()
+    conn.close()
+
+
+def benchmark_banco(sessoes: int = 50, operacoes_por_sessao: int = 20, componentes: int = 50) -> List[Dict]:
+    """Vazão de login + salvamento de projeto com sessões concorrentes
+
+    Compara a conexão nova por chamada (journal padrão) com as conexões
+    persistentes em WAL do AuthManager. Cada operação é um login seguido do
+    salvamento de um projeto; 'erros' conta as operações que falharam
+    (tipicamente "database is locked").
+    """
+    analise = {'componentes': [
+        {'nome': f'componente_{i}', 'tipo': 'armario', 'area_m2': 1.2, 'geometria_id': f'{i:016x}'}
+        for i in range(componentes)
+    ]}
+    orcamento = {'resumo': {'valor_final': 12345.67}, 'componentes': analise['componentes']}
+    # Conta demo do plano empresarial: sem limite mensal de projetos
+    email, senha = 'marceneiro@teste.com', 'marc123'
+    resultados = []
+
+    for modo in ('conexao_por_chamada', 'wal_persistente'):
+        with tempfile.TemporaryDirectory() as pasta:
+            db_path = os.path.join(pasta, 'usuarios.db')
+            auth = AuthManager(db_path)
+            auth.criar_usuarios_demo()
+            if modo == 'conexao_por_chamada':
+                auth.banco.fechar_todas()
+                conn = sqlite3.connect(db_path)
+                conn.execute("PRAGMA journal_mode = DELETE")
+                conn.close()
+                dados_analise, dados_orcamento = json.dumps(analise), json.dumps(orcamento)
+                senha_hash = auth.hash_senha(senha)
+
+            largada = threading.Barrier(sessoes + 1)
+            erros = []
+
+            def sessao():
+                largada.wait()
+                for _ in range(operacoes_por_sessao):
+                    try:
+                        if modo == 'conexao_por_chamada':
+                            _sessao_conexao_por_chamada(db_path, email, senha_hash, dados_analise, dados_orcamento)
+                        else:
+                            usuario = auth.fazer_login(email, senha)
+                            if usuario is None or not auth.salvar_projeto(usuario['id'], 'projeto.obj', analise, orcamento):
+                                erros.append(1)
+                    except sqlite3.Error:
+                        erros.append(1)
+
+            threads = [threading.Thread(target=sessao) for _ in range(sessoes)]
+            for thread in threads:
+                thread.start()
+            largada.wait()
+            inicio = time.perf_counter()
+            for thread in threads:
+                thread.join()
+            tempo = time.perf_counter() - inicio
+
+            salvos = auth.banco.conexao().execute("SELECT COUNT(*) FROM projetos").fetchone()[0]
+            auth.banco.fechar_todas()
+
+        total = sessoes * operacoes_por_sessao
+        resultados.append({
+            'modo': modo,
+            'sessoes': sessoes,
+            'operacoes': total,
+            'tempo_s': round(tempo, 2),
+            'operacoes_por_s': round(total / tempo, 1),
+            'projetos_salvos': salvos,
+            'erros': len(erros)
+        })
+
+    return resultados
+
+
+def benchmark_banco_reruns(reruns: int = 2000) -> List[Dict]:
+    """Custo do banco nos reruns do Streamlit, cada um executado numa thread nova
+
+    Cada rerun é uma thread de vida curta que faz uma consulta (estatísticas do
+    usuário). 'conexao_por_thread' desliga o pool: cada thread abre a conexão,
+    aplica os PRAGMAs e a fecha ao terminar; 'pool' reaproveita as conexões já
+    configuradas devolvidas pelas threads anteriores. 'conexoes_novas' conta as
+    conexões abertas durante a medição.
+    """
+    resultados = []
+
+    for modo in ('conexao_por_thread', 'pool'):
+        with tempfile.TemporaryDirectory() as pasta:
+            db_path = os.path.join(pasta, 'usuarios.db')
+            auth = AuthManager(db_path)
+            auth.criar_usuarios_demo()
+            usuario = auth.fazer_login('demo@orcainteriores.com', 'demo123')
+            banco = auth.banco
+            banco.tamanho_pool = 0 if modo == 'conexao_por_thread' else 8
+
+            abrir = banco._abrir
+            conexoes_novas = []
+
+            def abrir_contando():
+                conexoes_novas.append(1)
+                return abrir()
+
+            banco._abrir = abrir_contando
+
+            def rerun():
+                auth.obter_estatisticas_usuario(usuario['id'])
+
+            tempos = []
+            for _ in range(reruns):
+                inicio = time.perf_counter()
+                thread = threading.Thread(target=rerun)
+                thread.start()
+                thread.join()
+                tempos.append(time.perf_counter() - inicio)
+
+            banco._abrir = abrir
+            banco.fechar_todas()
+
+        resultados.append({
+            'modo': modo,
+            'reruns': reruns,
+            'us_por_rerun': round(float(np.median(tempos)) * 1e6, 1),
+            'us_p90': round(float(np.percentile(tempos, 90)) * 1e6, 1),
+            'conexoes_novas': len(conexoes_novas)
+        })
+
+    return resultados
+
+
+def benchmark_consultas_projetos(quantidades: List[int] = (10000, 100000, 1000000), usuarios: int = 1000,
+                                 consultas: int = 20, semente: int = 42) -> List[Dict]:
+    """Latência da listagem e das estatísticas de projetos com e sem o índice (usuario_id, data_criacao)
+
+    'sem_indice' reproduz as consultas antigas (sem índice, mês via strftime);
+    'com_indice' usa listar_projetos_usuario e obter_estatisticas_usuario.
+    """
+    rng = np.random.default_rng(semente)
+    resultados = []
+
+    for quantidade in quantidades:
+        with tempfile.TemporaryDirectory() as pasta:
+            auth = AuthManager(os.path.join(pasta, 'usuarios.db'))
+            # Projetos espalhados pelos últimos 24 meses
+            segundos = rng.integers(0, 730 * 86400, quantidade)
+            with auth.banco.transacao() as conn:
+                conn.executemany(
+                    "INSERT INTO projetos (usuario_id, nome_arquivo, data_criacao) "
+                    "VALUES (?, 'projeto.obj', datetime('now', '-' || ? || ' seconds'))",
+                    zip(rng.integers(1, usuarios + 1, quantidade).tolist(), segundos.tolist())
+                )
+            ids = rng.integers(1, usuarios + 1, consultas).tolist()
+
+            for modo in ('sem_indice', 'com_indice'):
+                if modo == 'sem_indice':
+                    conn.execute("DROP INDEX idx_projetos_usuario_data")
+                else:
+                    conn.execute("CREATE INDEX idx_projetos_usuario_data ON projetos (usuario_id, data_criacao)")
+
+                inicio = time.perf_counter()
+                for usuario_id in ids:
+                    if modo == 'sem_indice':
+                        conn.execute(
+                            "SELECT id, nome_arquivo, data_criacao FROM projetos WHERE usuario_id = ? "
+                            "ORDER BY data_criacao DESC", (usuario_id,)
+                        ).fetchall()
+                        conn.execute("SELECT COUNT(*) FROM projetos WHERE usuario_id = ?", (usuario_id,)).fetchone()
+                        conn.execute(
+                            "SELECT COUNT(*) FROM projetos WHERE usuario_id = ? "
+                            "AND strftime('%Y-%m', data_criacao) = strftime('%Y-%m', 'now')", (usuario_id,)
+                        ).fetchone()
+                    else:
+                        auth.listar_projetos_usuario(usuario_id)
+                        auth.obter_estatisticas_usuario(usuario_id)
+                tempo = time.perf_counter() - inicio
+
+                resultados.append({
+                    'projetos': quantidade,
+                    'modo': modo,
+                    'ms_por_usuario': round(tempo / consultas * 1000, 2)
+                })
+            auth.banco.fechar_todas()
+
+    return resultados
+
+
+def benchmark_rerun(reruns: int = 20) -> List[Dict]:
+    """Latência de rerun do app (tela de login) com e sem os serviços cacheados no processo
+
+    'sem_cache' reproduz o main() antigo: a cada rerun os serviços são
+    recriados (catálogo relido, schema verificado) e as contas demo conferidas.
+    'com_cache' é o app atual, em que o rerun só refaz a interface.
+    'inicializacao_ms' é a parte do rerun gasta obtendo os serviços.
+    """
+    from streamlit.testing.v1 import AppTest
+    import app
+
+    caminho_app = os.path.abspath(app.__file__)
+    resultados = []
+    diretorio = os.getcwd()
+
+    def inicializar(modo: str):
+        if modo == 'sem_cache':
+            app.carregar_servicos.clear()
+            BancoDados.obter(app.Config.DATABASE_PATH).versao_schema = None
+            app.carregar_servicos()[0].criar_usuarios_demo()
+        else:
+            app.carregar_servicos()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        os.chdir(pasta)
+        try:
+            for modo in ('sem_cache', 'com_cache'):
+                teste = AppTest.from_file(caminho_app, default_timeout=60)
+                teste.run()
+                inicializacoes, tempos = [], []
+                for _ in range(reruns):
+                    inicio = time.perf_counter()
+                    inicializar(modo)
+                    inicializacoes.append(time.perf_counter() - inicio)
+
+                    inicio = time.perf_counter()
+                    if modo == 'sem_cache':
+                        app.carregar_servicos.clear()
+                    teste.run()
+                    tempos.append(time.perf_counter() - inicio)
+
+                resultados.append({
+                    'modo': modo,
+                    'reruns': reruns,
+                    'inicializacao_ms': round(float(np.median(inicializacoes)) * 1000, 3),
+                    'rerun_mediana_ms': round(float(np.median(tempos)) * 1000, 1),
+                    'rerun_p90_ms': round(float(np.percentile(tempos, 90)) * 1000, 1)
+                })
+            BancoDados.obter(app.Config.DATABASE_PATH).fechar_todas()
+        finally:
+            os.chdir(diretorio)
+
+    return resultados
+
+def benchmark_blobs(projetos: int = 200, modelos: int = 20, componentes: int = 50,
+                    vertices: int = 500) -> List[Dict]:
+    """Banco de projetos com análise e malhas embutidas nas linhas vs. repositório de blobs
+
+    'embutido' grava como antes da migração 4 (JSON da análise, com as malhas,
+    em projetos.dados_analise); 'blobs' usa salvar_projeto. Os projetos repetem
+    'modelos' arquivos distintos, como uploads repetidos do mesmo modelo.
+    'migracao_s' é o tempo para converter o banco embutido para blobs.
+    """
+    from file_analyzer import FileAnalyzer
+    from geometria import RepositorioGeometria
+    from auth_manager import MIGRACOES
+
+    analisador = FileAnalyzer()
+    engine = OrcamentoEngine()
+    geometria = RepositorioGeometria()
+    entradas = []
+    for m in range(modelos):
+        arquivo = io.BytesIO(gerar_obj_sintetico(componentes, vertices, semente=m))
+        arquivo.name = f'modelo_{m}.obj'
+        analise = analisador.analisar_arquivo_3d(arquivo, geometria=geometria)
+        entradas.append((analise, engine.calcular_orcamento_completo(analise, {'material': 'mdf_15mm'})))
+
+    def tamanho_mb(banco: BancoDados) -> float:
+        conn = banco.conexao()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        paginas = conn.execute("PRAGMA page_count").fetchone()[0] - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return round(paginas * conn.execute("PRAGMA page_size").fetchone()[0] / 1_000_000, 1)
+
+    def varrer_projetos(banco: BancoDados) -> float:
+        inicio = time.perf_counter()
+        banco.conexao().execute(
+            "SELECT COUNT(*), SUM(LENGTH(nome_arquivo)) FROM projetos NOT INDEXED WHERE usuario_id > 0"
+        ).fetchone()
+        return round((time.perf_counter() - inicio) * 1000, 2)
+
+    resultados = []
+    with tempfile.TemporaryDirectory() as pasta:
+        for modo in ('embutido', 'blobs'):
+            db_path = os.path.join(pasta, f'{modo}.db')
+            inicio = time.perf_counter()
+            if modo == 'embutido':
+                banco = BancoDados.obter(db_path)
+                banco.migrar(MIGRACOES[:2])
+                with banco.transacao() as conn:
+                    for i in range(projetos):
+                        analise, orcamento = entradas[i % modelos]
+                        analise = dict(analise, geometrias=geometria.exportar(
+                            [comp['geometria_id'] for comp in analise['componentes']]
+                        ))
+                        conn.execute(
+                            "INSERT INTO projetos (usuario_id, nome_arquivo, dados_analise, dados_orcamento) "
+                            "VALUES (?, ?, ?, ?)",
+                            (i % 50 + 1, f'projeto_{i}.obj', json.dumps(analise), json.dumps(orcamento))
+                        )
+            else:
+                auth = AuthManager(db_path)
+                auth.criar_usuarios_demo()
+                banco = auth.banco
+                usuario = auth.fazer_login('marceneiro@teste.com', 'marc123')
+                for i in range(projetos):
+                    analise, orcamento = entradas[i % modelos]
+                    auth.salvar_projeto(usuario['id'], f'projeto_{i}.obj', analise, orcamento, geometria)
+            tempo = time.perf_counter() - inicio
+
+            resultado = {
+                'modo': modo,
+                'projetos': projetos,
+                'modelos': modelos,
+                'banco_mb': tamanho_mb(banco),
+                'gravacao_ms_por_projeto': round(tempo / projetos * 1000, 2),
+                'varredura_projetos_ms': varrer_projetos(banco)
+            }
+            if modo == 'embutido':
+                inicio = time.perf_counter()
+                banco.migrar(MIGRACOES)
+                resultado['migracao_s'] = round(time.perf_counter() - inicio, 2)
+                resultado['banco_migrado_mb'] = tamanho_mb(banco)
+            resultados.append(resultado)
+            banco.fechar_todas()
+
+    return resultados
+
+
+def benchmark_paginacao(projetos: List[int] = (1000, 10000, 100000), por_pagina: int = 20,
+                        repeticoes: int = 20) -> List[Dict]:
+    """Tempo de carregar a primeira página e uma página funda (90% da lista) dos projetos de um usuário
+
+    'offset' é a paginação por LIMIT/OFFSET, que percorre todas as linhas
+    anteriores; 'cursor' é listar_projetos_pagina, que continua do último
+    (data_criacao, id) da página anterior.
+    """
+    resultados = []
+
+    for quantidade in projetos:
+        with tempfile.TemporaryDirectory() as pasta:
+            auth = AuthManager(os.path.join(pasta, 'usuarios.db'))
+            with auth.banco.transacao() as conn:
+                conn.executemany(
+                    "INSERT INTO projetos (usuario_id, nome_arquivo, data_criacao, valor_final, area_total, "
+                    "componentes, formato) VALUES (1, ?, datetime('2020-01-01', '+' || ? || ' minutes'), ?, 10.0, 20, 'OBJ')",
+                    ((f'projeto_{i}.obj', i, 1000.0 + i) for i in range(quantidade))
+                )
+            conn = auth.banco.conexao()
+            profunda = int(quantidade * 0.9) // por_pagina * por_pagina
+            ultimo = conn.execute(
+                "SELECT data_criacao, id FROM projetos WHERE usuario_id = 1 "
+                "ORDER BY data_criacao DESC, id DESC LIMIT 1 OFFSET ?", (profunda - 1,)
+            ).fetchone()
+            cursor = f"{ultimo[0]}|{ultimo[1]}"
+
+            for modo in ('offset', 'cursor'):
+                resultado = {'projetos': quantidade, 'modo': modo}
+                for nome, deslocamento, cursor_pagina in (('primeira', 0, None), ('profunda', profunda, cursor)):
+                    inicio = time.perf_counter()
+                    for _ in range(repeticoes):
+                        if modo == 'offset':
+                            conn.execute(
+                                f"SELECT {COLUNAS_LISTAGEM} FROM projetos WHERE usuario_id = 1 "
+                                "ORDER BY data_criacao DESC, id DESC LIMIT ? OFFSET ?", (por_pagina, deslocamento)
+                            ).fetchall()
+                        else:
+                            auth.listar_projetos_pagina(1, limite=por_pagina, cursor=cursor_pagina)
+                    resultado[f'{nome}_ms'] = round((time.perf_counter() - inicio) / repeticoes * 1000, 3)
+                resultados.append(resultado)
+            auth.banco.fechar_todas()
+
+    return resultados
+
+
+def benchmark_cota(sessoes: int = 50, limite: int = 3, processamento_s: float = 0.005) -> List[Dict]:
+    """Uploads simultâneos de um mesmo usuário do plano gratuito contra o limite mensal
+
+    'validar_depois_salvar' é o fluxo anterior (validar_limite_projeto, análise
+    e orçamento, simulados por processamento_s, e só então gravar o projeto e
+    incrementar_projeto); 'reserva_atomica' é salvar_projeto_com_cota.
+    'acima_do_limite' são os projetos gravados além do limite do plano.
+    """
+    resultados = []
+
+    for modo in ('validar_depois_salvar', 'reserva_atomica'):
+        with tempfile.TemporaryDirectory() as pasta:
+            auth = AuthManager(os.path.join(pasta, 'usuarios.db'))
+            auth.criar_usuario('Cota', 'cota@teste.com', 'cota123', 'gratuito')
+            usuario = auth.fazer_login('cota@teste.com', 'cota123')
+            largada = threading.Barrier(sessoes + 1)
+
+            def sessao():
+                largada.wait()
+                if modo == 'reserva_atomica':
+                    auth.salvar_projeto_com_cota(usuario['id'], 'projeto.obj', {}, {})
+                elif auth.validar_limite_projeto(usuario['id']):
+                    time.sleep(processamento_s)
+                    with auth.banco.transacao() as conn:
+                        conn.execute(
+                            "INSERT INTO projetos (usuario_id, nome_arquivo) VALUES (?, 'projeto.obj')", (usuario['id'],)
+                        )
+                    auth.incrementar_projeto(usuario['id'])
+
+            threads = [threading.Thread(target=sessao) for _ in range(sessoes)]
+            for thread in threads:
+                thread.start()
+            largada.wait()
+            inicio = time.perf_counter()
+            for thread in threads:
+                thread.join()
+            tempo = time.perf_counter() - inicio
+
+            salvos = auth.banco.conexao().execute("SELECT COUNT(*) FROM projetos").fetchone()[0]
+            contador = auth.banco.conexao().execute(
+                "SELECT projetos_mes FROM usuarios WHERE id = ?", (usuario['id'],)
+            ).fetchone()[0]
+            auth.banco.fechar_todas()
+
+        resultados.append({
+            'modo': modo,
+            'sessoes': sessoes,
+            'limite': limite,
+            'projetos_salvos': salvos,
+            'contador_mes': contador,
+            'acima_do_limite': max(salvos - limite, 0),
+            'tempo_ms': round(tempo * 1000, 1)
+        })
+
+    return resultados
+
+
+def benchmark_sessoes(sessoes_ativas: int = 1000, validacoes: int = 20_000,
+                      sessoes_expiradas: int = 200_000) -> List[Dict]:
+    """Validação do token de sessão a cada requisição e limpeza das sessões expiradas
+
+    'conexao_por_chamada' abre o SQLite e consulta sessoes a cada validação;
+    'banco_persistente' consulta pela conexão da thread, sem cache;
+    'cache' é validar_sessao com o cache em memória já aquecido.
+    'limpeza' apaga, em lotes, sessoes_expiradas sessões vencidas de uma tabela
+    que também tem as sessões ativas.
+    """
+    from auth_manager import _formatar_utc, _hash_token
+    from sessoes import CacheSessoes
+
+    resultados = []
+    with tempfile.TemporaryDirectory() as pasta:
+        db_path = os.path.join(pasta, 'usuarios.db')
+        auth = AuthManager(db_path)
+        auth.criar_usuarios_demo()
+        usuario = auth.fazer_login('demo@orcainteriores.com', 'demo123')
+        tokens = [auth.criar_sessao(usuario['id']) for _ in range(sessoes_ativas)]
+        sequencia = [tokens[i % sessoes_ativas] for i in range(validacoes)]
+
+        def por_conexao(token):
+            conn = sqlite3.connect(db_path)
+            conn.execute('''
+                SELECT u.id, u.nome, u.email, u.plano, u.projetos_mes FROM sessoes s
+                JOIN usuarios u ON u.id = s.usuario_id
+                WHERE s.token = ? AND s.ativo = 1 AND s.data_expiracao > ? AND u.ativo = 1
+            ''', (_hash_token(token), _formatar_utc(time.time()))).fetchone()
+            conn.close()
+
+        cache = auth.cache_sessoes
+        for modo in ('conexao_por_chamada', 'banco_persistente', 'cache'):
+            if modo == 'conexao_por_chamada':
+                validar = por_conexao
+            else:
+                auth.cache_sessoes = CacheSessoes(capacidade=0) if modo == 'banco_persistente' else cache
+                validar = auth.validar_sessao
+            for token in tokens:
+                validar(token)
+
+            inicio = time.perf_counter()
+            for token in sequencia:
+                validar(token)
+            tempo = time.perf_counter() - inicio
+            resultados.append({
+                'modo': modo,
+                'validacoes': validacoes,
+                'us_por_validacao': round(tempo / validacoes * 1e6, 2)
+            })
+
+        passado = _formatar_utc(time.time() - 3600)
+        with auth.banco.transacao() as conn:
+            conn.executemany(
+                "INSERT INTO sessoes (usuario_id, token, data_expiracao) VALUES (?, ?, ?)",
+                ((usuario['id'], f'expirada_{i}', passado) for i in range(sessoes_expiradas))
+            )
+        inicio = time.perf_counter()
+        removidas = auth.limpar_sessoes_expiradas()
+        tempo = time.perf_counter() - inicio
+        restantes = auth.banco.conexao().execute("SELECT COUNT(*) FROM sessoes").fetchone()[0]
+        resultados.append({
+            'modo': 'limpeza',
+            'sessoes_removidas': removidas,
+            'sessoes_restantes': restantes,
+            'tempo_s': round(tempo, 2),
+            'validas_apos_limpeza': sum(auth.validar_sessao(token) is not None for token in tokens)
+        })
+        auth.banco.fechar_todas()
+
+    return resultados
+
+
+BENCHMARKS = {
+    'plano_corte': benchmark_plano_corte,
+    'reprecificacao': benchmark_reprecificacao,
+    'fornecedores': benchmark_fornecedores,
+    'risco': benchmark_risco,
+    'centavos': benchmark_centavos,
+    'verificar_centavos': verificar_centavos,
+    'pdf': benchmark_pdf,
+    'exportacao': benchmark_exportacao,
+    'geometria': benchmark_geometria,
+    'materiais': benchmark_materiais,
+    'banco': benchmark_banco,
+    'banco_reruns': benchmark_banco_reruns,
+    'consultas_projetos': benchmark_consultas_projetos,
+    'rerun': benchmark_rerun,
+    'blobs': benchmark_blobs,
+    'paginacao': benchmark_paginacao,
+    'cota': benchmark_cota,
+    'sessoes': benchmark_sessoes
+}
+
+
+def main(nomes: List[str]):
+    """Executa os benchmarks escolhidos (todos, se nenhum for informado)"""
+    for nome in nomes or list(BENCHMARKS):
+        print(f"\n== {nome} ==")
+        for resultado in BENCHMARKS[nome]():
+            print("  " + "  ".join(f"{chave}={valor}" for chave, valor in resultado.items()))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,68 @@
+"""
+Repositório de Blobs - Orca Interiores SaaS
+Conteúdos grandes (análises, malhas, orçamentos) comprimidos e endereçados pelo hash
+"""
+
+import hashlib
+import sqlite3
+import zlib
+from typing import Dict, Iterable, Tuple
+
+
+class RepositorioBlobs:
+    def __init__(self, nivel_compressao: int = 1, lote_leitura: int = 500):
+        """Inicializa o repositório de blobs (tabela blobs do banco)
+
+        Cada conteúdo é gravado uma única vez, comprimido com zlib, sob o sha256
+        do texto original: uploads idênticos e malhas repetidas entre projetos
+        ocupam o espaço de um só. As linhas de projetos guardam apenas o hash.
+        O nível 1 já reduz o JSON a cerca de um quarto, com uma fração do custo
+        dos níveis mais altos (a reprecificação regrava todos os orçamentos).
+        """
+        self.nivel_compressao = nivel_compressao
+        self.lote_leitura = lote_leitura
+
+    def preparar(self, texto: str) -> Tuple[str, int, bytes]:
+        """Calcula hash e compressão de um conteúdo, fora de qualquer transação
+
+        Retorna (hash, tamanho original em bytes, dados comprimidos), pronto
+        para gravar().
+        """
+        dados = texto.encode('utf-8')
+        return hashlib.sha256(dados).hexdigest(), len(dados), zlib.compress(dados, self.nivel_compressao)
+
+    def gravar(self, conn: sqlite3.Connection, blobs: Iterable[Tuple[str, int, bytes]]):
+        """Grava os blobs preparados; os que já existem são mantidos"""
+        conn.executemany(
+            "INSERT OR IGNORE INTO blobs (hash, tamanho, dados) VALUES (?, ?, ?)",
+            ((hash_blob, tamanho, sqlite3.Binary(dados)) for hash_blob, tamanho, dados in blobs)
+        )
+
+    def ler(self, conn: sqlite3.Connection, hashes: Iterable[str]) -> Dict[str, str]:
+        """Conteúdos (texto descomprimido) dos hashes informados; hashes ausentes são omitidos"""
+        unicos = [hash_blob for hash_blob in dict.fromkeys(hashes) if hash_blob]
+        conteudos = {}
+        for inicio in range(0, len(unicos), self.lote_leitura):
+            lote = unicos[inicio:inicio + self.lote_leitura]
+            linhas = conn.execute(
+                f"SELECT hash, dados FROM blobs WHERE hash IN ({','.join('?' * len(lote))})", lote
+            ).fetchall()
+            conteudos.update((hash_blob, zlib.decompress(dados).decode('utf-8')) for hash_blob, dados in linhas)
+        return conteudos
+
+    def remover_orfaos(self, conn: sqlite3.Connection, hashes: Iterable[str]) -> int:
+        """Remove, entre os hashes informados, os que nenhum projeto referencia mais
+
+        Só considera as referências diretas dos projetos (analise_hash e
+        orcamento_hash); malhas, referenciadas de dentro das análises, não devem
+        ser passadas aqui. Retorna quantos blobs foram removidos.
+        """
+        candidatos = [(hash_blob, hash_blob, hash_blob) for hash_blob in dict.fromkeys(hashes) if hash_blob]
+        antes = conn.total_changes
+        conn.executemany('''
+            DELETE FROM blobs
+            WHERE hash = ?
+              AND NOT EXISTS (SELECT 1 FROM projetos WHERE orcamento_hash = ?)
+              AND NOT EXISTS (SELECT 1 FROM projetos WHERE analise_hash = ?)
+        ''', candidatos)
+        return conn.total_changes - antes
@@ -0,0 +1,240 @@
+"""
+Catálogo de Preços - Orca Interiores SaaS
+Preços de materiais, acessórios e mão de obra carregados de arquivo ou banco,
+compilados em tabelas indexadas e recarregados sem reiniciar a aplicação
+"""
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from typing import Dict, Optional
+import numpy as np
+
+# Catálogo distribuído com o app, ao lado deste módulo (única fonte dos preços)
+CAMINHO_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'catalogo_precos.json')
+
+
+class CatalogoPrecos:
+    def __init__(self, caminho: str = CAMINHO_PADRAO, intervalo_verificacao_s: float = 2.0,
+                 preco_material_padrao: float = 69.15, desperdicio_padrao: float = 0.15):
+        """Inicializa o catálogo a partir de um arquivo JSON ou de um banco SQLite (.db)
+
+        Caminhos relativos partem da pasta deste módulo, não do diretório de
+        trabalho. A origem é verificada no máximo a cada intervalo_verificacao_s
+        segundos; quando muda, o catálogo é recarregado e recompilado. Sem um
+        catálogo legível na inicialização não há preços para orçar, e o erro é
+        levantado em vez de cair em preços embutidos.
+        """
+        self.caminho = os.path.join(os.path.dirname(CAMINHO_PADRAO), caminho)
+        self.intervalo_verificacao_s = intervalo_verificacao_s
+        self.preco_material_padrao = preco_material_padrao
+        self.desperdicio_padrao = desperdicio_padrao
+        self._trava = threading.Lock()
+        self._assinatura = None
+        self._ultima_verificacao = 0.0
+        self.tabelas = None
+        if not self.verificar_atualizacao(forcar=True):
+            print(f"Erro ao carregar catálogo de preços: nenhum catálogo válido em {self.caminho}")
+            raise FileNotFoundError(f"Catálogo de preços indisponível: {self.caminho}")
+
+    @property
+    def versao(self) -> str:
+        """Versão do catálogo compilado em uso ("versão declarada+hash do conteúdo")"""
+        return self.tabelas['versao']
+
+    def _usa_banco(self) -> bool:
+        return self.caminho.endswith('.db')
+
+    def _assinatura_origem(self) -> Optional[tuple]:
+        """Assinatura barata da origem: mtime/tamanho do arquivo ou último id do banco"""
+        try:
+            if self._usa_banco():
+                conn = sqlite3.connect(self.caminho)
+                try:
+                    return conn.execute("SELECT MAX(id) FROM catalogo_precos").fetchone()
+                finally:
+                    conn.close()
+            estado = os.stat(self.caminho)
+            return (estado.st_mtime_ns, estado.st_size)
+        except (OSError, sqlite3.Error):
+            return None
+
+    def _ler_origem(self) -> Optional[Dict]:
+        """Lê os dados do catálogo da origem configurada"""
+        if self._usa_banco():
+            conn = sqlite3.connect(self.caminho)
+            try:
+                linha = conn.execute(
+                    "SELECT versao, dados FROM catalogo_precos ORDER BY id DESC LIMIT 1"
+                ).fetchone()
+            finally:
+                conn.close()
+            if not linha:
+                return None
+            dados = json.loads(linha[1])
+            dados.setdefault('versao', linha[0])
+            return dados
+
+        with open(self.caminho, 'rb') as arquivo:
+            conteudo = arquivo.read()
+        return json.loads(conteudo)
+
+    def verificar_atualizacao(self, forcar: bool = False) -> bool:
+        """Recarrega o catálogo se a origem mudou; retorna True se houve recarga"""
+        agora = time.monotonic()
+        if not forcar and agora - self._ultima_verificacao < self.intervalo_verificacao_s:
+            return False
+
+        with self._trava:
+            self._ultima_verificacao = agora
+            assinatura = self._assinatura_origem()
+            if assinatura is None and self._assinatura is not None:
+                # Avisa uma vez; os preços já carregados continuam valendo até a origem voltar
+                print(f"Erro ao carregar catálogo de preços: {self.caminho} não encontrado, "
+                      f"mantendo a versão {self.versao}")
+                self._assinatura = None
+            if assinatura is None or assinatura == self._assinatura:
+                return False
+
+            try:
+                dados = self._ler_origem()
+            except (OSError, ValueError, sqlite3.Error) as e:
+                print(f"Erro ao carregar catálogo de preços: {e}")
+                return False
+
+            self._assinatura = assinatura
+            if not dados:
+                return False
+
+            # Troca atômica: quem já pegou as tabelas antigas termina o cálculo com elas
+            self.tabelas = self._compilar(dados)
+            return True
+
+    def _compilar(self, dados: Dict) -> Dict:
+        """Compila o catálogo em arrays indexados por código de material, tipo e qualidade
+
+        A última posição de cada eixo é reservada para valores desconhecidos
+        (material com preço padrão, tipo/qualidade sem acessórios). A versão
+        leva o hash do conteúdo: mudar um preço sem mudar o campo 'versao' ainda
+        gera outra versão, e orçamentos em cache ou salvos são recalculados.
+        """
+        declarada = str(dados.get('versao', ''))
+        conteudo = hashlib.sha1(json.dumps(dados, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:12]
+
+        materiais_precos = {m: float(p) for m, p in dados.get('materiais', {}).items()}
+        acessorios = dados.get('acessorios', {})
+        desperdicio = {m: float(d) for m, d in dados.get('desperdicio', {}).items()}
+
+        materiais = list(materiais_precos)
+        tipos = list(acessorios)
+        qualidades = sorted({q for custos in acessorios.values() for q in custos})
+
+        tabela_acessorios = np.zeros((len(tipos) + 1, len(qualidades) + 1))
+        for i, tipo in enumerate(tipos):
+            for j, qualidade in enumerate(qualidades):
+                tabela_acessorios[i, j] = sum(acessorios[tipo].get(qualidade, {}).values())
+
+        tabela_precos = np.array([materiais_precos[m] for m in materiais] + [self.preco_material_padrao])
+        fornecedores = self._compilar_fornecedores(dados, materiais, tipos, qualidades, tabela_precos, tabela_acessorios)
+
+        return {
+            'versao': f"{declarada}+{conteudo}" if declarada else conteudo,
+            'fonte': dados.get('fonte', ''),
+            'data_atualizacao': dados.get('data_atualizacao', ''),
+            'materiais': materiais_precos,
+            'acessorios': acessorios,
+            'mao_obra': dict(dados.get('mao_obra', {})),
+            'desperdicio': desperdicio,
+            'codigos_materiais': {material: i for i, material in enumerate(materiais)},
+            'codigos_tipos': {tipo: i for i, tipo in enumerate(tipos)},
+            'codigos_qualidades': {qualidade: i for i, qualidade in enumerate(qualidades)},
+            'tabela_precos': tabela_precos,
+            'tabela_desperdicio': np.array(
+                [desperdicio.get(m, self.desperdicio_padrao) for m in materiais] + [self.desperdicio_padrao]
+            ),
+            'tabela_acessorios': tabela_acessorios,
+            'fornecedores': fornecedores
+        }
+
+    def _compilar_fornecedores(self, dados: Dict, materiais: list, tipos: list, qualidades: list,
+                               tabela_precos: np.ndarray, tabela_acessorios: np.ndarray) -> Dict:
+        """Compila a matriz fornecedor × item a partir da seção 'fornecedores' do catálogo
+
+        O fornecedor padrão (linha 0) usa os preços principais do catálogo; os
+        demais informam só o que vendem, no mesmo formato. Item sem preço fica
+        com custo infinito e nunca é escolhido daquele fornecedor.
+        """
+        fornecedores = dados.get('fornecedores', {})
+        padrao = dados.get('fornecedor_padrao', 'leo_madeiras')
+        ids = [padrao] + [f for f in fornecedores if f != padrao]
+        codigos_materiais = {material: i for i, material in enumerate(materiais)}
+
+        matriz_materiais = np.full((len(ids), len(materiais) + 1), np.inf)
+        matriz_acessorios = np.full((len(ids),) + tabela_acessorios.shape, np.inf)
+        matriz_materiais[0] = tabela_precos
+        matriz_acessorios[0] = tabela_acessorios
+        # Tipos e qualidades desconhecidos não têm acessórios em nenhum fornecedor
+        matriz_acessorios[:, -1, :] = 0.0
+        matriz_acessorios[:, :, -1] = 0.0
+
+        for s, fornecedor in enumerate(ids[1:], start=1):
+            precos = fornecedores[fornecedor]
+            for material, preco in precos.get('materiais', {}).items():
+                if material in codigos_materiais:
+                    matriz_materiais[s, codigos_materiais[material]] = float(preco)
+            for i, tipo in enumerate(tipos):
+                for j, qualidade in enumerate(qualidades):
+                    itens = precos.get('acessorios', {}).get(tipo, {}).get(qualidade)
+                    if itens is not None:
+                        matriz_acessorios[s, i, j] = sum(itens.values())
+
+        regras = [fornecedores.get(fornecedor, {}) for fornecedor in ids]
+        return {
+            'ids': ids,
+            'nomes': [
+                regra.get('nome', dados.get('fonte', fornecedor) if s == 0 else fornecedor)
+                for s, (fornecedor, regra) in enumerate(zip(ids, regras))
+            ],
+            'matriz_materiais': matriz_materiais,
+            'matriz_acessorios': matriz_acessorios,
+            'pedido_minimo': np.array([float(regra.get('pedido_minimo', 0.0)) for regra in regras]),
+            'frete': np.array([float(regra.get('frete', 0.0)) for regra in regras]),
+            'frete_gratis_acima': np.array([float(regra.get('frete_gratis_acima', np.inf)) for regra in regras])
+        }
+
+    def publicar(self, dados: Dict) -> bool:
+        """Grava uma nova versão do catálogo na origem (substituição atômica do arquivo)"""
+        try:
+            if self._usa_banco():
+                conn = sqlite3.connect(self.caminho)
+                try:
+                    conn.execute('''
+                        CREATE TABLE IF NOT EXISTS catalogo_precos (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            versao TEXT NOT NULL,
+                            dados TEXT NOT NULL,
+                            data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                        )
+                    ''')
+                    conn.execute(
+                        "INSERT INTO catalogo_precos (versao, dados) VALUES (?, ?)",
+                        (str(dados.get('versao', '')), json.dumps(dados, ensure_ascii=False))
+                    )
+                    conn.commit()
+                finally:
+                    conn.close()
+            else:
+                temporario = f"{self.caminho}.tmp"
+                with open(temporario, 'w', encoding='utf-8') as arquivo:
+                    json.dump(dados, arquivo, indent=2, ensure_ascii=False)
+                os.replace(temporario, self.caminho)
+
+            self.verificar_atualizacao(forcar=True)
+            return True
+
+        except (OSError, sqlite3.Error) as e:
+            print(f"Erro ao publicar catálogo de preços: {e}")
+            return False
@@ -17,6 +17,10 @@ class Config:
     # Configurações de banco de dados
     DATABASE_PATH = "usuarios.db"
     
+    # Catálogo de preços (arquivo .json ou banco .db), recarregado quando muda; caminhos
+    # relativos partem da pasta do app, então o diretório de onde o app é iniciado não importa
+    CATALOGO_PRECOS_PATH = "catalogo_precos.json"
+    
     # Configurações de upload
     MAX_UPLOAD_SIZE_MB = 500
     ALLOWED_EXTENSIONS = ['.obj', '.dae', '.stl', '.ply']
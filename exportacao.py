@@ -0,0 +1,155 @@
+"""
+Exportação - Orca Interiores SaaS
+Perfis de exportação do orçamento: resumo compacto, JSON/JSONL em stream e Parquet
+"""
+
+import json
+from typing import Dict, Iterator, List, TextIO
+import pandas as pd
+import numpy as np
+
+# Campos de geometria dos componentes: nunca exportados, só referenciados
+CAMPOS_GEOMETRIA = ('vertices', 'faces')
+
+# Colunas das linhas do orçamento, na ordem de exportação
+COLUNAS_ITENS = [
+    'componente_id', 'nome', 'tipo', 'area_m2', 'custo_material', 'custo_acessorios',
+    'custo_corte', 'multiplicador_complexidade', 'custo_total', 'preco_por_m2', 'geometria_id'
+]
+
+PERFIS = {
+    'resumo': "Resumo (JSON compacto, sem geometria)",
+    'json': "Itens (JSON em stream)",
+    'jsonl': "Itens (JSONL, uma linha por componente)",
+    'parquet': "Analítico (Parquet)"
+}
+
+
+def _valor_json(valor):
+    """Converte tipos do numpy para tipos nativos ao serializar"""
+    if isinstance(valor, np.integer):
+        return int(valor)
+    if isinstance(valor, np.floating):
+        return float(valor)
+    if isinstance(valor, np.ndarray):
+        return valor.tolist()
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+
+def _json(valor) -> str:
+    return json.dumps(valor, ensure_ascii=False, separators=(',', ':'), default=_valor_json)
+
+
+class ExportadorOrcamento:
+    def __init__(self, linhas_por_escrita: int = 1000):
+        """Inicializa o exportador; as linhas são serializadas em blocos de linhas_por_escrita"""
+        self.linhas_por_escrita = linhas_por_escrita
+
+    def cabecalho(self, orcamento: Dict) -> Dict:
+        """Dados do orçamento sem as linhas: resumo, configurações, metadados e análises
+
+        O plano de corte sai sem a lista de cortes (só a quantidade), que cresce
+        com o número de peças e fica disponível no próprio plano.
+        """
+        cabecalho = {
+            chave: valor for chave, valor in orcamento.items()
+            if chave not in ('componentes', 'itens', 'plano_corte')
+        }
+        plano_corte = orcamento.get('plano_corte')
+        if plano_corte:
+            cabecalho['plano_corte'] = {
+                chave: valor for chave, valor in plano_corte.items() if chave not in ('cortes', 'nao_alocados')
+            }
+            cabecalho['plano_corte']['quantidade_cortes'] = len(plano_corte.get('cortes', []))
+            cabecalho['plano_corte']['quantidade_nao_alocados'] = len(plano_corte.get('nao_alocados', []))
+        cabecalho['quantidade_itens'] = self.contar_itens(orcamento)
+        return cabecalho
+
+    def contar_itens(self, orcamento: Dict) -> int:
+        itens = orcamento.get('itens')
+        return len(itens) if itens is not None else len(orcamento.get('componentes', []))
+
+    def itens(self, orcamento: Dict) -> Iterator[Dict]:
+        """Linhas do orçamento sem geometria, referenciada por componente_id/geometria_id
+
+        Aceita tanto o detalhamento por componente quanto o DataFrame 'itens'
+        do cálculo colunar.
+        """
+        itens = orcamento.get('itens')
+        if itens is not None:
+            for inicio in range(0, len(itens), self.linhas_por_escrita):
+                bloco = itens.iloc[inicio:inicio + self.linhas_por_escrita]
+                for i, linha in enumerate(bloco.to_dict('records'), start=inicio):
+                    yield {'componente_id': i, **linha}
+            return
+
+        for i, comp in enumerate(orcamento.get('componentes', [])):
+            linha = {'componente_id': i}
+            linha.update((chave, valor) for chave, valor in comp.items() if chave not in CAMPOS_GEOMETRIA)
+            yield linha
+
+    def exportar_resumo(self, orcamento: Dict) -> str:
+        """Exportação compacta: cabeçalho e linhas, sem geometria e sem indentação"""
+        dados = self.cabecalho(orcamento)
+        dados['itens'] = list(self.itens(orcamento))
+        return _json(dados)
+
+    def escrever_json(self, orcamento: Dict, destino: TextIO) -> int:
+        """Escreve o orçamento como um objeto JSON em destino, linha a linha
+
+        O cabeçalho vai primeiro e as linhas são serializadas em blocos, sem
+        montar o documento inteiro na memória. Retorna o número de linhas.
+        """
+        cabecalho = _json(self.cabecalho(orcamento))
+        destino.write(cabecalho[:-1] + (',' if cabecalho != '{}' else '') + '"itens":[')
+        total = 0
+        for bloco in self._blocos(orcamento):
+            destino.write((',' if total else '') + ','.join(_json(linha) for linha in bloco))
+            total += len(bloco)
+        destino.write(']}\n')
+        return total
+
+    def escrever_jsonl(self, orcamento: Dict, destino: TextIO) -> int:
+        """Escreve o orçamento em JSONL: cabeçalho na primeira linha, depois um componente por linha"""
+        destino.write(_json({'orcamento': self.cabecalho(orcamento)}) + '\n')
+        total = 0
+        for bloco in self._blocos(orcamento):
+            destino.write(''.join(_json(linha) + '\n' for linha in bloco))
+            total += len(bloco)
+        return total
+
+    def exportar_parquet(self, orcamento: Dict, destino) -> bool:
+        """Exporta as linhas em Parquet (colunar, para análise); requer pyarrow ou fastparquet
+
+        Os metadados do orçamento vão como colunas constantes (comprimidas por
+        dicionário no Parquet), para cada arquivo ser autossuficiente.
+        """
+        itens = orcamento.get('itens')
+        if itens is not None:
+            tabela = itens.copy()
+            tabela.insert(0, 'componente_id', np.arange(len(itens)))
+        else:
+            tabela = pd.DataFrame(list(self.itens(orcamento)))
+            tabela = tabela[[coluna for coluna in COLUNAS_ITENS if coluna in tabela.columns]]
+
+        configuracoes = orcamento.get('configuracoes') or {}
+        tabela['material'] = configuracoes.get('material', 'mdf_15mm')
+        tabela['versao_catalogo'] = orcamento.get('versao_catalogo', '')
+        tabela['data_calculo'] = orcamento.get('data_calculo', '')
+
+        try:
+            tabela.to_parquet(destino, index=False)
+            return True
+        except ImportError as e:
+            print(f"Exportação Parquet indisponível: {e}")
+            return False
+
+    def _blocos(self, orcamento: Dict) -> Iterator[List[Dict]]:
+        bloco = []
+        for linha in self.itens(orcamento):
+            bloco.append(linha)
+            if len(bloco) == self.linhas_por_escrita:
+                yield bloco
+                bloco = []
+        if bloco:
+            yield bloco
@@ -6,10 +6,13 @@ Sistema inteligente de análise de modelos 3D para marcenaria
 import io
 import re
 import json
+from itertools import chain, compress
 from typing import Dict, List, Optional, Tuple
 import numpy as np
 from datetime import datetime
 
+from geometria import RepositorioGeometria
+
 class FileAnalyzer:
     def __init__(self):
         """Inicializa o analisador de arquivos 3D"""
@@ -23,9 +26,28 @@ class FileAnalyzer:
             'fundo': ['back', 'fundo', 'traseira'],
             'tampo': ['top', 'tampo', 'superior']
         }
+        
+        # Unidades aceitas e fator de conversão para metros
+        self.unidades = {
+            'mm': 0.001,
+            'cm': 0.01,
+            'm': 1.0,
+            'pol': 0.0254
+        }
+        
+        # Faixas típicas (m) da maior dimensão de uma peça e de um projeto inteiro
+        self.faixa_peca_m = (0.05, 3.0)
+        self.faixa_projeto_m = (0.3, 10.0)
+        self.dimensao_referencia_m = 0.6
     
-    def analisar_arquivo_3d(self, uploaded_file) -> Optional[Dict]:
-        """Analisa arquivo 3D e extrai informações dos componentes"""
+    def analisar_arquivo_3d(self, uploaded_file, unidade: Optional[str] = None,
+                            geometria: Optional[RepositorioGeometria] = None) -> Optional[Dict]:
+        """Analisa arquivo 3D e extrai informações dos componentes
+        
+        A unidade do modelo ('mm', 'cm', 'm' ou 'pol') é inferida pelas dimensões
+        quando não informada. Com um repositório de geometria, as malhas vão para
+        ele e cada componente guarda só o geometria_id.
+        """
         try:
             # Verificar formato do arquivo
             nome_arquivo = uploaded_file.name.lower()
@@ -39,15 +61,18 @@ class FileAnalyzer:
             
             # Analisar baseado no formato
             if extensao == '.obj':
-                return self._analisar_obj(conteudo, nome_arquivo)
+                analise = self._analisar_obj(conteudo, nome_arquivo, unidade)
             elif extensao == '.dae':
-                return self._analisar_dae(conteudo, nome_arquivo)
+                analise = self._analisar_dae(conteudo, nome_arquivo)
             elif extensao == '.stl':
-                return self._analisar_stl(conteudo, nome_arquivo)
-            elif extensao == '.ply':
-                return self._analisar_ply(conteudo, nome_arquivo)
+                analise = self._analisar_stl(conteudo, nome_arquivo, unidade)
+            else:
+                analise = self._analisar_ply(conteudo, nome_arquivo, unidade)
             
-            return None
+            if analise and geometria is not None:
+                geometria.registrar_componentes(analise.get('componentes', []))
+            
+            return analise
             
         except Exception as e:
             print(f"Erro ao analisar arquivo: {e}")
@@ -57,8 +82,12 @@ class FileAnalyzer:
         """Obtém extensão do arquivo"""
         return '.' + nome_arquivo.split('.')[-1] if '.' in nome_arquivo else ''
     
-    def _analisar_obj(self, conteudo: bytes, nome_arquivo: str) -> Dict:
-        """Analisa arquivo OBJ"""
+    def _analisar_obj(self, conteudo: bytes, nome_arquivo: str, unidade: Optional[str] = None) -> Dict:
+        """Analisa arquivo OBJ
+        
+        Os materiais do modelo (usemtl) são contados por face; cada componente
+        recebe em material_modelo o material da maioria das suas faces.
+        """
         try:
             # Converter bytes para string
             texto = conteudo.decode('utf-8', errors='ignore')
@@ -69,6 +98,9 @@ class FileAnalyzer:
             faces = []
             objetos = []
             objeto_atual = None
+            bibliotecas_materiais = []
+            material_atual = None
+            faces_por_material = {}
             
             for linha in linhas:
                 linha = linha.strip()
@@ -76,27 +108,44 @@ class FileAnalyzer:
                 if linha.startswith('o ') or linha.startswith('g '):
                     # Novo objeto/grupo
                     if objeto_atual:
+                        objeto_atual['fim_vertice'] = len(vertices)
+                        objeto_atual['fim_face'] = len(faces)
                         objetos.append(objeto_atual)
+                    elif faces:
+                        # Faces antes do primeiro o/g formam um objeto implícito
+                        objetos.append({
+                            'nome': nome_arquivo.replace('.obj', ''),
+                            'inicio_vertice': 0,
+                            'inicio_face': 0,
+                            'fim_vertice': len(vertices),
+                            'fim_face': len(faces),
+                            'materiais': faces_por_material
+                        })
                     
                     nome_objeto = linha[2:].strip() or f"Objeto_{len(objetos)+1}"
                     objeto_atual = {
                         'nome': nome_objeto,
-                        'vertices': [],
-                        'faces': [],
-                        'inicio_vertice': len(vertices)
+                        'inicio_vertice': len(vertices),
+                        'inicio_face': len(faces),
+                        'materiais': {}
                     }
                 
+                elif linha.startswith('usemtl'):
+                    # O material vale para as faces seguintes, inclusive de outros objetos
+                    material_atual = linha[6:].strip() or None
+                
+                elif linha.startswith('mtllib'):
+                    bibliotecas_materiais.extend(linha[6:].split())
+                
                 elif linha.startswith('v '):
                     # Vértice
                     coords = linha[2:].split()
-                    if len(coords) >= 3:
-                        try:
-                            x, y, z = float(coords[0]), float(coords[1]), float(coords[2])
-                            vertices.append([x, y, z])
-                            if objeto_atual:
-                                objeto_atual['vertices'].append([x, y, z])
-                        except ValueError:
-                            continue
+                    try:
+                        vertices.append([float(coords[0]), float(coords[1]), float(coords[2])])
+                    except (ValueError, IndexError):
+                        # Manter a posição para não deslocar os índices das faces seguintes;
+                        # o vértice inválido é removido na validação da malha
+                        vertices.append([float('nan')] * 3)
                 
                 elif linha.startswith('f '):
                     # Face
@@ -104,37 +153,65 @@ class FileAnalyzer:
                     face_indices = []
                     
                     for indice in indices:
-                        # OBJ usa índices 1-based, converter para 0-based
+                        # OBJ usa índices 1-based (negativos são relativos ao último vértice)
                         idx = indice.split('/')[0]
                         try:
-                            face_indices.append(int(idx) - 1)
+                            valor = int(idx)
                         except ValueError:
-                            continue
+                            valor = 0
+                        
+                        if valor > 0:
+                            face_indices.append(valor - 1)
+                        elif valor < 0:
+                            face_indices.append(len(vertices) + valor)
+                        else:
+                            face_indices.append(-1)  # Índice inválido, tratado na validação
                     
                     if len(face_indices) >= 3:
                         faces.append(face_indices)
-                        if objeto_atual:
-                            # Ajustar índices relativos ao objeto
-                            face_relativa = [idx - objeto_atual['inicio_vertice'] for idx in face_indices]
-                            objeto_atual['faces'].append(face_relativa)
+                        if material_atual:
+                            contagem = objeto_atual['materiais'] if objeto_atual else faces_por_material
+                            contagem[material_atual] = contagem.get(material_atual, 0) + 1
             
             # Adicionar último objeto
             if objeto_atual:
+                objeto_atual['fim_vertice'] = len(vertices)
+                objeto_atual['fim_face'] = len(faces)
                 objetos.append(objeto_atual)
             
+            # Validar e reparar a malha antes de separar os componentes
+            vertices, coords, faces, validacao = self._validar_malha(vertices, faces, objetos)
+            
+            for obj in objetos:
+                # Índices das faces relativos ao objeto
+                inicio = obj['inicio_vertice']
+                obj['vertices'] = vertices[inicio:obj['fim_vertice']]
+                obj['coords'] = coords[inicio:obj['fim_vertice']]
+                obj['faces'] = [
+                    [idx - inicio for idx in face]
+                    for face in faces[obj['inicio_face']:obj['fim_face']]
+                ]
+            
             # Se não há objetos definidos, criar um único objeto com todos os dados
             if not objetos and vertices:
                 objetos = [{
                     'nome': nome_arquivo.replace('.obj', ''),
                     'vertices': vertices,
-                    'faces': faces
+                    'coords': coords,
+                    'faces': faces,
+                    'materiais': faces_por_material
                 }]
             
+            # Inferir a unidade uma única vez pelas caixas envolventes de todos os objetos
+            escala = self._inferir_unidade(self._caixas_objetos(coords, objetos), unidade)
+            
             # Analisar cada objeto/componente
             componentes = []
             for obj in objetos:
                 if obj['vertices']:
-                    componente = self._analisar_componente(obj)
+                    componente = self._analisar_componente(obj, escala['escala_m'])
+                    if obj.get('materiais'):
+                        componente['material_modelo'] = max(obj['materiais'], key=obj['materiais'].get)
                     componentes.append(componente)
             
             return {
@@ -143,6 +220,10 @@ class FileAnalyzer:
                 'total_vertices': len(vertices),
                 'total_faces': len(faces),
                 'componentes': componentes,
+                'materiais_modelo': sorted({comp['material_modelo'] for comp in componentes if 'material_modelo' in comp}),
+                'bibliotecas_materiais': bibliotecas_materiais,
+                'validacao': validacao,
+                'unidade': escala,
                 'data_analise': datetime.now().isoformat(),
                 'status': 'sucesso'
             }
@@ -151,6 +232,148 @@ class FileAnalyzer:
             print(f"Erro ao analisar OBJ: {e}")
             return self._criar_analise_fallback(nome_arquivo, 'OBJ')
     
+    def _validar_malha(self, vertices: List[List[float]], faces: List[List[int]],
+                       objetos: List[Dict]) -> Tuple[List[List[float]], np.ndarray, List[List[int]], Dict]:
+        """Valida e repara a malha com operações vetorizadas sobre a malha inteira.
+        
+        Remove vértices com coordenadas NaN/inf, faces com índices fora dos limites,
+        faces degeneradas (área nula ou menos de 3 vértices distintos) e faces
+        duplicadas. Arestas não-manifold são apenas reportadas. Os intervalos de
+        vértices e faces de cada objeto são ajustados no próprio dicionário.
+        """
+        relatorio = {
+            'vertices_invalidos': 0,
+            'faces_fora_limite': 0,
+            'faces_degeneradas': 0,
+            'faces_duplicadas': 0,
+            'arestas_nao_manifold': 0,
+            'arestas_borda': 0,
+            'faces_removidas': 0,
+            'reparada': False
+        }
+        
+        num_vertices = len(vertices)
+        num_faces = len(faces)
+        
+        coords = np.fromiter(chain.from_iterable(vertices), dtype=np.float64,
+                             count=num_vertices * 3).reshape(-1, 3)
+        vertice_valido = np.isfinite(coords).all(axis=1)
+        relatorio['vertices_invalidos'] = int(num_vertices - vertice_valido.sum())
+        manter = np.ones(num_faces, dtype=bool)
+        
+        if num_faces:
+            tamanhos = np.fromiter(map(len, faces), dtype=np.int64, count=num_faces)
+            indices = np.fromiter(chain.from_iterable(faces), dtype=np.int64,
+                                  count=int(tamanhos.sum()))
+            inicios = np.concatenate(([0], np.cumsum(tamanhos)[:-1]))
+            
+            # Vértices inválidos viram a origem para não propagar NaN nos cálculos
+            pontos = np.where(vertice_valido[:, None], coords, 0.0) if num_vertices else np.zeros((1, 3))
+            diagonal = float(np.linalg.norm(np.ptp(coords[vertice_valido], axis=0))) if vertice_valido.any() else 0.0
+            tolerancia_area = 1e-12 * diagonal ** 2
+            
+            fora = np.zeros(num_faces, dtype=bool)
+            degenerada = np.zeros(num_faces, dtype=bool)
+            chaves = np.full((num_faces, int(tamanhos.max())), -1, dtype=np.int64)
+            hashes = np.empty(num_faces, dtype=np.uint64)
+            multiplicadores = np.random.default_rng(0x0BC4).integers(
+                1, 2 ** 63, size=chaves.shape[1], dtype=np.uint64
+            ) | np.uint64(1)
+            blocos = []
+            
+            # Cada tamanho de polígono (triângulos, quads, ...) vira um bloco retangular
+            for tamanho in np.unique(tamanhos).tolist():
+                if tamanho == chaves.shape[1] and len(tamanhos) * tamanho == len(indices):
+                    linhas = np.arange(num_faces)
+                    bloco = indices.reshape(-1, tamanho)
+                else:
+                    linhas = np.flatnonzero(tamanhos == tamanho)
+                    bloco = indices[inicios[linhas, None] + np.arange(tamanho)]
+                blocos.append((linhas, bloco))
+                
+                # Índices fora dos limites ou que apontam para vértices inválidos
+                bloco_fora = (bloco < 0) | (bloco >= num_vertices)
+                seguro = np.where(bloco_fora, 0, bloco)
+                if num_vertices:
+                    bloco_fora |= ~vertice_valido[seguro]
+                fora[linhas] = bloco_fora.any(axis=1)
+                
+                # Área vetorial do polígono por triangulação em leque
+                origem = pontos[seguro[:, 0]]
+                area_vetorial = np.zeros((len(linhas), 3))
+                for j in range(1, tamanho - 1):
+                    area_vetorial += np.cross(pontos[seguro[:, j]] - origem, pontos[seguro[:, j + 1]] - origem)
+                area = np.linalg.norm(area_vetorial, axis=1) / 2
+                
+                ordenado = np.sort(bloco, axis=1)
+                distintos = 1 + (ordenado[:, 1:] != ordenado[:, :-1]).sum(axis=1)
+                degenerada[linhas] = (distintos < 3) | (area <= tolerancia_area)
+                
+                chaves[linhas, :tamanho] = ordenado
+                hashes[linhas] = (ordenado.astype(np.uint64) * multiplicadores[:tamanho]).sum(
+                    axis=1, dtype=np.uint64
+                ) + np.uint64(tamanho)
+            
+            degenerada &= ~fora
+            relatorio['faces_fora_limite'] = int(fora.sum())
+            relatorio['faces_degeneradas'] = int(degenerada.sum())
+            manter = ~fora & ~degenerada
+            
+            # Faces duplicadas: mesmo conjunto de vértices, independente da orientação.
+            # O hash agrupa candidatas e a comparação exata descarta colisões.
+            candidatas = np.flatnonzero(manter)
+            _, primeiras, inverso = np.unique(hashes[candidatas], return_index=True, return_inverse=True)
+            repetidas = np.flatnonzero(primeiras[inverso] != np.arange(len(candidatas)))
+            if len(repetidas):
+                originais = candidatas[primeiras[inverso[repetidas]]]
+                repetidas = candidatas[repetidas]
+                duplicada = repetidas[(chaves[repetidas] == chaves[originais]).all(axis=1)]
+                manter[duplicada] = False
+                relatorio['faces_duplicadas'] = len(duplicada)
+            
+            # Arestas compartilhadas por mais de duas faces (não-manifold) ou por apenas uma (borda)
+            origens, destinos = [], []
+            for linhas, bloco in blocos:
+                ativo = manter[linhas]
+                origens.append(bloco[ativo].ravel())
+                destinos.append(np.roll(bloco[ativo], -1, axis=1).ravel())
+            a = np.concatenate(origens)
+            b = np.concatenate(destinos)
+            if len(a):
+                _, contagem = np.unique(np.minimum(a, b) * num_vertices + np.maximum(a, b), return_counts=True)
+                relatorio['arestas_nao_manifold'] = int((contagem > 2).sum())
+                relatorio['arestas_borda'] = int((contagem == 1).sum())
+            
+            relatorio['faces_removidas'] = int(num_faces - manter.sum())
+        
+        remover_vertices = relatorio['vertices_invalidos'] > 0
+        remover_faces = relatorio['faces_removidas'] > 0
+        relatorio['reparada'] = remover_vertices or remover_faces
+        
+        if not relatorio['reparada']:
+            return vertices, coords, faces, relatorio
+        
+        # Reparo: compactar vértices, remapear índices e ajustar os intervalos dos objetos
+        acumulado_vertices = np.concatenate(([0], np.cumsum(vertice_valido)))
+        acumulado_faces = np.concatenate(([0], np.cumsum(manter)))
+        
+        if remover_vertices:
+            coords = coords[vertice_valido]
+            vertices = coords.tolist()
+            if num_faces:
+                remapeados = acumulado_vertices[np.clip(indices, 0, num_vertices)].tolist()
+                limites = np.append(inicios, len(indices)).tolist()
+                faces = [remapeados[limites[i]:limites[i + 1]] for i in np.flatnonzero(manter).tolist()]
+        else:
+            faces = list(compress(faces, manter.tolist()))
+        
+        for obj in objetos:
+            for campo, acumulado in (('vertice', acumulado_vertices), ('face', acumulado_faces)):
+                obj[f'inicio_{campo}'] = int(acumulado[obj[f'inicio_{campo}']])
+                obj[f'fim_{campo}'] = int(acumulado[obj[f'fim_{campo}']])
+        
+        return vertices, coords, faces, relatorio
+    
     def _analisar_dae(self, conteudo: bytes, nome_arquivo: str) -> Dict:
         """Analisa arquivo DAE (Collada)"""
         try:
@@ -188,13 +411,13 @@ class FileAnalyzer:
             print(f"Erro ao analisar DAE: {e}")
             return self._criar_analise_fallback(nome_arquivo, 'DAE')
     
-    def _analisar_stl(self, conteudo: bytes, nome_arquivo: str) -> Dict:
+    def _analisar_stl(self, conteudo: bytes, nome_arquivo: str, unidade: Optional[str] = None) -> Dict:
         """Analisa arquivo STL"""
         try:
             # STL pode ser ASCII ou binário
             if conteudo.startswith(b'solid'):
                 # STL ASCII
-                return self._analisar_stl_ascii(conteudo, nome_arquivo)
+                return self._analisar_stl_ascii(conteudo, nome_arquivo, unidade)
             else:
                 # STL binário
                 return self._analisar_stl_binario(conteudo, nome_arquivo)
@@ -203,7 +426,7 @@ class FileAnalyzer:
             print(f"Erro ao analisar STL: {e}")
             return self._criar_analise_fallback(nome_arquivo, 'STL')
     
-    def _analisar_stl_ascii(self, conteudo: bytes, nome_arquivo: str) -> Dict:
+    def _analisar_stl_ascii(self, conteudo: bytes, nome_arquivo: str, unidade: Optional[str] = None) -> Dict:
         """Analisa STL ASCII"""
         texto = conteudo.decode('utf-8', errors='ignore')
         linhas = texto.split('\n')
@@ -236,13 +459,15 @@ class FileAnalyzer:
             'vertices': vertices,
             'faces': faces
         }
+        escala = self._inferir_unidade(self._caixa_vertices(vertices), unidade)
         
         return {
             'arquivo': nome_arquivo,
             'formato': 'STL',
             'total_vertices': len(vertices),
             'total_faces': len(faces),
-            'componentes': [self._analisar_componente(componente)],
+            'componentes': [self._analisar_componente(componente, escala['escala_m'])],
+            'unidade': escala,
             'data_analise': datetime.now().isoformat(),
             'status': 'sucesso'
         }
@@ -252,7 +477,7 @@ class FileAnalyzer:
         # Implementação simplificada para STL binário
         return self._criar_analise_fallback(nome_arquivo, 'STL')
     
-    def _analisar_ply(self, conteudo: bytes, nome_arquivo: str) -> Dict:
+    def _analisar_ply(self, conteudo: bytes, nome_arquivo: str, unidade: Optional[str] = None) -> Dict:
         """Analisa arquivo PLY"""
         try:
             texto = conteudo.decode('utf-8', errors='ignore')
@@ -276,13 +501,15 @@ class FileAnalyzer:
                 'vertices': self._gerar_vertices_exemplo(num_vertices or 8),
                 'faces': self._gerar_faces_exemplo(num_faces or 12)
             }
+            escala = self._inferir_unidade(self._caixa_vertices(componente['vertices']), unidade)
             
             return {
                 'arquivo': nome_arquivo,
                 'formato': 'PLY',
                 'total_vertices': num_vertices or 8,
                 'total_faces': num_faces or 12,
-                'componentes': [self._analisar_componente(componente)],
+                'componentes': [self._analisar_componente(componente, escala['escala_m'])],
+                'unidade': escala,
                 'data_analise': datetime.now().isoformat(),
                 'status': 'sucesso'
             }
@@ -291,18 +518,71 @@ class FileAnalyzer:
             print(f"Erro ao analisar PLY: {e}")
             return self._criar_analise_fallback(nome_arquivo, 'PLY')
     
-    def _analisar_componente(self, componente: Dict) -> Dict:
-        """Analisa um componente individual"""
+    def _caixas_objetos(self, coords: np.ndarray, objetos: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+        """Cantos mínimo e máximo por objeto, calculados de uma vez sobre o array global"""
+        inicios = [obj['inicio_vertice'] for obj in objetos if obj['fim_vertice'] > obj['inicio_vertice']]
+        
+        if not inicios:
+            if not len(coords):
+                return np.zeros((0, 3)), np.zeros((0, 3))
+            return coords.min(axis=0, keepdims=True), coords.max(axis=0, keepdims=True)
+        
+        # Os objetos ocupam intervalos contíguos até o fim do arquivo,
+        # então cada segmento do reduceat corresponde exatamente a um objeto
+        return np.minimum.reduceat(coords, inicios, axis=0), np.maximum.reduceat(coords, inicios, axis=0)
+    
+    def _caixa_vertices(self, vertices: List[List[float]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Cantos mínimo e máximo de uma lista de vértices"""
+        if not vertices:
+            return np.zeros((0, 3)), np.zeros((0, 3))
+        array = np.asarray(vertices, dtype=np.float64)
+        return array.min(axis=0, keepdims=True), array.max(axis=0, keepdims=True)
+    
+    def _inferir_unidade(self, caixas: Tuple[np.ndarray, np.ndarray], unidade: Optional[str] = None) -> Dict:
+        """Infere a unidade do modelo comparando as dimensões com as de móveis típicos
+        
+        Cada unidade candidata é pontuada pela fração de componentes cuja maior
+        dimensão cai na faixa típica de uma peça, mais um ponto se o projeto
+        inteiro cai na faixa típica de um ambiente. O desempate é pela mediana
+        mais próxima da dimensão de referência. Uma unidade explícita tem precedência.
+        """
+        if unidade in self.unidades:
+            return {'unidade': unidade, 'escala_m': self.unidades[unidade], 'inferida': False}
+        
+        minimos, maximos = caixas
+        maiores = (maximos - minimos).max(axis=1) if len(minimos) else np.zeros(0)
+        maiores = maiores[np.isfinite(maiores) & (maiores > 0)]
+        if not len(maiores):
+            return {'unidade': 'mm', 'escala_m': self.unidades['mm'], 'inferida': False}
+        projeto = float((maximos.max(axis=0) - minimos.min(axis=0)).max())
+        
+        nomes = list(self.unidades)
+        fatores = np.array([self.unidades[nome] for nome in nomes])
+        pecas_m = fatores[:, None] * maiores[None, :]
+        projeto_m = fatores * projeto
+        
+        minimo, maximo = self.faixa_peca_m
+        pontuacao = ((pecas_m >= minimo) & (pecas_m <= maximo)).mean(axis=1)
+        minimo, maximo = self.faixa_projeto_m
+        pontuacao += (projeto_m >= minimo) & (projeto_m <= maximo)
+        distancia = np.abs(np.log10(np.median(pecas_m, axis=1) / self.dimensao_referencia_m))
+        escolhida = nomes[int(np.lexsort((distancia, -pontuacao))[0])]
+        
+        return {'unidade': escolhida, 'escala_m': self.unidades[escolhida], 'inferida': True}
+    
+    def _analisar_componente(self, componente: Dict, escala_m: float = 0.001) -> Dict:
+        """Analisa um componente individual (escala_m converte a unidade do modelo para metros)"""
         vertices = componente.get('vertices', [])
         faces = componente.get('faces', [])
         nome = componente.get('nome', 'Componente')
         
         # Calcular dimensões e área
         if vertices:
-            vertices_array = np.array(vertices)
+            # Reaproveitar o array já montado na validação da malha, quando houver
+            vertices_array = componente['coords'] if 'coords' in componente else np.array(vertices)
             min_coords = np.min(vertices_array, axis=0)
             max_coords = np.max(vertices_array, axis=0)
-            dimensoes = max_coords - min_coords
+            dimensoes = (max_coords - min_coords) * escala_m * 1000
             
             # Área aproximada (soma das faces principais)
             largura, altura, profundidade = abs(dimensoes[0]), abs(dimensoes[1]), abs(dimensoes[2])
@@ -317,7 +597,7 @@ class FileAnalyzer:
             'vertices': vertices,
             'faces': faces,
             'dimensoes_mm': dimensoes.tolist() if isinstance(dimensoes, np.ndarray) else dimensoes,
-            'area_m2': round(area_m2, 3),
+            'area_m2': round(float(area_m2), 3),
             'num_vertices': len(vertices),
             'num_faces': len(faces)
         }
@@ -0,0 +1,112 @@
+"""
+Repositório de Geometria - Orca Interiores SaaS
+Malhas dos componentes guardadas uma única vez e referenciadas por id
+"""
+
+import hashlib
+import threading
+from typing import Dict, List, Optional
+import numpy as np
+
+
+class RepositorioGeometria:
+    def __init__(self):
+        """Inicializa o repositório de geometria
+
+        Cada malha fica em arrays numpy (vértices N×3, índices das faces em um
+        vetor contínuo com os deslocamentos de cada face) sob um id derivado do
+        conteúdo: componentes idênticos compartilham a mesma entrada. Análise e
+        orçamento carregam só o geometria_id; a malha é lida apenas pelas
+        visualizações 3D.
+        """
+        self._malhas = {}
+        self._trava = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._malhas)
+
+    def __contains__(self, geometria_id: str) -> bool:
+        return geometria_id in self._malhas
+
+    def registrar(self, vertices, faces) -> str:
+        """Guarda uma malha e retorna o id dela (o mesmo para malhas iguais)"""
+        coords = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+        tamanhos = np.fromiter((len(face) for face in faces), dtype=np.int64, count=len(faces))
+        indices = np.fromiter(
+            (indice for face in faces for indice in face), dtype=np.int32, count=int(tamanhos.sum())
+        )
+
+        resumo = hashlib.sha1()
+        for array in (coords, tamanhos, indices):
+            resumo.update(np.ascontiguousarray(array).tobytes())
+            resumo.update(b'|')
+        geometria_id = resumo.hexdigest()[:16]
+
+        with self._trava:
+            if geometria_id not in self._malhas:
+                self._malhas[geometria_id] = {
+                    'vertices': coords,
+                    'indices': indices,
+                    'deslocamentos': np.concatenate([[0], np.cumsum(tamanhos)])
+                }
+        return geometria_id
+
+    def registrar_componentes(self, componentes: List[Dict]) -> int:
+        """Move a malha de cada componente para o repositório, deixando o geometria_id
+
+        Os componentes são alterados no próprio dicionário; num_vertices e
+        num_faces continuam disponíveis. Retorna quantas malhas novas entraram.
+        """
+        antes = len(self._malhas)
+        for comp in componentes:
+            if 'vertices' in comp:
+                comp['geometria_id'] = self.registrar(comp.pop('vertices'), comp.pop('faces', []))
+        return len(self._malhas) - antes
+
+    def obter(self, geometria_id: Optional[str]) -> Optional[Dict]:
+        """Malha completa (vertices como lista, faces como listas de índices) ou None"""
+        malha = self._malhas.get(geometria_id)
+        if malha is None:
+            return None
+        indices = malha['indices'].tolist()
+        limites = malha['deslocamentos'].tolist()
+        return {
+            'vertices': malha['vertices'].tolist(),
+            'faces': [indices[a:b] for a, b in zip(limites[:-1], limites[1:])]
+        }
+
+    def triangulos(self, geometria_id: Optional[str]) -> Optional[Dict[str, np.ndarray]]:
+        """Vértices e triângulos (faces em leque) prontos para um Mesh3d, ou None
+
+        Faces com índices negativos ou além do último vértice são descartadas.
+        """
+        malha = self._malhas.get(geometria_id)
+        if malha is None:
+            return None
+
+        deslocamentos = malha['deslocamentos']
+        tamanhos = np.diff(deslocamentos)
+        indices = malha['indices']
+        # Faces com índice fora de [0, num_vertices) ficam de fora, como na validação da análise
+        fora = (indices < 0) | (indices >= len(malha['vertices']))
+        acumulado = np.concatenate([[0], np.cumsum(fora)])
+        face_invalida = acumulado[deslocamentos[1:]] > acumulado[deslocamentos[:-1]]
+        # Face com k vértices vira k - 2 triângulos (v0, vj, vj+1)
+        por_face = np.where(face_invalida, 0, np.maximum(tamanhos - 2, 0))
+        face = np.repeat(np.arange(len(tamanhos)), por_face)
+        j = np.arange(int(por_face.sum())) - np.repeat(np.cumsum(por_face) - por_face, por_face) + 1
+        inicio = deslocamentos[:-1][face]
+
+        return {
+            'vertices': malha['vertices'],
+            'triangulos': np.stack([indices[inicio], indices[inicio + j], indices[inicio + j + 1]], axis=1)
+        }
+
+    def tamanho_bytes(self) -> int:
+        """Memória ocupada pelos arrays das malhas"""
+        return sum(array.nbytes for malha in self._malhas.values() for array in malha.values())
+
+    def exportar(self, ids: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """Malhas (todas ou só os ids informados) em formato serializável"""
+        ids = list(self._malhas) if ids is None else ids
+        return {geometria_id: self.obter(geometria_id) for geometria_id in dict.fromkeys(ids) if geometria_id in self._malhas}
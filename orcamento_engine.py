@@ -4,73 +4,167 @@ Sistema completo de cálculo de custos para marcenaria
 Versão corrigida com compatibilidade Plotly
 """
 
+import re
 import json
-from typing import Dict, List, Any
+import time
+import hashlib
+import threading
+import functools
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional, TextIO, BinaryIO, Callable
 from datetime import datetime
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
+import numpy as np
+
+from catalogo_precos import CatalogoPrecos
+from plano_corte import OtimizadorCorte
+from relatorio import GeradorRelatorio
+from relatorio_pdf import GeradorPDF
+from exportacao import ExportadorOrcamento
+
+# Modo em centavos: área e perímetro (m), desperdício e frações entram na conta
+# como inteiros em 1/10.000; preços, em centavos
+ESCALA_MEDIDAS = 10_000
+
+
+def _quantizar(valores, escala: int) -> np.ndarray:
+    """Converte valores em inteiros na escala dada, arredondando metade para cima"""
+    return np.floor(np.asarray(valores, dtype=np.float64) * escala + 0.5).astype(np.int64)
+
+
+def _dividir_arredondando(numerador: np.ndarray, divisor: int) -> np.ndarray:
+    """Divisão inteira com arredondamento metade para cima (valores não negativos)"""
+    return (numerador + divisor // 2) // divisor
+
+
+def _com_foto_catalogo(metodo):
+    """Executa o método com uma única foto das tabelas do catálogo (ver OrcamentoEngine.foto_catalogo)"""
+    @functools.wraps(metodo)
+    def executar(self, *args, **kwargs):
+        with self.foto_catalogo():
+            return metodo(self, *args, **kwargs)
+    return executar
+
 
 class OrcamentoEngine:
-    def __init__(self):
-        # Preços atualizados da Léo Madeiras (30/06/2025)
-        self.precos_materiais = {
-            'mdf_15mm': 69.15,      # R$/m²
-            'mdf_18mm': 79.50,      # R$/m²
-            'compensado_15mm': 64.00, # R$/m²
-            'compensado_18mm': 72.80, # R$/m²
-            'melamina_15mm': 89.50,   # R$/m²
-            'melamina_18mm': 98.20    # R$/m²
-        }
+    # Gráficos já montados, por impressão digital do orçamento (compartilhado entre instâncias)
+    _cache_graficos = OrderedDict()
+    _trava_cache_graficos = threading.Lock()
+    
+    def __init__(self, catalogo: Optional[CatalogoPrecos] = None):
+        # Preços vêm do catálogo (arquivo ou banco), recarregado quando a origem muda
+        self.catalogo = catalogo or CatalogoPrecos()
         
-        # Custos de acessórios por tipo de móvel
-        self.custos_acessorios = {
-            'armario': {
-                'comum': {'dobradica': 12.50, 'puxador': 8.90, 'corredicao': 25.00},
-                'premium': {'dobradica': 18.75, 'puxador': 15.50, 'corredicao': 45.00}
-            },
-            'gaveta': {
-                'comum': {'corredicao_gaveta': 35.00, 'puxador': 8.90},
-                'premium': {'corredicao_gaveta': 65.00, 'puxador': 15.50}
-            },
-            'porta': {
-                'comum': {'dobradica': 12.50, 'puxador': 8.90},
-                'premium': {'dobradica': 18.75, 'puxador': 15.50}
-            },
-            'prateleira': {
-                'comum': {'suporte': 4.50},
-                'premium': {'suporte': 8.00}
-            },
-            'painel': {
-                'comum': {'fixacao': 3.00},
-                'premium': {'fixacao': 5.50}
-            },
-            'fundo': {
-                'comum': {'fixacao': 2.50},
-                'premium': {'fixacao': 4.00}
-            },
-            'tampo': {
-                'comum': {'suporte': 6.00, 'acabamento': 8.00},
-                'premium': {'suporte': 12.00, 'acabamento': 15.00}
-            }
+        # Multiplicadores de complexidade do projeto
+        self.multiplicadores_complexidade = {
+            'simples': 1.0,
+            'media': 1.2,
+            'complexa': 1.5,
+            'premium': 2.0
         }
         
-        # Custos de mão de obra
-        self.custos_mao_obra = {
-            'corte_reto': 2.50,      # R$/metro linear
-            'furo_dobradica': 1.50,   # R$/furo
-            'taxa_minima': 15.00      # R$/peça
+        # Margens de lucro (%) avaliadas na comparação de cenários
+        self.margens_cenarios = [10, 20, 30, 40, 50]
+        
+        # Chapas padrão (mm) por material; materiais com veio não podem ter peças giradas
+        self.dimensoes_chapas = {
+            'mdf_15mm': (2750, 1850),
+            'mdf_18mm': (2750, 1850),
+            'compensado_15mm': (2200, 1600),
+            'compensado_18mm': (2200, 1600),
+            'melamina_15mm': (2750, 1850),
+            'melamina_18mm': (2750, 1850)
         }
+        self.materiais_com_veio = {'compensado_15mm', 'compensado_18mm'}
         
-        # Fatores de desperdício por material
-        self.desperdicio = {
-            'mdf_15mm': 0.15,        # 15%
-            'mdf_18mm': 0.15,        # 15%
-            'compensado_15mm': 0.12,  # 12%
-            'compensado_18mm': 0.12,  # 12%
-            'melamina_15mm': 0.18,    # 18%
-            'melamina_18mm': 0.18     # 18%
+        # Materiais do modelo (usemtl do OBJ) → materiais do catálogo: a primeira
+        # expressão que casar com o nome decide; nomes iguais a um material do
+        # catálogo valem direto e os demais ficam com o material das configurações
+        self.regras_materiais = [
+            (r'melamin.*15|bp.*15', 'melamina_15mm'),
+            (r'melamin|\bbp\b|laminad|formica|frente|porta|front', 'melamina_18mm'),
+            (r'compensad.*15|plywood.*15', 'compensado_15mm'),
+            (r'compensad|plywood|multilaminad', 'compensado_18mm'),
+            (r'mdf.*18|18\s*mm.*mdf', 'mdf_18mm'),
+            (r'mdf|carca[cç]a|caixa|carcass|body', 'mdf_15mm')
+        ]
+        
+        # Componentes mais finos que isso são um painel único; os demais são caixas de 6 painéis
+        self.espessura_maxima_painel_mm = 60
+        self.otimizador_corte = OtimizadorCorte()
+        self.gerador_relatorio = GeradorRelatorio()
+        self.gerador_pdf = GeradorPDF()
+        self.exportador = ExportadorOrcamento()
+        
+        # Gráficos: acima de 2 × top_n componentes os dados são agregados
+        self.graficos_top_n = 15
+        self.graficos_max_pontos = 2000
+        self.limite_cache_graficos = 32
+        
+        # Incertezas do modo de risco: triangulares (mínimo, moda, máximo) como
+        # multiplicadores do valor da tabela e desvios-padrão relativos dos preços
+        self.incertezas_risco = {
+            'desperdicio': (0.6, 1.0, 2.0),
+            'mao_obra': (0.9, 1.0, 1.4),
+            'preco_material': 0.05,
+            'preco_acessorios': 0.05
         }
+        
+        # Valores usados quando o material não está na tabela
+        self.preco_material_padrao = self.catalogo.preco_material_padrao
+        self.desperdicio_padrao = self.catalogo.desperdicio_padrao
+        
+        # Foto das tabelas do cálculo em andamento, por thread (o engine é compartilhado)
+        self._calculo = threading.local()
+
+    # Tabelas do catálogo em uso. Os arrays são indexados pelos códigos; a última
+    # posição de cada eixo é reservada para valores desconhecidos.
+    precos_materiais = property(lambda self: self._tabelas()['materiais'])
+    custos_acessorios = property(lambda self: self._tabelas()['acessorios'])
+    custos_mao_obra = property(lambda self: self._tabelas()['mao_obra'])
+    desperdicio = property(lambda self: self._tabelas()['desperdicio'])
+    codigos_materiais = property(lambda self: self._tabelas()['codigos_materiais'])
+    codigos_tipos = property(lambda self: self._tabelas()['codigos_tipos'])
+    codigos_qualidades = property(lambda self: self._tabelas()['codigos_qualidades'])
+    tabela_precos = property(lambda self: self._tabelas()['tabela_precos'])
+    tabela_desperdicio = property(lambda self: self._tabelas()['tabela_desperdicio'])
+    tabela_acessorios = property(lambda self: self._tabelas()['tabela_acessorios'])
+    versao_catalogo = property(lambda self: self._tabelas()['versao'])
+
+    def _tabelas(self) -> Dict:
+        """Tabelas do cálculo em andamento nesta thread ou, fora de um cálculo, as atuais do catálogo"""
+        return getattr(self._calculo, 'tabelas', None) or self.catalogo.tabelas
+
+    @contextmanager
+    def foto_catalogo(self):
+        """Fixa as tabelas do catálogo durante um cálculo
+        
+        O catálogo é conferido uma vez na entrada e todas as leituras de preço
+        do cálculo usam a mesma versão, mesmo que ele seja recarregado no meio.
+        Chamadas aninhadas reaproveitam a foto da chamada externa.
+        """
+        if getattr(self._calculo, 'tabelas', None) is not None:
+            yield self._calculo.tabelas
+            return
+        
+        self.atualizar_catalogo()
+        self._calculo.tabelas = self.catalogo.tabelas
+        try:
+            yield self._calculo.tabelas
+        finally:
+            self._calculo.tabelas = None
+
+    def atualizar_catalogo(self) -> bool:
+        """Recarrega o catálogo de preços se a origem mudou"""
+        return self.catalogo.verificar_atualizacao()
+
+    def obter_fonte_precos(self) -> str:
+        """Descrição da fonte de preços do catálogo em uso"""
+        tabelas = self._tabelas()
+        return f"{tabelas['fonte']} - Atualizado em {tabelas['data_atualizacao']}"
 
     def detectar_tipo_componente(self, nome_componente: str) -> str:
         """Detecta o tipo de componente baseado no nome"""
@@ -122,8 +216,8 @@ class OrcamentoEngine:
         tipo = componente.get('tipo', self.detectar_tipo_componente(componente.get('nome', '')))
         
         # Custo do material
-        preco_material = self.precos_materiais.get(material, 69.15)
-        fator_desperdicio = 1 + self.desperdicio.get(material, 0.15)
+        preco_material = self.precos_materiais.get(material, self.preco_material_padrao)
+        fator_desperdicio = 1 + self.desperdicio.get(material, self.desperdicio_padrao)
         custo_material = area_m2 * preco_material * fator_desperdicio
         
         # Custo dos acessórios
@@ -131,13 +225,7 @@ class OrcamentoEngine:
         custo_acessorios = sum(acessorios.values())
         
         # Multiplicador de complexidade
-        multiplicadores = {
-            'simples': 1.0,
-            'media': 1.2,
-            'complexa': 1.5,
-            'premium': 2.0
-        }
-        multiplicador = multiplicadores.get(complexidade, 1.0)
+        multiplicador = self.multiplicadores_complexidade.get(complexidade, 1.0)
         
         # Custo de mão de obra (estimativa baseada no perímetro)
         perimetro_estimado = 2 * (area_m2 ** 0.5) * 4  # Estimativa grosseira
@@ -158,124 +246,730 @@ class OrcamentoEngine:
             'multiplicador_complexidade': multiplicador,
             'custo_total': round(custo_total, 2),
             'preco_por_m2': round(custo_total / area_m2, 2),
-            'vertices': componente.get('vertices', []),
-            'faces': componente.get('faces', []),
-            'dimensoes_mm': componente.get('dimensoes_mm', [1000, 1000, 20])
+            'geometria_id': componente.get('geometria_id')
+        }
+
+    def montar_colunas(self, componentes: List[Dict]) -> Dict[str, Any]:
+        """Converte a lista de componentes em colunas NumPy para o cálculo vetorizado"""
+        n = len(componentes)
+        
+        tipos = [
+            comp.get('tipo') or self.detectar_tipo_componente(comp.get('nome', ''))
+            for comp in componentes
+        ]
+        desconhecido = len(self.codigos_tipos)
+        codigos = np.fromiter(
+            (self.codigos_tipos.get(tipo, desconhecido) for tipo in tipos), dtype=np.int64, count=n
+        )
+        
+        # Mesma regra de calcular_area_componente, sem passar por ela a cada componente
+        area = np.fromiter(
+            (comp['area_m2'] if 'area_m2' in comp else self.calcular_area_componente(comp)
+             for comp in componentes),
+            dtype=np.float64, count=n
+        )
+        area = np.maximum(area, 0.1)
+        
+        # Perímetro informado ou estimado a partir da área (mesma estimativa do cálculo por componente)
+        perimetro = np.fromiter(
+            (comp.get('perimetro_m', np.nan) for comp in componentes), dtype=np.float64, count=n
+        )
+        perimetro = np.where(np.isnan(perimetro), 2 * np.sqrt(area) * 4, perimetro)
+        
+        quantidade = np.fromiter(
+            (comp.get('quantidade', 1) for comp in componentes), dtype=np.int64, count=n
+        )
+        
+        # Área dos painéis que saem das chapas (base do custo de material com plano de corte)
+        dimensoes, painel_unico = self._dimensoes_paineis(componentes)
+        area_paineis = np.where(
+            painel_unico,
+            dimensoes[:, 0] * dimensoes[:, 1],
+            2 * (dimensoes[:, 0] * dimensoes[:, 1] + dimensoes[:, 0] * dimensoes[:, 2] + dimensoes[:, 1] * dimensoes[:, 2])
+        ) / 1_000_000
+        
+        return {
+            'nome': [comp.get('nome', f'Componente_{tipo}') for comp, tipo in zip(componentes, tipos)],
+            'tipo': tipos,
+            'codigo_tipo': codigos,
+            'area_m2': area,
+            'area_paineis_m2': area_paineis,
+            'perimetro_m': perimetro,
+            'quantidade': quantidade
+        }
+
+    def mapear_materiais(self, componentes: List[Dict], material: str,
+                         regras: List[tuple] = None) -> Optional[np.ndarray]:
+        """Código de catálogo do material de cada componente, pelo material do modelo
+        
+        As regras são avaliadas uma vez por nome distinto de material do modelo e
+        o resultado é espalhado para os componentes pelos índices do np.unique.
+        Retorna None quando o modelo não informa materiais (projeto de material único).
+        """
+        nomes = [comp.get('material_modelo') or '' for comp in componentes]
+        unicos, inversos = np.unique(nomes, return_inverse=True)
+        if not len(unicos) or (len(unicos) == 1 and not unicos[0]):
+            return None
+        
+        padrao = self.codigos_materiais.get(material, len(self.codigos_materiais))
+        compiladas = [(re.compile(expressao, re.IGNORECASE), destino) for expressao, destino in (regras or self.regras_materiais)]
+        
+        def codigo(nome: str) -> int:
+            if nome in self.codigos_materiais:
+                return self.codigos_materiais[nome]
+            for expressao, destino in compiladas:
+                if nome and expressao.search(nome):
+                    return self.codigos_materiais.get(destino, padrao)
+            return padrao
+        
+        return np.array([codigo(nome) for nome in unicos.tolist()], dtype=np.int64)[inversos]
+
+    def montar_colunas_materiais(self, componentes: List[Dict], material: str,
+                                 regras: List[tuple] = None) -> Dict[str, Any]:
+        """Colunas do projeto com o código de material por componente, quando o modelo informa materiais"""
+        colunas = self.montar_colunas(componentes)
+        codigos = self.mapear_materiais(componentes, material, regras)
+        if codigos is not None:
+            colunas['codigo_material'] = codigos
+        return colunas
+
+    def _material_e_desperdicio(self, colunas: Dict[str, Any], material: str, plano_corte: Dict = None):
+        """Código do material e desperdício: escalares no projeto de material único,
+        arrays por componente quando as colunas trazem codigo_material
+        
+        Com plano de corte, o desperdício real das chapas substitui o fator da
+        tabela (em projetos mistos, o plano de cada material vale para ele).
+        """
+        if 'codigo_material' not in colunas:
+            m = self.codigos_materiais.get(material, len(self.codigos_materiais))
+            return m, plano_corte['fator_desperdicio'] if plano_corte else self.tabela_desperdicio[m]
+        
+        m = colunas['codigo_material']
+        desperdicio = self.tabela_desperdicio.copy()
+        if plano_corte:
+            for nome, plano in plano_corte.get('por_material', {plano_corte['material']: plano_corte}).items():
+                desperdicio[self.codigos_materiais.get(nome, len(self.codigos_materiais))] = plano['fator_desperdicio']
+        return m, desperdicio[m]
+
+    def _area_material(self, colunas: Dict[str, Any], plano_corte: Dict = None) -> np.ndarray:
+        """Área de material de cada componente (por unidade) sobre a qual incide o desperdício
+        
+        Com plano de corte, o desperdício real é a razão entre chapas e painéis,
+        então a base é a área dos painéis que o plano corta (um painel para peças
+        finas, não as 6 faces da caixa): área dos painéis × (1 + desperdício) é a
+        área das chapas do plano. Sem plano, vale a área da análise.
+        """
+        if plano_corte and 'area_paineis_m2' in colunas:
+            return colunas['area_paineis_m2']
+        return colunas['area_m2']
+
+    def _custo_material_colunar(self, colunas: Dict[str, Any], material: str,
+                                plano_corte: Dict = None) -> np.ndarray:
+        """Custo de material de cada componente (área × preço × desperdício)
+        
+        Com plano de corte, o desperdício real das chapas substitui o fator da tabela.
+        """
+        m, desperdicio = self._material_e_desperdicio(colunas, material, plano_corte)
+        preco_efetivo = self.tabela_precos[m] * (1 + desperdicio)
+        return self._area_material(colunas, plano_corte) * preco_efetivo * colunas['quantidade']
+
+    def _custo_acessorios_colunar(self, colunas: Dict[str, Any], qualidade_acessorios: str) -> np.ndarray:
+        """Custo de acessórios de cada componente, pelo tipo e pela qualidade"""
+        q = self.codigos_qualidades.get(qualidade_acessorios, len(self.codigos_qualidades))
+        return self.tabela_acessorios[colunas['codigo_tipo'], q] * colunas['quantidade']
+
+    def _custo_corte_colunar(self, colunas: Dict[str, Any]) -> np.ndarray:
+        """Custo de corte de cada componente, respeitando a taxa mínima por peça"""
+        return np.maximum(
+            colunas['perimetro_m'] * self.custos_mao_obra['corte_reto'],
+            self.custos_mao_obra['taxa_minima']
+        ) * colunas['quantidade']
+
+    def _combinar_custos(self, colunas: Dict[str, Any], custo_material: np.ndarray,
+                         custo_acessorios: np.ndarray, custo_corte: np.ndarray,
+                         complexidade: str) -> Dict[str, np.ndarray]:
+        """Aplica a complexidade e monta as colunas de custo de cada componente"""
+        multiplicador = self.multiplicadores_complexidade.get(complexidade, 1.0)
+        custo_total = (custo_material + custo_acessorios + custo_corte) * multiplicador
+        
+        return {
+            'custo_material': custo_material,
+            'custo_acessorios': custo_acessorios,
+            'custo_corte': custo_corte,
+            'custo_total': custo_total,
+            'preco_por_m2': custo_total / (colunas['area_m2'] * colunas['quantidade']),
+            'multiplicador_complexidade': multiplicador
+        }
+
+    def _custo_material_centavos(self, colunas: Dict[str, Any], material: str,
+                                 plano_corte: Dict = None) -> np.ndarray:
+        """Custo de material de cada componente em centavos (aritmética inteira exata)"""
+        m, desperdicio = self._material_e_desperdicio(colunas, material, plano_corte)
+        preco = _quantizar(self.tabela_precos[m], 100)
+        fator = ESCALA_MEDIDAS + _quantizar(desperdicio, ESCALA_MEDIDAS)
+        area = _quantizar(self._area_material(colunas, plano_corte), ESCALA_MEDIDAS)
+        return _dividir_arredondando(area * colunas['quantidade'] * preco * fator, ESCALA_MEDIDAS ** 2)
+
+    def _custo_acessorios_centavos(self, colunas: Dict[str, Any], qualidade_acessorios: str) -> np.ndarray:
+        """Custo de acessórios de cada componente em centavos"""
+        q = self.codigos_qualidades.get(qualidade_acessorios, len(self.codigos_qualidades))
+        return _quantizar(self.tabela_acessorios[colunas['codigo_tipo'], q], 100) * colunas['quantidade']
+
+    def _custo_corte_centavos(self, colunas: Dict[str, Any]) -> np.ndarray:
+        """Custo de corte de cada componente em centavos, respeitando a taxa mínima por peça"""
+        por_peca = np.maximum(
+            _quantizar(colunas['perimetro_m'], ESCALA_MEDIDAS) * _quantizar(self.custos_mao_obra['corte_reto'], 100),
+            _quantizar(self.custos_mao_obra['taxa_minima'], 100) * ESCALA_MEDIDAS
+        )
+        return _dividir_arredondando(por_peca * colunas['quantidade'], ESCALA_MEDIDAS)
+
+    def _combinar_centavos(self, colunas: Dict[str, Any], custo_material: np.ndarray,
+                           custo_acessorios: np.ndarray, custo_corte: np.ndarray,
+                           complexidade: str) -> Dict[str, np.ndarray]:
+        """Aplica a complexidade aos custos em centavos (um único arredondamento por valor)"""
+        multiplicador = self.multiplicadores_complexidade.get(complexidade, 1.0)
+        custo_total = _dividir_arredondando(
+            (custo_material + custo_acessorios + custo_corte) * _quantizar(multiplicador, 100), 100
+        )
+        
+        return {
+            'custo_material': custo_material,
+            'custo_acessorios': custo_acessorios,
+            'custo_corte': custo_corte,
+            'custo_total': custo_total,
+            'preco_por_m2': custo_total / 100 / (colunas['area_m2'] * colunas['quantidade']),
+            'multiplicador_complexidade': multiplicador,
+            'centavos': True
+        }
+
+    def custos_em_reais(self, custos: Dict[str, Any]) -> Dict[str, Any]:
+        """Converte as colunas de custo em centavos para reais (as demais ficam como estão)"""
+        if not custos.get('centavos'):
+            return custos
+        
+        return {
+            **custos,
+            **{chave: custos[chave] / 100 for chave in ('custo_material', 'custo_acessorios', 'custo_corte', 'custo_total')},
+            'centavos': False
+        }
+
+    def calcular_custos_colunar(self, colunas: Dict[str, Any], material: str,
+                                qualidade_acessorios: str, complexidade: str,
+                                plano_corte: Dict = None, centavos: bool = False) -> Dict[str, np.ndarray]:
+        """Calcula os custos de todos os componentes com operações vetorizadas
+        
+        Com centavos=True as colunas de custo são inteiros em centavos: cada valor
+        por componente é calculado exatamente e arredondado uma única vez (metade
+        para cima), e os totais são somas inteiras, sem deriva.
+        """
+        if centavos:
+            return self._combinar_centavos(
+                colunas,
+                self._custo_material_centavos(colunas, material, plano_corte),
+                self._custo_acessorios_centavos(colunas, qualidade_acessorios),
+                self._custo_corte_centavos(colunas),
+                complexidade
+            )
+        
+        return self._combinar_custos(
+            colunas,
+            self._custo_material_colunar(colunas, material, plano_corte),
+            self._custo_acessorios_colunar(colunas, qualidade_acessorios),
+            self._custo_corte_colunar(colunas),
+            complexidade
+        )
+
+    def _totalizar_custos(self, colunas: Dict[str, Any], custos: Dict[str, np.ndarray]) -> Dict:
+        """Totais antes da margem (valores por componente arredondados em centavos)"""
+        area_total = float(np.round(colunas['area_m2'] * colunas['quantidade'], 2).sum())
+        
+        if custos.get('centavos'):
+            # Somas inteiras exatas; só o resultado vira reais
+            totais = {
+                chave: int(custos[chave].sum())
+                for chave in ('custo_material', 'custo_acessorios', 'custo_corte', 'custo_total')
+            }
+            return {
+                'quantidade_componentes': int(colunas['quantidade'].sum()),
+                'area_total_m2': area_total,
+                'custo_material': totais['custo_material'] / 100,
+                'custo_acessorios': totais['custo_acessorios'] / 100,
+                'custo_corte': totais['custo_corte'] / 100,
+                'multiplicador_complexidade': custos['multiplicador_complexidade'],
+                'acrescimo_complexidade': (
+                    totais['custo_total'] - totais['custo_material'] - totais['custo_acessorios'] - totais['custo_corte']
+                ) / 100,
+                'subtotal': totais['custo_total'] / 100,
+                'subtotal_centavos': totais['custo_total']
+            }
+        
+        custo_material_total = float(np.round(custos['custo_material'], 2).sum())
+        custo_acessorios_total = float(np.round(custos['custo_acessorios'], 2).sum())
+        custo_corte_total = float(np.round(custos['custo_corte'], 2).sum())
+        
+        # O subtotal é a soma dos totais dos componentes, que já incluem a complexidade
+        custo_subtotal = float(np.round(custos['custo_total'], 2).sum())
+        
+        return {
+            'quantidade_componentes': int(colunas['quantidade'].sum()),
+            'area_total_m2': area_total,
+            'custo_material': custo_material_total,
+            'custo_acessorios': custo_acessorios_total,
+            'custo_corte': custo_corte_total,
+            'multiplicador_complexidade': custos['multiplicador_complexidade'],
+            'acrescimo_complexidade': custo_subtotal - (custo_material_total + custo_acessorios_total + custo_corte_total),
+            'subtotal': custo_subtotal
+        }
+
+    def _aplicar_margem(self, totais: Dict, margem_lucro: float) -> Dict:
+        """Aplica a margem de lucro aos totais e monta o resumo"""
+        area_total = totais['area_total_m2']
+        if 'subtotal_centavos' in totais:
+            lucro_centavos = int(_dividir_arredondando(
+                totais['subtotal_centavos'] * _quantizar(margem_lucro, ESCALA_MEDIDAS), ESCALA_MEDIDAS
+            ))
+            valor_lucro = lucro_centavos / 100
+            valor_final = (totais['subtotal_centavos'] + lucro_centavos) / 100
+        else:
+            valor_lucro = totais['subtotal'] * margem_lucro
+            valor_final = totais['subtotal'] + valor_lucro
+        
+        return {
+            'quantidade_componentes': totais['quantidade_componentes'],
+            'area_total_m2': round(area_total, 2),
+            'custo_material': round(totais['custo_material'], 2),
+            'custo_acessorios': round(totais['custo_acessorios'], 2),
+            'custo_corte': round(totais['custo_corte'], 2),
+            'multiplicador_complexidade': totais['multiplicador_complexidade'],
+            'acrescimo_complexidade': round(totais['acrescimo_complexidade'], 2),
+            'subtotal': round(totais['subtotal'], 2),
+            'margem_lucro_pct': round(margem_lucro * 100, 1),
+            'valor_lucro': round(valor_lucro, 2),
+            'valor_final': round(valor_final, 2),
+            'preco_por_m2': round(valor_final / area_total, 2) if area_total > 0 else 0
+        }
+
+    def resumir_custos(self, colunas: Dict[str, Any], custos: Dict[str, np.ndarray],
+                       margem_lucro: float) -> Dict:
+        """Totaliza os custos a partir das colunas e aplica a margem de lucro"""
+        return self._aplicar_margem(self._totalizar_custos(colunas, custos), margem_lucro)
+
+    def resumir_materiais(self, colunas: Dict[str, Any], custos: Dict[str, np.ndarray], material: str,
+                          plano_corte: Dict = None) -> List[Dict]:
+        """Área, compra, chapas e custos por material, com a área de cada tipo
+        
+        Um único group-by vetorizado sobre a chave (material, tipo) com bincount.
+        As chapas vêm do plano de corte de cada material quando há plano; sem ele,
+        são estimadas pela área de compra (com desperdício) sobre a área da chapa.
+        """
+        n = len(colunas['area_m2'])
+        m, desperdicio = self._material_e_desperdicio(colunas, material, plano_corte)
+        m = np.broadcast_to(m, (n,))
+        desperdicio = np.broadcast_to(desperdicio, (n,))
+        custos = self.custos_em_reais(custos)
+        
+        # Código desconhecido (última posição) é o material das configurações fora do catálogo
+        nomes_materiais = list(self.codigos_materiais) + [material]
+        nomes_tipos = list(self.codigos_tipos) + ['outros']
+        num_tipos = len(nomes_tipos)
+        chave = m * num_tipos + colunas['codigo_tipo']
+        
+        def somar(pesos) -> np.ndarray:
+            return np.bincount(chave, weights=pesos, minlength=len(nomes_materiais) * num_tipos).reshape(-1, num_tipos)
+        
+        area = colunas['area_m2'] * colunas['quantidade']
+        area_tipos = somar(area)
+        pecas = somar(colunas['quantidade']).sum(axis=1)
+        compra = somar(self._area_material(colunas, plano_corte) * colunas['quantidade'] * (1 + desperdicio)).sum(axis=1)
+        custo_material = somar(custos['custo_material']).sum(axis=1)
+        custo_total = somar(custos['custo_total']).sum(axis=1)
+        
+        planos = {}
+        if plano_corte:
+            planos = plano_corte.get('por_material') or {plano_corte['material']: plano_corte}
+        
+        resumo = []
+        for codigo in np.flatnonzero(pecas > 0).tolist():
+            nome = nomes_materiais[codigo]
+            largura, altura = self.dimensoes_chapas.get(nome, (2750, 1850))
+            plano = planos.get(nome)
+            resumo.append({
+                'material': nome,
+                'componentes': int(pecas[codigo]),
+                'area_m2': round(float(area_tipos[codigo].sum()), 2),
+                'area_compra_m2': round(float(compra[codigo]), 2),
+                'chapas': int(plano['chapas']) if plano else int(np.ceil(round(compra[codigo] / (largura * altura / 1_000_000), 6))),
+                'chapas_estimadas': plano is None,
+                'custo_material': round(float(custo_material[codigo]), 2),
+                'custo_total': round(float(custo_total[codigo]), 2),
+                'area_por_tipo_m2': {
+                    nomes_tipos[t]: round(float(area_tipos[codigo, t]), 2)
+                    for t in np.flatnonzero(area_tipos[codigo] > 0).tolist()
+                }
+            })
+        return resumo
+
+    def _detalhar_componentes(self, componentes: List[Dict], colunas: Dict[str, Any],
+                              custos: Dict[str, np.ndarray]) -> List[Dict]:
+        """Monta o detalhamento por componente para a interface e o relatório"""
+        custos = self.custos_em_reais(custos)
+        multiplicador = custos['multiplicador_complexidade']
+        
+        return [
+            {
+                'nome': nome,
+                'tipo': tipo,
+                'area_m2': area,
+                'custo_material': custo_material,
+                'custo_acessorios': custo_acessorios,
+                'custo_corte': custo_corte,
+                'multiplicador_complexidade': multiplicador,
+                'custo_total': custo_total,
+                'preco_por_m2': preco_m2,
+                'componente_id': i,
+                'geometria_id': comp.get('geometria_id')
+            }
+            for i, (comp, nome, tipo, area, custo_material, custo_acessorios, custo_corte, custo_total, preco_m2) in enumerate(zip(
+                componentes,
+                colunas['nome'],
+                colunas['tipo'],
+                np.round(colunas['area_m2'], 2).tolist(),
+                np.round(custos['custo_material'], 2).tolist(),
+                np.round(custos['custo_acessorios'], 2).tolist(),
+                np.round(custos['custo_corte'], 2).tolist(),
+                np.round(custos['custo_total'], 2).tolist(),
+                np.round(custos['preco_por_m2'], 2).tolist()
+            ))
+        ]
+
+    def _dimensoes_paineis(self, componentes: List[Dict]):
+        """Dimensões (mm, da maior para a menor) e se cada componente é um painel único"""
+        dimensoes = np.array(
+            [comp.get('dimensoes_mm') or [1000, 1000, 20] for comp in componentes], dtype=np.float64
+        ).reshape(len(componentes), 3)
+        dimensoes = -np.sort(-np.abs(dimensoes), axis=1)
+        return dimensoes, dimensoes[:, 2] <= self.espessura_maxima_painel_mm
+
+    def extrair_paineis(self, componentes: List[Dict]) -> Dict[str, np.ndarray]:
+        """Decompõe os componentes nos painéis retangulares cortados das chapas
+        
+        Componentes finos viram um painel (as duas maiores dimensões); os demais
+        são tratados como caixas: 2 painéis para cada par de dimensões.
+        """
+        n = len(componentes)
+        dimensoes, painel_unico = self._dimensoes_paineis(componentes)
+        quantidade = np.fromiter(
+            (comp.get('quantidade', 1) for comp in componentes), dtype=np.int64, count=n
+        )
+        
+        larguras = dimensoes[:, [0, 0, 1]]
+        alturas = dimensoes[:, [1, 2, 2]]
+        copias = np.where(painel_unico[:, None], [1, 0, 0], [2, 2, 2]) * quantidade[:, None]
+        
+        return {
+            'componente': np.repeat(np.repeat(np.arange(n), 3), copias.ravel()),
+            'largura_mm': np.repeat(larguras.ravel(), copias.ravel()),
+            'altura_mm': np.repeat(alturas.ravel(), copias.ravel())
+        }
+
+    @_com_foto_catalogo
+    def calcular_plano_corte(self, componentes: List[Dict], material: str,
+                             codigo_material: np.ndarray = None) -> Dict:
+        """Plano de corte dos painéis nas chapas do material, com a lista de cortes
+        
+        Com codigo_material (projeto misto), cada material tem o próprio plano em
+        'por_material' e os totais somam todos; os cortes indicam o material.
+        """
+        if not componentes:
+            return {}
+        
+        nomes_materiais = list(self.codigos_materiais)
+        codigos = np.unique(codigo_material) if codigo_material is not None else []
+        if len(codigos) == 1 and codigos[0] < len(nomes_materiais):
+            material = nomes_materiais[codigos[0]]
+        if len(codigos) <= 1:
+            return self._plano_corte_material(componentes, material)
+        
+        planos = {}
+        cortes, nao_alocados = [], []
+        for codigo in codigos.tolist():
+            nome = nomes_materiais[codigo] if codigo < len(nomes_materiais) else material
+            plano = self._plano_corte_material(
+                [componentes[i] for i in np.flatnonzero(codigo_material == codigo).tolist()], nome
+            )
+            cortes.extend({'material': nome, **corte} for corte in plano.pop('cortes'))
+            nao_alocados.extend(plano.pop('nao_alocados'))
+            planos[nome] = plano
+        
+        area_paineis = sum(plano['area_paineis_m2'] for plano in planos.values())
+        area_chapas = sum(plano['area_chapas_m2'] for plano in planos.values())
+        return {
+            'material': 'misto',
+            'por_material': planos,
+            'chapas': sum(plano['chapas'] for plano in planos.values()),
+            'dimensoes_chapa_mm': next(iter(planos.values()))['dimensoes_chapa_mm'],
+            'kerf_mm': self.otimizador_corte.kerf_mm,
+            'paineis': sum(plano['paineis'] for plano in planos.values()),
+            'area_paineis_m2': round(area_paineis, 3),
+            'area_chapas_m2': round(area_chapas, 3),
+            'aproveitamento_pct': round(area_paineis / area_chapas * 100, 1) if area_chapas > 0 else 0.0,
+            'desperdicio_real_pct': round((area_chapas - area_paineis) / area_chapas * 100, 1) if area_chapas > 0 else 0.0,
+            'fator_desperdicio': round(area_chapas / area_paineis - 1, 4) if area_paineis > 0 else 0.0,
+            'custo_chapas': round(sum(plano['custo_chapas'] for plano in planos.values()), 2),
+            'nao_alocados': nao_alocados,
+            'cortes': cortes
+        }
+
+    def _plano_corte_material(self, componentes: List[Dict], material: str) -> Dict:
+        """Plano de corte de componentes de um único material"""
+        
+        paineis = self.extrair_paineis(componentes)
+        chapa_mm = self.dimensoes_chapas.get(material, (2750, 1850))
+        plano = self.otimizador_corte.otimizar(
+            paineis['largura_mm'],
+            paineis['altura_mm'],
+            chapa_mm,
+            veio=np.full(len(paineis['componente']), material in self.materiais_com_veio)
+        )
+        
+        nomes = [comp.get('nome', f'Componente_{i+1}') for i, comp in enumerate(componentes)]
+        nomes_paineis = [nomes[i] for i in paineis['componente'].tolist()]
+        preco_chapa = self.precos_materiais.get(material, self.preco_material_padrao) * chapa_mm[0] * chapa_mm[1] / 1_000_000
+        fator_desperdicio = (
+            plano['area_chapas_m2'] / plano['area_paineis_m2'] - 1 if plano['area_paineis_m2'] > 0
+            else self.desperdicio.get(material, self.desperdicio_padrao)
+        )
+        
+        return {
+            'material': material,
+            'chapas': plano['chapas'],
+            'dimensoes_chapa_mm': plano['dimensoes_chapa_mm'],
+            'kerf_mm': self.otimizador_corte.kerf_mm,
+            'paineis': len(nomes_paineis),
+            'area_paineis_m2': plano['area_paineis_m2'],
+            'area_chapas_m2': plano['area_chapas_m2'],
+            'aproveitamento_pct': plano['aproveitamento_pct'],
+            'desperdicio_real_pct': plano['desperdicio_real_pct'],
+            'fator_desperdicio': round(fator_desperdicio, 4),
+            'custo_chapas': round(plano['chapas'] * preco_chapa, 2),
+            'nao_alocados': [nomes_paineis[i] for i in plano['nao_alocados']],
+            'cortes': self.otimizador_corte.gerar_lista_cortes(
+                plano, paineis['largura_mm'], paineis['altura_mm'], nomes_paineis
+            )
+        }
+
+    @_com_foto_catalogo
+    def calcular_orcamento_colunar(self, analise_3d: Dict, configuracoes: Dict) -> Dict:
+        """Calcula o orçamento em formato colunar, sem montar um dicionário por componente
+        
+        Os itens voltam como DataFrame; é o caminho indicado para projetos grandes.
+        """
+        if not analise_3d or not analise_3d.get('componentes'):
+            return {}
+        
+        material = configuracoes.get('material', 'mdf_15mm')
+        colunas = self.montar_colunas_materiais(
+            analise_3d['componentes'], material, configuracoes.get('regras_materiais')
+        )
+        plano_corte = (
+            self.calcular_plano_corte(analise_3d['componentes'], material, colunas.get('codigo_material'))
+            if configuracoes.get('usar_plano_corte') else None
+        )
+        custos = self.calcular_custos_colunar(
+            colunas,
+            material,
+            configuracoes.get('qualidade_acessorios', 'comum'),
+            configuracoes.get('complexidade', 'media'),
+            plano_corte,
+            configuracoes.get('centavos', False)
+        )
+        margem_lucro = configuracoes.get('margem_lucro', 30) / 100
+        valores = self.custos_em_reais(custos)
+        
+        itens = pd.DataFrame({
+            'nome': colunas['nome'],
+            'tipo': colunas['tipo'],
+            'quantidade': colunas['quantidade'],
+            'area_m2': colunas['area_m2'],
+            'perimetro_m': colunas['perimetro_m'],
+            'custo_material': valores['custo_material'],
+            'custo_acessorios': valores['custo_acessorios'],
+            'custo_corte': valores['custo_corte'],
+            'custo_total': valores['custo_total'],
+            'preco_por_m2': valores['preco_por_m2']
+        })
+        
+        return {
+            'itens': itens,
+            'resumo': self.resumir_custos(colunas, custos, margem_lucro),
+            'materiais': self.resumir_materiais(colunas, custos, material, plano_corte),
+            'plano_corte': plano_corte,
+            'configuracoes': configuracoes,
+            'data_calculo': datetime.now().strftime('%d/%m/%Y %H:%M'),
+            'fonte_precos': self.obter_fonte_precos(),
+            'versao_catalogo': self.versao_catalogo
         }
 
+    @_com_foto_catalogo
     def calcular_orcamento_completo(self, analise_3d: Dict, configuracoes: Dict) -> Dict:
         """Calcula orçamento completo do projeto"""
         
         if not analise_3d or not analise_3d.get('componentes'):
             return {}
-            
+        
         componentes = analise_3d['componentes']
         material = configuracoes.get('material', 'mdf_15mm')
         qualidade_acessorios = configuracoes.get('qualidade_acessorios', 'comum')
         complexidade = configuracoes.get('complexidade', 'media')
         margem_lucro = configuracoes.get('margem_lucro', 30) / 100
         
-        # Calcular custo de cada componente
-        componentes_detalhados = []
-        for comp in componentes:
-            custo_comp = self.calcular_custo_componente(
-                comp, material, qualidade_acessorios, complexidade
-            )
-            componentes_detalhados.append(custo_comp)
+        # Colunas de todos os componentes, com o material de cada um quando o modelo informa
+        colunas = self.montar_colunas_materiais(componentes, material, configuracoes.get('regras_materiais'))
         
-        # Totais
-        area_total = sum(comp['area_m2'] for comp in componentes_detalhados)
-        custo_material_total = sum(comp['custo_material'] for comp in componentes_detalhados)
-        custo_acessorios_total = sum(comp['custo_acessorios'] for comp in componentes_detalhados)
-        custo_corte_total = sum(comp['custo_corte'] for comp in componentes_detalhados)
-        custo_subtotal = custo_material_total + custo_acessorios_total + custo_corte_total
+        # Plano de corte opcional: o desperdício real das chapas substitui o da tabela
+        plano_corte = (
+            self.calcular_plano_corte(componentes, material, colunas.get('codigo_material'))
+            if configuracoes.get('usar_plano_corte') else None
+        )
         
-        # Margem de lucro
-        valor_lucro = custo_subtotal * margem_lucro
-        valor_final = custo_subtotal + valor_lucro
+        # Custos de todos os componentes de uma vez
+        custos = self.calcular_custos_colunar(
+            colunas, material, qualidade_acessorios, complexidade, plano_corte, configuracoes.get('centavos', False)
+        )
+        
+        # Modo de risco: distribuição do valor final em vez de um número só
+        risco = self.simular_risco(
+            colunas, material, qualidade_acessorios, complexidade, margem_lucro, plano_corte,
+            configuracoes.get('amostras_risco', 10000)
+        ) if configuracoes.get('modo_risco') else None
         
         return {
-            'componentes': componentes_detalhados,
-            'resumo': {
-                'quantidade_componentes': len(componentes_detalhados),
-                'area_total_m2': round(area_total, 2),
-                'custo_material': round(custo_material_total, 2),
-                'custo_acessorios': round(custo_acessorios_total, 2),
-                'custo_corte': round(custo_corte_total, 2),
-                'subtotal': round(custo_subtotal, 2),
-                'margem_lucro_pct': round(margem_lucro * 100, 1),
-                'valor_lucro': round(valor_lucro, 2),
-                'valor_final': round(valor_final, 2),
-                'preco_por_m2': round(valor_final / area_total, 2) if area_total > 0 else 0
-            },
+            'componentes': self._detalhar_componentes(componentes, colunas, custos),
+            'resumo': self.resumir_custos(colunas, custos, margem_lucro),
+            'materiais': self.resumir_materiais(colunas, custos, material, plano_corte),
+            'plano_corte': plano_corte,
+            'risco': risco,
             'configuracoes': configuracoes,
             'data_calculo': datetime.now().strftime('%d/%m/%Y %H:%M'),
-            'fonte_precos': 'Léo Madeiras - Atualizado em 30/06/2025'
+            'fonte_precos': self.obter_fonte_precos(),
+            'versao_catalogo': self.versao_catalogo
         }
 
     def gerar_graficos(self, orcamento: Dict) -> Dict:
-        """Gera gráficos interativos do orçamento - VERSÃO CORRIGIDA"""
+        """Gera gráficos interativos do orçamento
+        
+        Os gráficos ficam em cache pela impressão digital do orçamento, então os
+        reruns da interface não os reconstroem. Em projetos grandes os dados são
+        agregados antes de chegar ao Plotly (tipos na pizza, maiores componentes
+        mais "Outros" nas barras, amostra na dispersão), o que limita o tamanho
+        dos gráficos qualquer que seja o número de componentes.
+        """
         if not orcamento or not orcamento.get('componentes'):
             return {'pizza': None, 'barras': None, 'area': None}
         
-        componentes = orcamento['componentes']
+        chave = self._impressao_digital_graficos(orcamento['componentes'])
+        cache = OrcamentoEngine._cache_graficos
+        with OrcamentoEngine._trava_cache_graficos:
+            if chave in cache:
+                cache.move_to_end(chave)
+                return cache[chave]
+        
+        graficos = self._montar_graficos(orcamento['componentes'])
+        
+        with OrcamentoEngine._trava_cache_graficos:
+            cache[chave] = graficos
+            while len(cache) > self.limite_cache_graficos:
+                cache.popitem(last=False)
+        
+        return graficos
+
+    def _impressao_digital_graficos(self, componentes: List[Dict]) -> str:
+        """Hash do conteúdo que aparece nos gráficos (nomes, tipos, áreas e custos)"""
+        hash_graficos = hashlib.sha1()
+        for campo in ('custo_total', 'area_m2', 'preco_por_m2'):
+            hash_graficos.update(np.fromiter(
+                (comp.get(campo, 0.0) for comp in componentes), dtype=np.float64, count=len(componentes)
+            ).tobytes())
+        hash_graficos.update('\0'.join(f"{comp.get('nome', '')}\1{comp.get('tipo', '')}" for comp in componentes).encode())
+        hash_graficos.update(repr((self.graficos_top_n, self.graficos_max_pontos)).encode())
+        return hash_graficos.hexdigest()
+
+    def _montar_graficos(self, componentes: List[Dict]) -> Dict:
+        """Monta os três gráficos, agregando os dados quando o projeto é grande"""
+        n = len(componentes)
+        top_n = self.graficos_top_n
         nomes = [comp['nome'] for comp in componentes]
-        custos = [comp['custo_total'] for comp in componentes]
+        custos = np.fromiter((comp['custo_total'] for comp in componentes), dtype=np.float64, count=n)
+        detalhado = n <= 2 * top_n
         
-        # Gráfico de pizza - Distribuição de custos
-        if componentes:
+        # Gráfico de pizza - Distribuição de custos (por tipo em projetos grandes)
+        if detalhado:
             fig_pizza = px.pie(
                 values=custos,
                 names=nomes,
                 title="Distribuição de Custos por Componente",
                 color_discrete_sequence=px.colors.qualitative.Set3
             )
-            fig_pizza.update_traces(textposition='inside', textinfo='percent+label')
         else:
-            fig_pizza = None
-        
-        # Gráfico de barras - Custo por componente (CORRIGIDO)
-        if componentes:
-            fig_barras = px.bar(
-                x=nomes,
-                y=custos,
-                title="Custo por Componente",
-                labels={'x': 'Componentes', 'y': 'Custo (R$)'},
-                color=custos,
-                color_continuous_scale='viridis'
-            )
-            # CORREÇÃO: Usar update_layout ao invés de update_xaxis
-            fig_barras.update_layout(
-                xaxis={'tickangle': 45},
-                xaxis_title="Componentes",
-                yaxis_title="Custo (R$)",
-                showlegend=False
+            tipos, codigos = np.unique([comp.get('tipo', 'outros') for comp in componentes], return_inverse=True)
+            fig_pizza = px.pie(
+                values=np.round(np.bincount(codigos, weights=custos), 2),
+                names=tipos.tolist(),
+                title="Distribuição de Custos por Tipo",
+                color_discrete_sequence=px.colors.qualitative.Set3
             )
-        else:
-            fig_barras = None
+        fig_pizza.update_traces(textposition='inside', textinfo='percent+label')
         
-        # Gráfico de dispersão - Custo por m²
-        if componentes:
-            areas = [comp['area_m2'] for comp in componentes]
-            precos_m2 = [comp['preco_por_m2'] for comp in componentes]
-            
-            fig_area = px.scatter(
-                x=areas,
-                y=precos_m2,
-                size=[comp['custo_total'] for comp in componentes],
-                hover_name=nomes,
-                title="Custo por m² vs Área",
-                labels={'x': 'Área (m²)', 'y': 'Preço por m² (R$)'},
-                color=custos,
-                color_continuous_scale='plasma'
-            )
-            fig_area.update_layout(
-                xaxis_title="Área (m²)",
-                yaxis_title="Preço por m² (R$)",
-                showlegend=False
-            )
+        # Gráfico de barras - Custo por componente (maiores componentes + "Outros")
+        if detalhado:
+            nomes_barras, custos_barras = nomes, custos
+            titulo_barras = "Custo por Componente"
         else:
-            fig_area = None
+            maiores = np.argpartition(-custos, top_n)[:top_n]
+            maiores = maiores[np.argsort(-custos[maiores])]
+            outros = np.ones(n, dtype=bool)
+            outros[maiores] = False
+            nomes_barras = [nomes[i] for i in maiores.tolist()] + [f"Outros ({n - top_n})"]
+            custos_barras = np.append(custos[maiores], custos[outros].sum()).round(2)
+            titulo_barras = f"Custo por Componente ({top_n} maiores)"
+        
+        fig_barras = px.bar(
+            x=nomes_barras,
+            y=custos_barras,
+            title=titulo_barras,
+            labels={'x': 'Componentes', 'y': 'Custo (R$)'},
+            color=custos_barras,
+            color_continuous_scale='viridis'
+        )
+        fig_barras.update_layout(
+            xaxis={'tickangle': 45},
+            xaxis_title="Componentes",
+            yaxis_title="Custo (R$)",
+            showlegend=False
+        )
+        
+        # Gráfico de dispersão - Custo por m² (amostra fixa em projetos grandes)
+        indices = np.arange(n)
+        if n > self.graficos_max_pontos:
+            indices = np.sort(np.random.default_rng(0).choice(n, self.graficos_max_pontos, replace=False))
+        areas = np.fromiter((componentes[i]['area_m2'] for i in indices.tolist()), dtype=np.float64, count=len(indices))
+        precos_m2 = np.fromiter((componentes[i]['preco_por_m2'] for i in indices.tolist()), dtype=np.float64, count=len(indices))
+        
+        fig_area = px.scatter(
+            x=areas,
+            y=precos_m2,
+            size=custos[indices],
+            hover_name=[nomes[i] for i in indices.tolist()],
+            title="Custo por m² vs Área" if len(indices) == n else f"Custo por m² vs Área (amostra de {len(indices)})",
+            labels={'x': 'Área (m²)', 'y': 'Preço por m² (R$)'},
+            color=custos[indices],
+            color_continuous_scale='plasma'
+        )
+        fig_area.update_layout(
+            xaxis_title="Área (m²)",
+            yaxis_title="Preço por m² (R$)",
+            showlegend=False
+        )
         
         return {
             'pizza': fig_pizza,
@@ -283,77 +977,459 @@ class OrcamentoEngine:
             'area': fig_area
         }
 
-    def gerar_relatorio_detalhado(self, orcamento: Dict, cliente: str, ambiente: str) -> str:
-        """Gera relatório detalhado em texto"""
+    def gerar_relatorio_detalhado(self, orcamento: Dict, cliente: str, ambiente: str, **opcoes) -> str:
+        """Gera relatório detalhado em texto (opções de agrupamento e paginação em escrever_relatorio)"""
         if not orcamento:
             return ""
         
-        resumo = orcamento.get('resumo', {})
-        componentes = orcamento.get('componentes', [])
-        
-        relatorio = f"""
-# ORÇAMENTO DETALHADO - ORCA INTERIORES
+        return self.gerador_relatorio.gerar_texto(orcamento, cliente, ambiente, **opcoes)
 
-**Cliente:** {cliente}
-**Ambiente:** {ambiente}
-**Data:** {orcamento.get('data_calculo', 'N/A')}
-**Fonte de Preços:** {orcamento.get('fonte_precos', 'N/A')}
+    def escrever_relatorio(self, orcamento: Dict, destino: TextIO, cliente: str, ambiente: str,
+                           agrupar_por: str = None, itens_por_pagina: int = None, pagina: int = None) -> int:
+        """Escreve o relatório direto em um arquivo ou stream, sem montá-lo inteiro na memória"""
+        return self.gerador_relatorio.escrever(
+            orcamento, destino, cliente, ambiente, agrupar_por, itens_por_pagina, pagina
+        )
 
-## RESUMO EXECUTIVO
+    def exportar_pdf(self, orcamento: Dict, destino: BinaryIO, cliente: str, ambiente: str,
+                     agrupar_por: str = None,
+                     callback_progresso: Optional[Callable[[int, int], None]] = None) -> int:
+        """Escreve o orçamento em PDF página a página e retorna o número de páginas"""
+        return self.gerador_pdf.gerar(orcamento, destino, cliente, ambiente, agrupar_por, callback_progresso)
 
-- **Quantidade de Componentes:** {resumo.get('quantidade_componentes', 0)}
-- **Área Total:** {resumo.get('area_total_m2', 0)} m²
-- **Valor Final:** R$ {resumo.get('valor_final', 0):,.2f}
-- **Preço por m²:** R$ {resumo.get('preco_por_m2', 0):,.2f}
+    def exportar_json(self, orcamento: Dict) -> str:
+        """Exporta orçamento em formato JSON compacto, com a geometria referenciada por componente_id"""
+        return self.exportador.exportar_resumo(orcamento)
 
-## BREAKDOWN DE CUSTOS
+    def exportar(self, orcamento: Dict, destino, perfil: str = 'resumo') -> bool:
+        """Exporta o orçamento em destino no perfil escolhido (ver exportacao.PERFIS)
 
-- **Material:** R$ {resumo.get('custo_material', 0):,.2f}
-- **Acessórios:** R$ {resumo.get('custo_acessorios', 0):,.2f}
-- **Corte/Usinagem:** R$ {resumo.get('custo_corte', 0):,.2f}
-- **Subtotal:** R$ {resumo.get('subtotal', 0):,.2f}
-- **Margem de Lucro ({resumo.get('margem_lucro_pct', 0)}%):** R$ {resumo.get('valor_lucro', 0):,.2f}
+        'resumo', 'json' e 'jsonl' escrevem texto; 'parquet' escreve binário.
+        """
+        if perfil == 'parquet':
+            return self.exportador.exportar_parquet(orcamento, destino)
+        if perfil == 'jsonl':
+            self.exportador.escrever_jsonl(orcamento, destino)
+        elif perfil == 'json':
+            self.exportador.escrever_json(orcamento, destino)
+        else:
+            destino.write(self.exportador.exportar_resumo(orcamento))
+        return True
 
-## DETALHAMENTO POR COMPONENTE
+    @_com_foto_catalogo
+    def obter_precos_atuais(self) -> Dict:
+        """Retorna preços atuais dos materiais"""
+        return {
+            'materiais': self.precos_materiais,
+            'acessorios': self.custos_acessorios,
+            'mao_obra': self.custos_mao_obra,
+            'desperdicio': self.desperdicio,
+            'data_atualizacao': self._tabelas()['data_atualizacao'],
+            'fonte': self._tabelas()['fonte'],
+            'versao': self.versao_catalogo
+        }
 
-"""
+    @_com_foto_catalogo
+    def calcular_cenarios(self, analise_3d: Dict, configuracoes: Dict = None,
+                          margens: List[float] = None) -> pd.DataFrame:
+        """Calcula todas as combinações material × qualidade × complexidade × margem
+        
+        O custo é linear em cada fator, então os totais do projeto são agregados uma
+        única vez e a grade inteira sai de um broadcasting, sem refazer o orçamento
+        por cenário. Os valores não passam pelo arredondamento por componente e
+        podem diferir em centavos do orçamento completo, e o material usa o
+        desperdício da tabela (sem plano de corte). Com `configuracoes`, a
+        tabela traz a diferença de cada cenário em relação ao orçamento atual.
+        """
+        if not analise_3d or not analise_3d.get('componentes'):
+            return pd.DataFrame()
+        
+        colunas = self.montar_colunas(analise_3d['componentes'])
+        margens = np.asarray(self.margens_cenarios if margens is None else margens, dtype=np.float64)
+        quantidade = colunas['quantidade']
+        
+        # Agregados do projeto, independentes do cenário
+        area_total = float((colunas['area_m2'] * quantidade).sum())
+        custo_corte = float((np.maximum(
+            colunas['perimetro_m'] * self.custos_mao_obra['corte_reto'],
+            self.custos_mao_obra['taxa_minima']
+        ) * quantidade).sum())
+        pecas_por_tipo = np.bincount(
+            colunas['codigo_tipo'], weights=quantidade, minlength=len(self.tabela_acessorios)
+        )
         
-        for i, comp in enumerate(componentes, 1):
-            relatorio += f"""
-### {i}. {comp.get('nome', 'Componente')}
-- **Tipo:** {comp.get('tipo', 'N/A').title()}
-- **Área:** {comp.get('area_m2', 0)} m²
-- **Material:** R$ {comp.get('custo_material', 0):,.2f}
-- **Acessórios:** R$ {comp.get('custo_acessorios', 0):,.2f}
-- **Corte:** R$ {comp.get('custo_corte', 0):,.2f}
-- **Total:** R$ {comp.get('custo_total', 0):,.2f}
-- **Preço/m²:** R$ {comp.get('preco_por_m2', 0):,.2f}
+        materiais = list(self.codigos_materiais)
+        qualidades = list(self.codigos_qualidades)
+        complexidades = list(self.multiplicadores_complexidade)
+        
+        # Eixos da grade: material (M), qualidade (Q), complexidade (C), margem (G)
+        custo_material = area_total * self.tabela_precos[:-1] * (1 + self.tabela_desperdicio[:-1])
+        custo_acessorios = pecas_por_tipo @ self.tabela_acessorios[:, :-1]
+        multiplicadores = np.array([self.multiplicadores_complexidade[c] for c in complexidades])
+        
+        subtotal = (custo_material[:, None, None] + custo_acessorios[None, :, None] + custo_corte) \
+            * multiplicadores[None, None, :]
+        valor_final = subtotal[..., None] * (1 + margens / 100)
+        
+        im, iq, ic, ig = np.indices(valor_final.shape).reshape(4, -1)
+        valor_final = valor_final.ravel()
+        tabela = pd.DataFrame({
+            'material': np.array(materiais)[im],
+            'qualidade_acessorios': np.array(qualidades)[iq],
+            'complexidade': np.array(complexidades)[ic],
+            'margem_lucro': margens[ig],
+            'custo_material': np.round(custo_material[im], 2),
+            'custo_acessorios': np.round(custo_acessorios[iq], 2),
+            'custo_corte': round(custo_corte, 2),
+            'subtotal': np.round(subtotal[im, iq, ic], 2),
+            'valor_final': np.round(valor_final, 2),
+            'preco_por_m2': np.round(valor_final / area_total, 2) if area_total > 0 else 0.0
+        })
+        
+        atual = (
+            (configuracoes or {}).get('material', 'mdf_15mm'),
+            (configuracoes or {}).get('qualidade_acessorios', 'comum'),
+            (configuracoes or {}).get('complexidade', 'media')
+        )
+        if configuracoes and atual[0] in materiais and atual[1] in qualidades and atual[2] in complexidades:
+            referencia = subtotal[
+                materiais.index(atual[0]), qualidades.index(atual[1]), complexidades.index(atual[2])
+            ] * (1 + configuracoes.get('margem_lucro', 30) / 100)
+            tabela['diferenca'] = np.round(valor_final - referencia, 2)
+            tabela['diferenca_pct'] = np.round((valor_final / referencia - 1) * 100, 1) if referencia > 0 else 0.0
+        
+        return tabela
 
-"""
+    @_com_foto_catalogo
+    def analisar_sensibilidade(self, colunas: Dict[str, Any], configuracoes: Dict, plano_corte: Dict = None,
+                               variacao_pct: float = 10.0, variacao_pp: float = 5.0) -> Dict:
+        """Efeito de cada fator de custo sobre o valor final (dados para gráfico tornado)
         
-        relatorio += """
----
-*Orçamento gerado automaticamente pelo sistema Orca Interiores*
-*Preços sujeitos a alteração conforme disponibilidade de material*
-"""
+        O modelo é linear no preço do material e dos acessórios, no desperdício e na
+        margem, então esses efeitos saem direto dos totais do projeto. Material,
+        qualidade e complexidade são avaliados em todas as opções de uma vez. A mão
+        de obra não é linear (taxa mínima por peça) e usa diferenças finitas
+        calculadas em lote. Preços e desperdício variam ±variacao_pct%; desperdício
+        e margem, ±variacao_pp pontos percentuais. Como nos cenários, não há
+        arredondamento por componente.
+        """
+        material = configuracoes.get('material', 'mdf_15mm')
+        m, desperdicio_componentes = self._material_e_desperdicio(colunas, material, plano_corte)
+        q = self.codigos_qualidades.get(configuracoes.get('qualidade_acessorios', 'comum'), len(self.codigos_qualidades))
+        multiplicador = self.multiplicadores_complexidade.get(configuracoes.get('complexidade', 'media'), 1.0)
+        margem = configuracoes.get('margem_lucro', 30) / 100
         
-        return relatorio
+        # Totais do projeto reaproveitados por todos os fatores
+        area_total = float((self._area_material(colunas, plano_corte) * colunas['quantidade']).sum())
+        pecas_por_tipo = np.bincount(
+            colunas['codigo_tipo'], weights=colunas['quantidade'], minlength=len(self.tabela_acessorios)
+        )
+        acessorios_por_qualidade = pecas_por_tipo @ self.tabela_acessorios
+        
+        # Mão de obra com o preço do metro de corte em -v, 0 e +v, numa única operação
+        fatores_corte = 1 + np.array([-variacao_pct, 0.0, variacao_pct]) / 100
+        corte_lote = (np.maximum(
+            colunas['perimetro_m'] * self.custos_mao_obra['corte_reto'] * fatores_corte[:, None],
+            self.custos_mao_obra['taxa_minima']
+        ) * colunas['quantidade']).sum(axis=1)
+        
+        # Em projetos mistos, cada componente no preço e desperdício do seu material
+        material_componentes = self._area_material(colunas, plano_corte) * colunas['quantidade'] * self.tabela_precos[m]
+        material_base = float(material_componentes.sum())
+        custo_material = float((material_componentes * (1 + desperdicio_componentes)).sum())
+        desperdicio = custo_material / material_base - 1 if material_base > 0 else float(np.mean(desperdicio_componentes))
+        custo_acessorios = float(acessorios_por_qualidade[q])
+        custo_corte = float(corte_lote[1])
+        fator_final = multiplicador * (1 + margem)
+        valor_base = (custo_material + custo_acessorios + custo_corte) * fator_final
+        
+        v = variacao_pct / 100
+        pp = variacao_pp / 100
+        nomes_materiais = list(self.codigos_materiais)
+        nomes_qualidades = list(self.codigos_qualidades)
+        nomes_complexidades = list(self.multiplicadores_complexidade)
+        
+        # Fatores categóricos: todas as opções de uma vez. Com plano de corte, o
+        # desperdício real vale para qualquer material; sem ele, o de cada material
+        desperdicio_materiais = np.full(len(nomes_materiais), desperdicio) if plano_corte else self.tabela_desperdicio[:-1]
+        valores_materiais = (
+            area_total * self.tabela_precos[:-1] * (1 + desperdicio_materiais) + custo_acessorios + custo_corte
+        ) * fator_final
+        valores_qualidades = (custo_material + acessorios_por_qualidade[:-1] + custo_corte) * fator_final
+        valores_complexidades = (
+            (custo_material + custo_acessorios + custo_corte)
+            * np.array([self.multiplicadores_complexidade[c] for c in nomes_complexidades]) * (1 + margem)
+        )
+        
+        def categorico(fator, valores, nomes):
+            baixo, alto = int(np.argmin(valores)), int(np.argmax(valores))
+            return (fator, nomes[baixo], nomes[alto], float(valores[baixo]), float(valores[alto]))
+        
+        fatores = [
+            categorico('Material', valores_materiais, nomes_materiais),
+            categorico('Qualidade dos acessórios', valores_qualidades, nomes_qualidades),
+            categorico('Complexidade', valores_complexidades, nomes_complexidades),
+            (f'Preço do material (±{variacao_pct:g}%)', f'-{variacao_pct:g}%', f'+{variacao_pct:g}%',
+             valor_base - custo_material * v * fator_final, valor_base + custo_material * v * fator_final),
+            (f'Preço dos acessórios (±{variacao_pct:g}%)', f'-{variacao_pct:g}%', f'+{variacao_pct:g}%',
+             valor_base - custo_acessorios * v * fator_final, valor_base + custo_acessorios * v * fator_final),
+            (f'Mão de obra de corte (±{variacao_pct:g}%)', f'-{variacao_pct:g}%', f'+{variacao_pct:g}%',
+             valor_base + (corte_lote[0] - custo_corte) * fator_final,
+             valor_base + (corte_lote[2] - custo_corte) * fator_final),
+            (f'Desperdício (±{variacao_pp:g} p.p.)', f'{(desperdicio - pp) * 100:.1f}%', f'{(desperdicio + pp) * 100:.1f}%',
+             valor_base - material_base * min(pp, desperdicio) * fator_final,
+             valor_base + material_base * pp * fator_final),
+            (f'Margem (±{variacao_pp:g} p.p.)', f'{(margem - pp) * 100:g}%', f'{(margem + pp) * 100:g}%',
+             valor_base - (custo_material + custo_acessorios + custo_corte) * multiplicador * pp,
+             valor_base + (custo_material + custo_acessorios + custo_corte) * multiplicador * pp)
+        ]
+        
+        tabela = pd.DataFrame(fatores, columns=['fator', 'cenario_baixo', 'cenario_alto', 'valor_baixo', 'valor_alto'])
+        tabela['impacto_baixo'] = tabela['valor_baixo'] - valor_base
+        tabela['impacto_alto'] = tabela['valor_alto'] - valor_base
+        tabela['amplitude'] = tabela['valor_alto'] - tabela['valor_baixo']
+        tabela = tabela.sort_values('amplitude', ascending=False, ignore_index=True)
+        tabela[tabela.columns[3:]] = tabela[tabela.columns[3:]].astype(float).round(2)
+        
+        return {
+            'valor_base': round(float(valor_base), 2),
+            'fatores': tabela,
+            # Derivadas parciais do valor final (R$ por 1% de preço ou por 1 p.p.)
+            'derivadas': {
+                'preco_material_pct': round(float(custo_material * fator_final / 100), 2),
+                'preco_acessorios_pct': round(custo_acessorios * fator_final / 100, 2),
+                'mao_obra_pct': round(float(corte_lote[2] - corte_lote[0]) * fator_final / (2 * variacao_pct), 2),
+                'desperdicio_pp': round(float(material_base * fator_final / 100), 2),
+                'margem_pp': round(float((custo_material + custo_acessorios + custo_corte) * multiplicador / 100), 2)
+            }
+        }
 
-    def exportar_json(self, orcamento: Dict) -> str:
-        """Exporta orçamento em formato JSON"""
-        return json.dumps(orcamento, indent=2, ensure_ascii=False)
+    @_com_foto_catalogo
+    def simular_risco(self, colunas: Dict[str, Any], material: str, qualidade_acessorios: str,
+                      complexidade: str, margem_lucro: float, plano_corte: Dict = None,
+                      amostras: int = 10000, incertezas: Dict = None, semente: int = 0,
+                      elementos_por_bloco: int = 2_000_000) -> Dict:
+        """Simulação de Monte Carlo do valor final sob incerteza de desperdício, preços e mão de obra
+        
+        Desperdício e mão de obra variam por componente (distribuições triangulares
+        em torno do valor da tabela); os preços de material e acessórios variam por
+        amostra. As amostras são sorteadas em blocos de no máximo elementos_por_bloco
+        valores por matriz, então a memória não cresce com o número de amostras.
+        Assim como nos cenários, não há arredondamento por componente.
+        """
+        incertezas = {**self.incertezas_risco, **(incertezas or {})}
+        rng = np.random.default_rng(semente)
+        
+        m, desperdicio = self._material_e_desperdicio(colunas, material, plano_corte)
+        
+        # Bases determinísticas por componente
+        material_base = self._area_material(colunas, plano_corte) * colunas['quantidade'] * self.tabela_precos[m]
+        acessorios_total = float(self._custo_acessorios_colunar(colunas, qualidade_acessorios).sum())
+        corte_base = self._custo_corte_colunar(colunas)
+        material_total = float(material_base.sum())
+        fator_final = self.multiplicadores_complexidade.get(complexidade, 1.0) * (1 + margem_lucro)
+        
+        n = len(material_base)
+        tamanho_bloco = max(1, elementos_por_bloco // max(n, 1))
+        totais = np.empty(amostras)
+        
+        for inicio in range(0, amostras, tamanho_bloco):
+            b = min(tamanho_bloco, amostras - inicio)
+            
+            # Desperdício e mão de obra por componente: matrizes b × n reduzidas por produto matriz-vetor
+            fator_desperdicio = desperdicio * rng.triangular(*incertezas['desperdicio'], size=(b, n))
+            custo_material = material_total + fator_desperdicio @ material_base
+            custo_corte = rng.triangular(*incertezas['mao_obra'], size=(b, n)) @ corte_base
+            
+            # Variação de preços por amostra
+            custo_material *= 1 + rng.normal(0.0, incertezas['preco_material'], b)
+            custo_acessorios = acessorios_total * (1 + rng.normal(0.0, incertezas['preco_acessorios'], b))
+            
+            totais[inicio:inicio + b] = (custo_material + custo_acessorios + custo_corte) * fator_final
+        
+        valor_base = (
+            float((material_base * (1 + desperdicio)).sum()) + acessorios_total + float(corte_base.sum())
+        ) * fator_final
+        contagens, limites = np.histogram(totais, bins=30)
+        p5, p50, p90, p95 = np.percentile(totais, [5, 50, 90, 95])
+        
+        return {
+            'amostras': amostras,
+            'valor_base': round(float(valor_base), 2),
+            'media': round(float(totais.mean()), 2),
+            'desvio_padrao': round(float(totais.std()), 2),
+            'p5': round(float(p5), 2),
+            'p50': round(float(p50), 2),
+            'p90': round(float(p90), 2),
+            'p95': round(float(p95), 2),
+            'probabilidade_acima_base': round(float((totais > valor_base).mean()), 4),
+            'histograma': {
+                'limites': np.round(limites, 2).tolist(),
+                'contagens': contagens.tolist()
+            },
+            'incertezas': incertezas
+        }
 
-    def obter_precos_atuais(self) -> Dict:
-        """Retorna preços atuais dos materiais"""
+    @_com_foto_catalogo
+    def cotar_fornecedores(self, analise_3d: Dict, configuracoes: Dict,
+                           fornecedor_preferido: str = None, tolerancia_preferido_pct: float = 0.0) -> Dict:
+        """Escolhe o fornecedor de cada item do projeto na matriz fornecedor × item
+        
+        Cada componente gera dois itens de compra: o material (m² com desperdício)
+        e o kit de acessórios. O fornecedor mais barato de cada item sai de um argmin
+        sobre a matriz de custos; o preferido ganha os itens em que custa até
+        tolerancia_preferido_pct a mais. Depois entram as regras de pedido mínimo e
+        frete. Mão de obra e complexidade não dependem do fornecedor e ficam de fora.
+        """
+        if not analise_3d or not analise_3d.get('componentes'):
+            return {}
+        
+        fornecedores = self._tabelas()['fornecedores']
+        material = configuracoes.get('material', 'mdf_15mm')
+        colunas = self.montar_colunas_materiais(
+            analise_3d['componentes'], material, configuracoes.get('regras_materiais')
+        )
+        plano_corte = (
+            self.calcular_plano_corte(analise_3d['componentes'], material, colunas.get('codigo_material'))
+            if configuracoes.get('usar_plano_corte') else None
+        )
+        
+        m, desperdicio = self._material_e_desperdicio(colunas, material, plano_corte)
+        q = self.codigos_qualidades.get(
+            configuracoes.get('qualidade_acessorios', 'comum'), len(self.codigos_qualidades)
+        )
+        metros_compra = self._area_material(colunas, plano_corte) * colunas['quantidade'] * (1 + desperdicio)
+        
+        # Matriz de custos S × L: primeiro os itens de material, depois os de acessórios
+        custo_material = fornecedores['matriz_materiais'][:, m].reshape(len(fornecedores['ids']), -1) * metros_compra
+        custo_acessorios = fornecedores['matriz_acessorios'][:, colunas['codigo_tipo'], q] * colunas['quantidade']
+        com_acessorios = np.flatnonzero(fornecedores['matriz_acessorios'][0, colunas['codigo_tipo'], q] > 0)
+        custos = np.concatenate([custo_material, custo_acessorios[:, com_acessorios]], axis=1)
+        
+        n = len(colunas['nome'])
+        indices_componentes = np.concatenate([np.arange(n), com_acessorios])
+        itens = ['material'] * n + ['acessorios'] * len(com_acessorios)
+        
+        preferido = fornecedores['ids'].index(fornecedor_preferido) if fornecedor_preferido in fornecedores['ids'] else None
+        alocacao = self._alocar_fornecedores(custos, fornecedores, preferido, tolerancia_preferido_pct / 100)
+        
+        escolha = alocacao['escolha']
+        atendidos = alocacao['atendidos']
+        linhas = np.arange(custos.shape[1])
+        custo_escolhido = np.where(atendidos, custos[escolha, linhas], np.nan)
+        
+        subtotais = alocacao['subtotais']
+        fretes = alocacao['fretes']
+        usados = np.flatnonzero(subtotais > 0)
+        
+        # Referência: tudo no fornecedor padrão, com as regras de frete dele
+        custo_padrao = custos[0]
+        total_padrao = float(custo_padrao.sum())
+        if np.isfinite(total_padrao) and total_padrao < fornecedores['frete_gratis_acima'][0]:
+            total_padrao += fornecedores['frete'][0]
+        total = float(subtotais.sum() + fretes.sum())
+        
         return {
-            'materiais': self.precos_materiais,
-            'acessorios': self.custos_acessorios,
-            'mao_obra': self.custos_mao_obra,
-            'desperdicio': self.desperdicio,
-            'data_atualizacao': '30/06/2025',
-            'fonte': 'Léo Madeiras'
+            'itens': pd.DataFrame({
+                'componente': [colunas['nome'][i] for i in indices_componentes.tolist()],
+                'item': itens,
+                'fornecedor': [
+                    fornecedores['nomes'][s] if ok else None
+                    for s, ok in zip(escolha.tolist(), atendidos.tolist())
+                ],
+                'custo': np.round(custo_escolhido, 2),
+                'custo_fornecedor_padrao': np.round(np.where(np.isfinite(custo_padrao), custo_padrao, np.nan), 2)
+            }),
+            'fornecedores': [
+                {
+                    'fornecedor': fornecedores['ids'][s],
+                    'nome': fornecedores['nomes'][s],
+                    'itens': int((escolha[atendidos] == s).sum()),
+                    'subtotal': round(float(subtotais[s]), 2),
+                    'frete': round(float(fretes[s]), 2),
+                    'total': round(float(subtotais[s] + fretes[s]), 2),
+                    'abaixo_pedido_minimo': bool(subtotais[s] < fornecedores['pedido_minimo'][s])
+                }
+                for s in usados.tolist()
+            ],
+            'descartados': [fornecedores['nomes'][s] for s in alocacao['descartados']],
+            'sem_fornecedor': [
+                f"{colunas['nome'][i]} ({item})"
+                for i, item, ok in zip(indices_componentes.tolist(), itens, atendidos.tolist()) if not ok
+            ],
+            'total_itens': round(float(subtotais.sum()), 2),
+            'total_frete': round(float(fretes.sum()), 2),
+            'total': round(total, 2),
+            'total_fornecedor_padrao': round(total_padrao, 2) if np.isfinite(total_padrao) else None,
+            'economia': round(total_padrao - total, 2) + 0.0 if np.isfinite(total_padrao) else None
         }
 
+    def _alocar_fornecedores(self, custos: np.ndarray, fornecedores: Dict,
+                             preferido: int = None, tolerancia: float = 0.0) -> Dict:
+        """Atribui cada item a um fornecedor respeitando pedido mínimo e frete
+        
+        A cada rodada, os itens vão para o fornecedor ativo de menor custo (argmin
+        por coluna). Se algum fornecedor não atinge o pedido mínimo, ou se o frete
+        dele custa mais do que mover seus itens para a segunda melhor opção, ele é
+        descartado e a alocação é refeita; são no máximo S rodadas.
+        """
+        num_fornecedores, num_itens = custos.shape
+        itens = np.arange(num_itens)
+        
+        # Custos usados na decisão: o preferido aparece mais barato dentro da tolerância
+        decisao = custos.copy()
+        if preferido is not None and tolerancia > 0:
+            decisao[preferido] /= 1 + tolerancia
+        
+        ativos = np.ones(num_fornecedores, dtype=bool)
+        descartados = []
+        
+        while True:
+            matriz = np.where(ativos[:, None], decisao, np.inf)
+            escolha = np.argmin(matriz, axis=0)
+            atendidos = np.isfinite(matriz[escolha, itens])
+            
+            custo_escolhido = np.where(atendidos, custos[escolha, itens], 0.0)
+            subtotais = np.bincount(escolha, weights=custo_escolhido, minlength=num_fornecedores)
+            usados = subtotais > 0
+            fretes = np.where(usados & (subtotais < fornecedores['frete_gratis_acima']), fornecedores['frete'], 0.0)
+            
+            if ativos.sum() <= 1:
+                break
+            
+            # Custo de mover os itens de cada fornecedor para a segunda melhor opção ativa
+            sem_escolhido = matriz.copy()
+            sem_escolhido[escolha, itens] = np.inf
+            segunda = np.argmin(sem_escolhido, axis=0)
+            custo_segunda = np.where(np.isfinite(sem_escolhido[segunda, itens]), custos[segunda, itens], np.inf)
+            acrescimo = np.bincount(
+                escolha, weights=np.where(atendidos, custo_segunda - custo_escolhido, 0.0), minlength=num_fornecedores
+            )
+            realocavel = usados & np.isfinite(acrescimo)
+            
+            abaixo_minimo = realocavel & (subtotais < fornecedores['pedido_minimo'])
+            ganho_frete = np.where(realocavel, fretes - acrescimo, -np.inf)
+            
+            if abaixo_minimo.any():
+                # Descarta o fornecedor mais longe do pedido mínimo
+                descartar = int(np.argmax(np.where(abaixo_minimo, fornecedores['pedido_minimo'] - subtotais, -np.inf)))
+            elif ganho_frete.max() > 0:
+                descartar = int(np.argmax(ganho_frete))
+            else:
+                break
+            
+            ativos[descartar] = False
+            descartados.append(descartar)
+        
+        return {
+            'escolha': escolha,
+            'atendidos': atendidos,
+            'subtotais': subtotais,
+            'fretes': fretes,
+            'descartados': descartados
+        }
+
+    @_com_foto_catalogo
     def calcular_economia_material(self, orcamento: Dict, material_alternativo: str) -> Dict:
         """Calcula economia ao trocar material"""
         if not orcamento or not orcamento.get('componentes'):
@@ -362,8 +1438,8 @@ class OrcamentoEngine:
         componentes = orcamento['componentes']
         material_atual = orcamento.get('configuracoes', {}).get('material', 'mdf_15mm')
         
-        preco_atual = self.precos_materiais.get(material_atual, 69.15)
-        preco_alternativo = self.precos_materiais.get(material_alternativo, 69.15)
+        preco_atual = self.precos_materiais.get(material_atual, self.preco_material_padrao)
+        preco_alternativo = self.precos_materiais.get(material_alternativo, self.preco_material_padrao)
         
         area_total = sum(comp['area_m2'] for comp in componentes)
         
@@ -383,3 +1459,203 @@ class OrcamentoEngine:
             'percentual_economia': round((economia / custo_atual) * 100, 1) if custo_atual > 0 else 0
         }
 
+
+
+
+class GrafoDependencias:
+    """Grafo de dependências com cache dos resultados intermediários
+    
+    Cada nó guarda a versão das dependências com que foi calculado e só é
+    recalculado quando alguma delas muda. Entradas só mudam de versão quando
+    o valor muda (igualdade para escalares, identidade para o resto).
+    """
+    
+    def __init__(self):
+        self.nos = {}
+        self.valores = {}
+        self.versoes = {}
+        self.versoes_usadas = {}
+        self.tempos_ms = {}
+        self.recalculados = []
+    
+    def definir_entrada(self, nome: str, valor: Any):
+        """Define o valor de uma entrada do grafo"""
+        if nome in self.valores:
+            anterior = self.valores[nome]
+            escalar = isinstance(valor, (str, int, float, bool, type(None)))
+            if anterior is valor or (escalar and type(anterior) is type(valor) and anterior == valor):
+                return
+        
+        self.valores[nome] = valor
+        self.versoes[nome] = self.versoes.get(nome, 0) + 1
+    
+    def adicionar_no(self, nome: str, funcao, dependencias: List[str]):
+        """Registra um nó calculado a partir das dependências"""
+        self.nos[nome] = (funcao, tuple(dependencias))
+    
+    def obter(self, nome: str) -> Any:
+        """Retorna o valor do nó, recalculando apenas o que estiver desatualizado"""
+        if nome not in self.nos:
+            return self.valores[nome]
+        
+        funcao, dependencias = self.nos[nome]
+        argumentos = [self.obter(dependencia) for dependencia in dependencias]
+        versoes = tuple(self.versoes[dependencia] for dependencia in dependencias)
+        
+        if self.versoes_usadas.get(nome) != versoes:
+            inicio = time.perf_counter()
+            self.valores[nome] = funcao(*argumentos)
+            self.tempos_ms[nome] = (time.perf_counter() - inicio) * 1000
+            self.versoes[nome] = self.versoes.get(nome, 0) + 1
+            self.versoes_usadas[nome] = versoes
+            self.recalculados.append(nome)
+        
+        return self.valores[nome]
+
+
+def _com_codigo_material(colunas: Dict[str, Any], codigos: Optional[np.ndarray]) -> Dict[str, Any]:
+    """Colunas com o código de material por componente (as originais, se o modelo não informa materiais)"""
+    return colunas if codigos is None else {**colunas, 'codigo_material': codigos}
+
+
+class OrcamentoIncremental:
+    """Orçamento recalculado de forma incremental sobre um grafo de dependências
+    
+    Mantém em cache as colunas e os custos intermediários de um projeto:
+    mudar a margem refaz só o resumo, mudar o material não refaz os
+    acessórios e assim por diante. O OrcamentoEngine continua sem estado;
+    cada sessão de usuário deve ter sua própria instância.
+    """
+    
+    def __init__(self, engine: OrcamentoEngine):
+        self.engine = engine
+        self.grafo = GrafoDependencias()
+        
+        grafo = self.grafo
+        # Nós que leem as tabelas de preço dependem também da versão do catálogo
+        grafo.adicionar_no(
+            'colunas',
+            lambda componentes, _versao: engine.montar_colunas(componentes),
+            ['componentes', 'versao_catalogo']
+        )
+        # Material de cada componente (usemtl do modelo); só mudar o material padrão ou as regras refaz
+        grafo.adicionar_no(
+            'colunas_materiais',
+            lambda componentes, colunas, material, regras, _versao: _com_codigo_material(
+                colunas, engine.mapear_materiais(componentes, material, json.loads(regras) if regras else None)
+            ),
+            ['componentes', 'colunas', 'material', 'regras_materiais', 'versao_catalogo']
+        )
+        grafo.adicionar_no(
+            'plano_corte',
+            lambda componentes, colunas, material, usar, _versao: (
+                engine.calcular_plano_corte(componentes, material, colunas.get('codigo_material')) if usar else None
+            ),
+            ['componentes', 'colunas_materiais', 'material', 'usar_plano_corte', 'versao_catalogo']
+        )
+        # No modo em centavos os mesmos nós usam as versões inteiras dos custos
+        grafo.adicionar_no(
+            'custo_material',
+            lambda colunas, material, plano, centavos, _versao: (
+                engine._custo_material_centavos if centavos else engine._custo_material_colunar
+            )(colunas, material, plano),
+            ['colunas_materiais', 'material', 'plano_corte', 'centavos', 'versao_catalogo']
+        )
+        grafo.adicionar_no(
+            'custo_acessorios',
+            lambda colunas, qualidade, centavos, _versao: (
+                engine._custo_acessorios_centavos if centavos else engine._custo_acessorios_colunar
+            )(colunas, qualidade),
+            ['colunas', 'qualidade_acessorios', 'centavos', 'versao_catalogo']
+        )
+        grafo.adicionar_no(
+            'custo_corte',
+            lambda colunas, centavos, _versao: (
+                engine._custo_corte_centavos if centavos else engine._custo_corte_colunar
+            )(colunas),
+            ['colunas', 'centavos', 'versao_catalogo']
+        )
+        grafo.adicionar_no(
+            'custos',
+            lambda colunas, material, acessorios, corte, complexidade, centavos: (
+                engine._combinar_centavos if centavos else engine._combinar_custos
+            )(colunas, material, acessorios, corte, complexidade),
+            ['colunas', 'custo_material', 'custo_acessorios', 'custo_corte', 'complexidade', 'centavos']
+        )
+        grafo.adicionar_no('totais', engine._totalizar_custos, ['colunas', 'custos'])
+        grafo.adicionar_no('resumo', engine._aplicar_margem, ['totais', 'margem_lucro'])
+        grafo.adicionar_no('componentes_detalhados', engine._detalhar_componentes, ['componentes', 'colunas', 'custos'])
+        grafo.adicionar_no(
+            'materiais', engine.resumir_materiais, ['colunas_materiais', 'custos', 'material', 'plano_corte']
+        )
+        grafo.adicionar_no(
+            'risco',
+            lambda colunas, material, qualidade, complexidade, margem, plano, ativo, amostras, _versao: (
+                engine.simular_risco(colunas, material, qualidade, complexidade, margem, plano, amostras)
+                if ativo else None
+            ),
+            ['colunas_materiais', 'material', 'qualidade_acessorios', 'complexidade', 'margem_lucro',
+             'plano_corte', 'modo_risco', 'amostras_risco', 'versao_catalogo']
+        )
+    
+    def calcular(self, analise_3d: Dict, configuracoes: Dict) -> Dict:
+        """Calcula o orçamento reaproveitando os nós cujas entradas não mudaram"""
+        if not analise_3d or not analise_3d.get('componentes'):
+            return {}
+        
+        # Todos os nós recalculados leem a mesma versão do catálogo
+        with self.engine.foto_catalogo():
+            return self._calcular(analise_3d, configuracoes)
+    
+    def _calcular(self, analise_3d: Dict, configuracoes: Dict) -> Dict:
+        grafo = self.grafo
+        grafo.recalculados = []
+        grafo.definir_entrada('versao_catalogo', self.engine.versao_catalogo)
+        grafo.definir_entrada('componentes', analise_3d['componentes'])
+        grafo.definir_entrada('material', configuracoes.get('material', 'mdf_15mm'))
+        regras = configuracoes.get('regras_materiais')
+        grafo.definir_entrada('regras_materiais', json.dumps(regras) if regras else None)
+        grafo.definir_entrada('qualidade_acessorios', configuracoes.get('qualidade_acessorios', 'comum'))
+        grafo.definir_entrada('complexidade', configuracoes.get('complexidade', 'media'))
+        grafo.definir_entrada('margem_lucro', configuracoes.get('margem_lucro', 30) / 100)
+        grafo.definir_entrada('usar_plano_corte', bool(configuracoes.get('usar_plano_corte')))
+        grafo.definir_entrada('centavos', bool(configuracoes.get('centavos')))
+        grafo.definir_entrada('modo_risco', bool(configuracoes.get('modo_risco')))
+        grafo.definir_entrada('amostras_risco', configuracoes.get('amostras_risco', 10000))
+        
+        return {
+            'componentes': grafo.obter('componentes_detalhados'),
+            'resumo': grafo.obter('resumo'),
+            'materiais': grafo.obter('materiais'),
+            'plano_corte': grafo.obter('plano_corte'),
+            'risco': grafo.obter('risco'),
+            'configuracoes': configuracoes,
+            'data_calculo': datetime.now().strftime('%d/%m/%Y %H:%M'),
+            'fonte_precos': self.engine.obter_fonte_precos(),
+            'versao_catalogo': grafo.obter('versao_catalogo')
+        }
+    
+    def analisar_sensibilidade(self, variacao_pct: float = 10.0, variacao_pp: float = 5.0) -> Dict:
+        """Sensibilidade do último orçamento calculado, sobre as colunas já em cache"""
+        grafo = self.grafo
+        if 'colunas_materiais' not in grafo.valores:
+            return {}
+        
+        configuracoes = {
+            chave: grafo.valores[chave]
+            for chave in ('material', 'qualidade_acessorios', 'complexidade')
+        }
+        configuracoes['margem_lucro'] = grafo.valores['margem_lucro'] * 100
+        return self.engine.analisar_sensibilidade(
+            grafo.valores['colunas_materiais'], configuracoes, grafo.valores['plano_corte'], variacao_pct, variacao_pp
+        )
+    
+    def obter_tempos(self) -> Dict[str, Dict]:
+        """Tempo do último cálculo de cada nó e se foi recalculado na última chamada"""
+        return {
+            nome: {
+                'tempo_ms': round(self.grafo.tempos_ms.get(nome, 0.0), 3),
+                'recalculado': nome in self.grafo.recalculados
+            }
+            for nome in self.grafo.nos
+        }
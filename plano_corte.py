@@ -0,0 +1,137 @@
+"""
+Plano de Corte - Orca Interiores SaaS
+Otimização do aproveitamento de chapas para o cálculo real de material
+"""
+
+from typing import Dict, List, Optional
+import numpy as np
+
+
+class OtimizadorCorte:
+    def __init__(self, kerf_mm: float = 4.0, refilo_mm: float = 10.0):
+        """Inicializa o otimizador de corte
+
+        kerf_mm é a espessura da serra consumida em cada corte e refilo_mm a
+        borda descartada em cada lado da chapa.
+        """
+        self.kerf_mm = kerf_mm
+        self.refilo_mm = refilo_mm
+
+    def otimizar(self, larguras: np.ndarray, alturas: np.ndarray,
+                 chapa_mm: tuple = (2750, 1850), veio: Optional[np.ndarray] = None) -> Dict:
+        """Distribui os painéis nas chapas com cortes guilhotinados em faixas
+
+        Heurística best-fit decreasing height: os painéis são ordenados pela
+        altura e cada um vai para a faixa mais baixa em que cabe; não cabendo
+        em nenhuma, abre uma faixa na primeira chapa com altura livre ou uma
+        chapa nova. Todo corte atravessa a faixa ou a chapa inteira, como numa
+        seccionadora. Painéis com veio mantêm o comprimento no sentido do
+        comprimento da chapa; os demais podem ser girados.
+        """
+        larguras = np.asarray(larguras, dtype=np.float64)
+        alturas = np.asarray(alturas, dtype=np.float64)
+        n = len(larguras)
+        veio = np.zeros(n, dtype=bool) if veio is None else np.asarray(veio, dtype=bool)
+
+        # Área útil da chapa; somar o kerf aos dois lados dispensa tratar a última peça da faixa
+        kerf = self.kerf_mm
+        largura_util = chapa_mm[0] - 2 * self.refilo_mm + kerf
+        altura_util = chapa_mm[1] - 2 * self.refilo_mm + kerf
+
+        # Orientação: sem veio, deitar a peça (lado menor na altura) para faixas mais baixas
+        maior = np.maximum(larguras, alturas) + kerf
+        menor = np.minimum(larguras, alturas) + kerf
+        deitada = (maior <= largura_util) & (menor <= altura_util)
+        em_pe = (menor <= largura_util) & (maior <= altura_util)
+
+        w = np.where(veio, larguras + kerf, np.where(deitada | ~em_pe, maior, menor))
+        h = np.where(veio, alturas + kerf, np.where(deitada | ~em_pe, menor, maior))
+        rotacionado = ~veio & (w != larguras + kerf)
+        cabe = (w <= largura_util) & (h <= altura_util)
+
+        chapa = np.full(n, -1, dtype=np.int64)
+        pos_x = np.zeros(n)
+        pos_y = np.zeros(n)
+
+        # Faixas abertas: chapa, posição vertical, altura e largura já ocupada
+        faixa_chapa = np.zeros(n, dtype=np.int64)
+        faixa_y = np.zeros(n)
+        faixa_altura = np.zeros(n)
+        faixa_ocupada = np.zeros(n)
+        altura_ocupada_chapa = np.zeros(n)
+        num_faixas = 0
+        num_chapas = 0
+
+        ordem = np.lexsort((-w, -h))
+        for i in ordem[cabe[ordem]].tolist():
+            largura, altura = w[i], h[i]
+
+            candidatas = np.flatnonzero(
+                (faixa_altura[:num_faixas] >= altura) & (faixa_ocupada[:num_faixas] + largura <= largura_util)
+            )
+            if len(candidatas):
+                f = candidatas[np.argmin(faixa_altura[candidatas])]
+            else:
+                livres = np.flatnonzero(altura_ocupada_chapa[:num_chapas] + altura <= altura_util)
+                if len(livres):
+                    c = livres[0]
+                else:
+                    c = num_chapas
+                    num_chapas += 1
+
+                f = num_faixas
+                num_faixas += 1
+                faixa_chapa[f] = c
+                faixa_y[f] = altura_ocupada_chapa[c]
+                faixa_altura[f] = altura
+                altura_ocupada_chapa[c] += altura
+
+            chapa[i] = faixa_chapa[f]
+            pos_x[i] = faixa_ocupada[f] + self.refilo_mm
+            pos_y[i] = faixa_y[f] + self.refilo_mm
+            faixa_ocupada[f] += largura
+
+        area_chapa_m2 = chapa_mm[0] * chapa_mm[1] / 1_000_000
+        area_paineis_m2 = float((larguras * alturas)[cabe].sum() / 1_000_000)
+        area_chapas_m2 = num_chapas * area_chapa_m2
+
+        return {
+            'chapas': num_chapas,
+            'dimensoes_chapa_mm': list(chapa_mm),
+            'area_paineis_m2': round(area_paineis_m2, 3),
+            'area_chapas_m2': round(area_chapas_m2, 3),
+            'aproveitamento_pct': round(area_paineis_m2 / area_chapas_m2 * 100, 1) if num_chapas else 0.0,
+            'desperdicio_real_pct': round((1 - area_paineis_m2 / area_chapas_m2) * 100, 1) if num_chapas else 0.0,
+            'nao_alocados': np.flatnonzero(~cabe).tolist(),
+            'chapa': chapa,
+            'x_mm': pos_x,
+            'y_mm': pos_y,
+            'rotacionado': rotacionado
+        }
+
+    def gerar_lista_cortes(self, plano: Dict, larguras: np.ndarray, alturas: np.ndarray,
+                           nomes: List[str]) -> List[Dict]:
+        """Lista de cortes por chapa, na ordem de posicionamento"""
+        alocados = np.flatnonzero(plano['chapa'] >= 0)
+        alocados = alocados[np.lexsort((plano['x_mm'][alocados], plano['y_mm'][alocados], plano['chapa'][alocados]))]
+
+        return [
+            {
+                'painel': nomes[i],
+                'chapa': chapa + 1,
+                'x_mm': x,
+                'y_mm': y,
+                'largura_mm': largura,
+                'altura_mm': altura,
+                'rotacionado': rotacionado
+            }
+            for i, chapa, x, y, largura, altura, rotacionado in zip(
+                alocados.tolist(),
+                plano['chapa'][alocados].tolist(),
+                np.round(plano['x_mm'][alocados], 1).tolist(),
+                np.round(plano['y_mm'][alocados], 1).tolist(),
+                np.round(np.asarray(larguras)[alocados], 1).tolist(),
+                np.round(np.asarray(alturas)[alocados], 1).tolist(),
+                plano['rotacionado'][alocados].tolist()
+            )
+        ]
@@ -0,0 +1,213 @@
+"""
+Relatórios - Orca Interiores SaaS
+Geração do relatório do orçamento em Markdown, escrita direto em um arquivo ou stream
+"""
+
+import io
+from typing import Dict, List, Optional, TextIO
+import numpy as np
+
+
+class ModeloRelatorio:
+    def __init__(self, texto: str):
+        """Modelo no formato de str.format
+
+        A renderização usa o format_map já vinculado ao texto, sem montar a
+        chamada de formatação a cada linha.
+        """
+        self.texto = texto
+        self._formatar = texto.format_map
+
+    def renderizar(self, valores: Dict) -> str:
+        """Renderiza o modelo; campos ausentes geram KeyError com o nome do campo"""
+        return self._formatar(valores)
+
+
+MODELO_CABECALHO = ModeloRelatorio("""
+# ORÇAMENTO DETALHADO - ORCA INTERIORES
+
+**Cliente:** {cliente}
+**Ambiente:** {ambiente}
+**Data:** {data_calculo}
+**Fonte de Preços:** {fonte_precos} (catálogo {versao_catalogo})
+
+## RESUMO EXECUTIVO
+
+- **Quantidade de Componentes:** {quantidade_componentes}
+- **Área Total:** {area_total_m2} m²
+- **Valor Final:** R$ {valor_final:,.2f}
+- **Preço por m²:** R$ {preco_por_m2:,.2f}
+
+## BREAKDOWN DE CUSTOS
+
+- **Material:** R$ {custo_material:,.2f}
+- **Acessórios:** R$ {custo_acessorios:,.2f}
+- **Corte/Usinagem:** R$ {custo_corte:,.2f}
+- **Complexidade ({multiplicador_complexidade}x):** R$ {acrescimo_complexidade:,.2f}
+- **Subtotal:** R$ {subtotal:,.2f}
+- **Margem de Lucro ({margem_lucro_pct}%):** R$ {valor_lucro:,.2f}
+
+## DETALHAMENTO POR COMPONENTE
+""")
+
+MODELO_GRUPO = ModeloRelatorio("""
+### {grupo}{continuacao} — {quantidade} componente(s), R$ {total:,.2f}
+""")
+
+MODELO_TABELA = ModeloRelatorio("""
+| # | Componente | Tipo | Área (m²) | Material | Acessórios | Corte | Total | R$/m² |
+|---:|---|---|---:|---:|---:|---:|---:|---:|
+""")
+
+MODELO_LINHA = ModeloRelatorio(
+    "| {indice} | {nome} | {tipo} | {area_m2:.2f} | {custo_material:,.2f} | {custo_acessorios:,.2f} "
+    "| {custo_corte:,.2f} | {custo_total:,.2f} | {preco_por_m2:,.2f} |\n"
+)
+
+MODELO_PAGINA = ModeloRelatorio("""
+*Página {pagina} de {paginas} — componentes {inicio} a {fim} de {total}*
+""")
+
+MODELO_RODAPE = ModeloRelatorio("""
+---
+*Orçamento gerado automaticamente pelo sistema Orca Interiores*
+*Preços sujeitos a alteração conforme disponibilidade de material*
+""")
+
+
+class GeradorRelatorio:
+    def __init__(self, linhas_por_escrita: int = 500):
+        """Inicializa o gerador; as linhas da tabela são escritas em blocos de linhas_por_escrita"""
+        self.linhas_por_escrita = linhas_por_escrita
+
+    def contar_paginas(self, orcamento: Dict, itens_por_pagina: int) -> int:
+        """Número de páginas do detalhamento para itens_por_pagina componentes por página"""
+        total = len(orcamento.get('componentes', []))
+        return max(1, -(-total // itens_por_pagina))
+
+    def escrever(self, orcamento: Dict, destino: TextIO, cliente: str, ambiente: str,
+                 agrupar_por: Optional[str] = None, itens_por_pagina: Optional[int] = None,
+                 pagina: Optional[int] = None) -> int:
+        """Escreve o relatório em destino e retorna quantos componentes foram detalhados
+
+        Com agrupar_por (ex.: 'tipo'), os componentes saem agrupados, com o
+        subtotal de cada grupo. Com itens_por_pagina e pagina (a partir de 1),
+        só aquela página do detalhamento é escrita, o que serve de prévia.
+        """
+        if not orcamento:
+            return 0
+
+        resumo = orcamento.get('resumo', {})
+        componentes = orcamento.get('componentes', [])
+
+        destino.write(MODELO_CABECALHO.renderizar({
+            'cliente': cliente,
+            'ambiente': ambiente,
+            'data_calculo': orcamento.get('data_calculo', 'N/A'),
+            'fonte_precos': orcamento.get('fonte_precos', 'N/A'),
+            'versao_catalogo': orcamento.get('versao_catalogo', 'N/A'),
+            'quantidade_componentes': resumo.get('quantidade_componentes', 0),
+            'area_total_m2': resumo.get('area_total_m2', 0),
+            'valor_final': resumo.get('valor_final', 0),
+            'preco_por_m2': resumo.get('preco_por_m2', 0),
+            'custo_material': resumo.get('custo_material', 0),
+            'custo_acessorios': resumo.get('custo_acessorios', 0),
+            'custo_corte': resumo.get('custo_corte', 0),
+            'multiplicador_complexidade': resumo.get('multiplicador_complexidade', 1.0),
+            'acrescimo_complexidade': resumo.get('acrescimo_complexidade', 0),
+            'subtotal': resumo.get('subtotal', 0),
+            'margem_lucro_pct': resumo.get('margem_lucro_pct', 0),
+            'valor_lucro': resumo.get('valor_lucro', 0)
+        }))
+
+        total = len(componentes)
+        ordem, grupos = self._ordenar(componentes, agrupar_por)
+
+        inicio, fim = 0, total
+        if itens_por_pagina and pagina:
+            inicio = min((pagina - 1) * itens_por_pagina, total)
+            fim = min(inicio + itens_por_pagina, total)
+
+        if grupos is None:
+            destino.write(MODELO_TABELA.renderizar({}))
+            self._escrever_linhas(destino, componentes, ordem[inicio:fim], inicio)
+        else:
+            rotulos, codigos, quantidades, totais = grupos
+            posicao = inicio
+            # Blocos consecutivos do mesmo grupo dentro da página
+            for codigo, bloco in _blocos(codigos[ordem[inicio:fim]]):
+                destino.write(MODELO_GRUPO.renderizar({
+                    'grupo': rotulos[codigo],
+                    'continuacao': ' (continuação)' if posicao > 0 and codigos[ordem[posicao - 1]] == codigo else '',
+                    'quantidade': int(quantidades[codigo]),
+                    'total': float(totais[codigo])
+                }))
+                destino.write(MODELO_TABELA.renderizar({}))
+                self._escrever_linhas(destino, componentes, ordem[posicao:posicao + bloco], posicao)
+                posicao += bloco
+
+        if itens_por_pagina and pagina:
+            destino.write(MODELO_PAGINA.renderizar({
+                'pagina': pagina,
+                'paginas': self.contar_paginas(orcamento, itens_por_pagina),
+                'inicio': inicio + 1 if fim > inicio else 0,
+                'fim': fim,
+                'total': total
+            }))
+
+        destino.write(MODELO_RODAPE.renderizar({}))
+        return fim - inicio
+
+    def gerar_texto(self, orcamento: Dict, cliente: str, ambiente: str, **opcoes) -> str:
+        """Gera o relatório inteiro (ou uma página) como texto"""
+        destino = io.StringIO()
+        self.escrever(orcamento, destino, cliente, ambiente, **opcoes)
+        return destino.getvalue()
+
+    def _ordenar(self, componentes: List[Dict], agrupar_por: Optional[str]):
+        """Ordem de escrita dos componentes e, se agrupado, os totais de cada grupo"""
+        n = len(componentes)
+        if not agrupar_por:
+            return np.arange(n), None
+
+        rotulos, codigos = np.unique(
+            [str(comp.get(agrupar_por, 'N/A')).title() for comp in componentes], return_inverse=True
+        )
+        custos = np.fromiter((comp.get('custo_total', 0.0) for comp in componentes), dtype=np.float64, count=n)
+        # Ordenação estável: dentro de cada grupo os componentes mantêm a ordem original
+        ordem = np.argsort(codigos, kind='stable')
+        grupos = (
+            rotulos.tolist(),
+            codigos,
+            np.bincount(codigos, minlength=len(rotulos)),
+            np.bincount(codigos, weights=custos, minlength=len(rotulos)).round(2)
+        )
+        return ordem, grupos
+
+    def _escrever_linhas(self, destino: TextIO, componentes: List[Dict], indices: np.ndarray, posicao: int):
+        """Escreve as linhas da tabela em blocos, sem montar o documento inteiro na memória"""
+        renderizar = MODELO_LINHA.renderizar
+        for bloco in range(0, len(indices), self.linhas_por_escrita):
+            destino.write(''.join(
+                renderizar({
+                    'indice': posicao + bloco + j + 1,
+                    'nome': str(comp.get('nome', 'Componente')).replace('|', '\\|'),
+                    'tipo': str(comp.get('tipo', 'N/A')).title(),
+                    'area_m2': comp.get('area_m2', 0),
+                    'custo_material': comp.get('custo_material', 0),
+                    'custo_acessorios': comp.get('custo_acessorios', 0),
+                    'custo_corte': comp.get('custo_corte', 0),
+                    'custo_total': comp.get('custo_total', 0),
+                    'preco_por_m2': comp.get('preco_por_m2', 0)
+                })
+                for j, comp in enumerate(componentes[i] for i in indices[bloco:bloco + self.linhas_por_escrita].tolist())
+            ))
+
+
+def _blocos(codigos: np.ndarray):
+    """Sequências consecutivas de códigos iguais: (código, tamanho)"""
+    if not len(codigos):
+        return []
+    inicios = np.flatnonzero(np.diff(codigos)) + 1
+    limites = np.concatenate([[0], inicios, [len(codigos)]])
+    return list(zip(codigos[limites[:-1]].tolist(), np.diff(limites).tolist()))
@@ -0,0 +1,340 @@
+"""
+Relatório em PDF - Orca Interiores SaaS
+Escrita incremental do PDF do orçamento, página a página, sem bibliotecas externas
+"""
+
+import zlib
+import threading
+from typing import BinaryIO, Callable, Dict, List, Optional
+import numpy as np
+
+# Página A4 em pontos
+LARGURA_PAGINA = 595
+ALTURA_PAGINA = 842
+MARGEM = 40
+
+# Larguras (1/1000 do corpo) da Helvetica para os caracteres dos valores; demais ~556
+LARGURAS_HELVETICA = {' ': 278, ',': 278, '.': 278, '-': 333, '$': 556, 'R': 722, '%': 889, 'x': 500}
+
+
+def _escapar(texto: str) -> bytes:
+    """Texto para string literal de PDF (WinAnsi), escapando parênteses e barras"""
+    return (
+        texto.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+        .encode('cp1252', errors='replace')
+    )
+
+
+def _largura_texto(texto: str, tamanho: float) -> float:
+    """Largura aproximada do texto em Helvetica (exata para números e moeda)"""
+    return sum(LARGURAS_HELVETICA.get(c, 556) for c in texto) * tamanho / 1000
+
+
+class EscritorPDF:
+    def __init__(self, destino: BinaryIO, comprimir: bool = True):
+        """Escreve um PDF em destino à medida que as páginas ficam prontas
+
+        Cada página vai para o arquivo assim que termina; em memória ficam só a
+        página atual e a posição de cada objeto (para a tabela xref final).
+        """
+        self.destino = destino
+        self.comprimir = comprimir
+        self.posicoes = {}
+        self.paginas = []
+        self.bytes_escritos = 0
+        self._conteudo = []
+
+        self._escrever(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        # 1: catálogo, 2: árvore de páginas (escrita no fim), 3 e 4: fontes
+        self._objeto(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        self._objeto(3, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>')
+        self._objeto(4, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>')
+        self._proximo_objeto = 5
+
+    def _escrever(self, dados: bytes):
+        self.destino.write(dados)
+        self.bytes_escritos += len(dados)
+
+    def _objeto(self, numero: int, corpo: bytes):
+        self.posicoes[numero] = self.bytes_escritos
+        self._escrever(b'%d 0 obj\n' % numero + corpo + b'\nendobj\n')
+
+    def texto(self, x: float, y: float, texto: str, tamanho: float = 9, negrito: bool = False,
+              alinhar_direita: bool = False):
+        """Escreve uma linha de texto na página atual (y a partir da base da página)"""
+        if alinhar_direita:
+            x -= _largura_texto(texto, tamanho)
+        fonte = b'/F2' if negrito else b'/F1'
+        self._conteudo.append(
+            b'BT %s %.1f Tf %.2f %.2f Td (%s) Tj ET\n' % (fonte, tamanho, x, y, _escapar(texto))
+        )
+
+    def retangulo(self, x: float, y: float, largura: float, altura: float, cinza: float = 0.9):
+        """Retângulo preenchido (fundo de cabeçalhos)"""
+        self._conteudo.append(b'%.2f g %.2f %.2f %.2f %.2f re f 0 g\n' % (cinza, x, y, largura, altura))
+
+    def linha(self, x1: float, y1: float, x2: float, y2: float, espessura: float = 0.5):
+        self._conteudo.append(b'%.2f w %.2f %.2f m %.2f %.2f l S\n' % (espessura, x1, y1, x2, y2))
+
+    def fechar_pagina(self):
+        """Grava a página atual no arquivo e libera o conteúdo dela"""
+        conteudo = b''.join(self._conteudo)
+        self._conteudo = []
+
+        numero_conteudo = self._proximo_objeto
+        numero_pagina = numero_conteudo + 1
+        self._proximo_objeto += 2
+
+        if self.comprimir:
+            conteudo = zlib.compress(conteudo)
+            cabecalho = b'<< /Length %d /Filter /FlateDecode >>' % len(conteudo)
+        else:
+            cabecalho = b'<< /Length %d >>' % len(conteudo)
+        self._objeto(numero_conteudo, cabecalho + b'\nstream\n' + conteudo + b'\nendstream')
+        self._objeto(numero_pagina, (
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+            b'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>'
+        ) % (LARGURA_PAGINA, ALTURA_PAGINA, numero_conteudo))
+        self.paginas.append(numero_pagina)
+
+    def finalizar(self):
+        """Escreve a árvore de páginas, a tabela xref e o trailer"""
+        if self._conteudo or not self.paginas:
+            self.fechar_pagina()
+
+        filhos = b' '.join(b'%d 0 R' % numero for numero in self.paginas)
+        self._objeto(2, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (filhos, len(self.paginas)))
+
+        inicio_xref = self.bytes_escritos
+        total = self._proximo_objeto
+        self._escrever(b'xref\n0 %d\n0000000000 65535 f \n' % total)
+        self._escrever(b''.join(b'%010d 00000 n \n' % self.posicoes[numero] for numero in range(1, total)))
+        self._escrever(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (total, inicio_xref))
+
+
+class GeradorPDF:
+    # Colunas da tabela de componentes: (título, chave, x da borda, alinhar à direita)
+    COLUNAS = [
+        ('#', 'indice', 62, True),
+        ('Componente', 'nome', 68, False),
+        ('Tipo', 'tipo', 218, False),
+        ('Área m²', 'area_m2', 318, True),
+        ('Material', 'custo_material', 378, True),
+        ('Acessórios', 'custo_acessorios', 438, True),
+        ('Corte', 'custo_corte', 488, True),
+        ('Total', 'custo_total', 555, True)
+    ]
+
+    def __init__(self, altura_linha: float = 13.0, tamanho_fonte: float = 8.0):
+        """Inicializa o gerador de PDF do orçamento"""
+        self.altura_linha = altura_linha
+        self.tamanho_fonte = tamanho_fonte
+        # Altura do título e do resumo de custos, que ocupam o topo da primeira página
+        self.altura_resumo = 290
+        # Linhas de tabela por página; a primeira página perde espaço para o resumo
+        self.linhas_primeira_pagina = self._capacidade(ALTURA_PAGINA - MARGEM - self.altura_resumo)
+        self.linhas_por_pagina = self._capacidade(ALTURA_PAGINA - MARGEM)
+
+    def _capacidade(self, topo: float) -> int:
+        """Linhas da tabela que cabem entre o topo (antes dos títulos) e o rodapé"""
+        primeira_linha = topo - self.altura_linha - 2
+        return int((primeira_linha - (MARGEM + 20)) // self.altura_linha) + 1
+
+    def contar_paginas(self, orcamento: Dict, agrupar_por: Optional[str] = None) -> int:
+        """Número de páginas do PDF (conhecido antes de gerar, para o progresso)"""
+        linhas = len(self._linhas(orcamento.get('componentes', []), agrupar_por))
+        restantes = max(0, linhas - self.linhas_primeira_pagina)
+        return 1 + -(-restantes // self.linhas_por_pagina)
+
+    def gerar(self, orcamento: Dict, destino: BinaryIO, cliente: str, ambiente: str,
+              agrupar_por: Optional[str] = None,
+              callback_progresso: Optional[Callable[[int, int], None]] = None) -> int:
+        """Escreve o PDF em destino página a página e retorna o número de páginas"""
+        componentes = orcamento.get('componentes', [])
+        linhas = self._linhas(componentes, agrupar_por)
+        total_paginas = self.contar_paginas(orcamento, agrupar_por)
+
+        pdf = EscritorPDF(destino)
+        pagina = 1
+        y = self._cabecalho(pdf, orcamento, cliente, ambiente)
+        y = self._titulos_tabela(pdf, y)
+
+        livres = self.linhas_primeira_pagina
+        for tipo, valor in linhas:
+            if not livres:
+                self._rodape(pdf, pagina, total_paginas)
+                pdf.fechar_pagina()
+                if callback_progresso:
+                    callback_progresso(pagina, total_paginas)
+                pagina += 1
+                y = self._titulos_tabela(pdf, ALTURA_PAGINA - MARGEM)
+                livres = self.linhas_por_pagina
+
+            if tipo == 'grupo':
+                pdf.retangulo(MARGEM, y - 3, LARGURA_PAGINA - 2 * MARGEM, self.altura_linha, 0.95)
+                pdf.texto(MARGEM + 4, y, valor, self.tamanho_fonte, negrito=True)
+            else:
+                self._linha_componente(pdf, componentes[valor], valor, y)
+            y -= self.altura_linha
+            livres -= 1
+
+        self._rodape(pdf, pagina, total_paginas)
+        pdf.finalizar()
+        if callback_progresso:
+            callback_progresso(pagina, total_paginas)
+        return pagina
+
+    def _linhas(self, componentes: List[Dict], agrupar_por: Optional[str]) -> List[tuple]:
+        """Sequência de linhas da tabela: ('grupo', título) ou ('componente', índice)"""
+        n = len(componentes)
+        if not agrupar_por:
+            return [('componente', i) for i in range(n)]
+
+        rotulos, codigos = np.unique(
+            [str(comp.get(agrupar_por, 'N/A')).title() for comp in componentes], return_inverse=True
+        )
+        custos = np.fromiter((comp.get('custo_total', 0.0) for comp in componentes), dtype=np.float64, count=n)
+        quantidades = np.bincount(codigos, minlength=len(rotulos))
+        totais = np.bincount(codigos, weights=custos, minlength=len(rotulos))
+
+        linhas = []
+        ordem = np.argsort(codigos, kind='stable').tolist()
+        anterior = None
+        for i in ordem:
+            codigo = codigos[i]
+            if codigo != anterior:
+                linhas.append(('grupo', f"{rotulos[codigo]} — {quantidades[codigo]} componente(s), R$ {totais[codigo]:,.2f}"))
+                anterior = codigo
+            linhas.append(('componente', i))
+        return linhas
+
+    def _cabecalho(self, pdf: EscritorPDF, orcamento: Dict, cliente: str, ambiente: str) -> float:
+        """Título, dados do cliente e resumo de custos na primeira página; retorna o y livre"""
+        resumo = orcamento.get('resumo', {})
+        y = ALTURA_PAGINA - MARGEM - 10
+        pdf.texto(MARGEM, y, "ORÇAMENTO DETALHADO - ORCA INTERIORES", 16, negrito=True)
+        y -= 28
+
+        for rotulo, valor in [
+            ("Cliente", cliente),
+            ("Ambiente", ambiente),
+            ("Data", orcamento.get('data_calculo', 'N/A')),
+            ("Fonte de Preços", f"{orcamento.get('fonte_precos', 'N/A')} (catálogo {orcamento.get('versao_catalogo', 'N/A')})")
+        ]:
+            pdf.texto(MARGEM, y, f"{rotulo}:", 10, negrito=True)
+            pdf.texto(MARGEM + 95, y, str(valor), 10)
+            y -= 14
+
+        y -= 10
+        pdf.texto(MARGEM, y, "RESUMO", 12, negrito=True)
+        y -= 18
+        for rotulo, valor in [
+            ("Componentes", f"{resumo.get('quantidade_componentes', 0)}"),
+            ("Área Total", f"{resumo.get('area_total_m2', 0)} m²"),
+            ("Material", f"R$ {resumo.get('custo_material', 0):,.2f}"),
+            ("Acessórios", f"R$ {resumo.get('custo_acessorios', 0):,.2f}"),
+            ("Corte/Usinagem", f"R$ {resumo.get('custo_corte', 0):,.2f}"),
+            (f"Complexidade ({resumo.get('multiplicador_complexidade', 1.0)}x)", f"R$ {resumo.get('acrescimo_complexidade', 0):,.2f}"),
+            ("Subtotal", f"R$ {resumo.get('subtotal', 0):,.2f}"),
+            (f"Margem de Lucro ({resumo.get('margem_lucro_pct', 0)}%)", f"R$ {resumo.get('valor_lucro', 0):,.2f}")
+        ]:
+            pdf.texto(MARGEM, y, rotulo, 10)
+            pdf.texto(MARGEM + 300, y, valor, 10, alinhar_direita=True)
+            y -= 14
+
+        pdf.linha(MARGEM, y + 8, MARGEM + 300, y + 8)
+        y -= 6
+        pdf.texto(MARGEM, y, "Valor Final", 12, negrito=True)
+        pdf.texto(MARGEM + 300, y, f"R$ {resumo.get('valor_final', 0):,.2f}", 12, negrito=True, alinhar_direita=True)
+        y -= 30
+
+        pdf.texto(MARGEM, y, "DETALHAMENTO POR COMPONENTE", 12, negrito=True)
+        return ALTURA_PAGINA - MARGEM - self.altura_resumo
+
+    def _titulos_tabela(self, pdf: EscritorPDF, y: float) -> float:
+        """Cabeçalho da tabela de componentes (repetido em cada página)"""
+        pdf.retangulo(MARGEM, y - 4, LARGURA_PAGINA - 2 * MARGEM, self.altura_linha + 2)
+        for titulo, _, x, direita in self.COLUNAS:
+            pdf.texto(x, y, titulo, self.tamanho_fonte, negrito=True, alinhar_direita=direita)
+        return y - self.altura_linha - 2
+
+    def _linha_componente(self, pdf: EscritorPDF, comp: Dict, indice: int, y: float):
+        tamanho = self.tamanho_fonte
+        valores = {
+            'indice': str(indice + 1),
+            'nome': str(comp.get('nome', 'Componente'))[:30],
+            'tipo': str(comp.get('tipo', 'N/A')).title()[:18],
+            'area_m2': f"{comp.get('area_m2', 0):.2f}",
+            'custo_material': f"{comp.get('custo_material', 0):,.2f}",
+            'custo_acessorios': f"{comp.get('custo_acessorios', 0):,.2f}",
+            'custo_corte': f"{comp.get('custo_corte', 0):,.2f}",
+            'custo_total': f"{comp.get('custo_total', 0):,.2f}"
+        }
+        for _, chave, x, direita in self.COLUNAS:
+            pdf.texto(x, y, valores[chave], tamanho, alinhar_direita=direita)
+
+    def _rodape(self, pdf: EscritorPDF, pagina: int, total_paginas: int):
+        pdf.linha(MARGEM, MARGEM, LARGURA_PAGINA - MARGEM, MARGEM)
+        pdf.texto(MARGEM, MARGEM - 14, "Orçamento gerado automaticamente pelo sistema Orca Interiores", 7)
+        pdf.texto(LARGURA_PAGINA - MARGEM, MARGEM - 14, f"Página {pagina} de {total_paginas}", 7, alinhar_direita=True)
+
+
+class _Cancelada(Exception):
+    """Interrompe a geração do PDF de uma exportação cancelada"""
+
+
+class ExportacaoPDF:
+    def __init__(self, gerador: Optional[GeradorPDF] = None):
+        """Geração do PDF em uma thread, com progresso consultável pela interface"""
+        self.gerador = gerador or GeradorPDF()
+        self.progresso = {'pagina': 0, 'total': 0, 'concluido': False, 'erro': None}
+        self._thread = None
+        self._destino = None
+        self._cancelada = False
+        self._trava = threading.Lock()
+
+    def iniciar(self, orcamento: Dict, destino: BinaryIO, cliente: str, ambiente: str,
+                agrupar_por: Optional[str] = None) -> threading.Thread:
+        """Começa a escrever o PDF em destino; acompanhe por self.progresso"""
+        self._destino = destino
+        self._cancelada = False
+        self.progresso.update({
+            'pagina': 0,
+            'total': self.gerador.contar_paginas(orcamento, agrupar_por),
+            'concluido': False,
+            'erro': None
+        })
+
+        def avancar(pagina: int, total: int):
+            if self._cancelada:
+                raise _Cancelada()
+            self.progresso.update({'pagina': pagina, 'total': total})
+
+        def executar():
+            try:
+                self.gerador.gerar(orcamento, destino, cliente, ambiente, agrupar_por, avancar)
+            except _Cancelada:
+                self.progresso['erro'] = 'cancelada'
+            except Exception as e:
+                print(f"Erro ao gerar PDF: {e}")
+                self.progresso['erro'] = str(e)
+            finally:
+                with self._trava:
+                    self.progresso['concluido'] = True
+                    if self._cancelada:
+                        destino.close()
+
+        self._thread = threading.Thread(target=executar, daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def cancelar(self):
+        """Descarta a exportação: a thread para na próxima página e o destino é fechado
+
+        Se a geração já terminou o destino é fechado agora; senão, pela própria
+        thread ao sair, para não fechar um arquivo que ainda está sendo escrito.
+        """
+        with self._trava:
+            self._cancelada = True
+            if self.progresso['concluido'] and self._destino is not None:
+                self._destino.close()
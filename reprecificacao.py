@@ -0,0 +1,301 @@
+"""
+Reprecificação em Lote - Orca Interiores SaaS
+Recalcula os orçamentos salvos quando o catálogo de preços muda
+"""
+
+import sys
+import json
+import time
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Callable
+import numpy as np
+
+from orcamento_engine import OrcamentoEngine
+from auth_manager import MIGRACOES
+from banco import BancoDados
+from blobs import RepositorioBlobs
+
+
+class ReprecificadorProjetos:
+    def __init__(self, db_path: str = "usuarios.db", engine: Optional[OrcamentoEngine] = None,
+                 tamanho_lote: int = 500):
+        """Inicializa o job de reprecificação
+
+        Os projetos são lidos do banco em lotes de tamanho_lote (paginação por id),
+        recalculados a partir da análise já salva, sem reprocessar a geometria, e
+        gravados de volta em uma transação por lote.
+        """
+        self.db_path = db_path
+        self.banco = BancoDados.obter(db_path)
+        self.blobs = RepositorioBlobs()
+        self.engine = engine or OrcamentoEngine()
+        self.tamanho_lote = tamanho_lote
+        self.progresso = {'processados': 0, 'total': 0, 'concluido': False, 'resumo': None}
+        self._thread = None
+
+    def iniciar_em_segundo_plano(self) -> threading.Thread:
+        """Executa a reprecificação em uma thread; acompanhe por self.progresso"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self.executar, daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def executar(self, callback_progresso: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """Reprecifica todos os projetos desatualizados e retorna o resumo das variações
+
+        Projetos já calculados com a versão atual do catálogo são ignorados, então
+        uma execução interrompida pode ser retomada sem refazer o que foi gravado.
+        Toda a execução usa a mesma foto do catálogo, a da versão registrada.
+        """
+        with self.engine.foto_catalogo():
+            return self._executar(callback_progresso)
+
+    def _executar(self, callback_progresso: Optional[Callable[[Dict], None]]) -> Dict:
+        inicio = time.perf_counter()
+        versao = self.engine.versao_catalogo
+
+        estatisticas = {'processados': 0, 'reprecificados': 0, 'atualizados': 0, 'sem_componentes': 0, 'erros': 0}
+        ids, nomes, valores_anteriores, valores_novos = [], [], [], []
+
+        try:
+            self.banco.migrar(MIGRACOES)
+            conn = self.banco.conexao()
+            self.progresso.update({
+                'processados': 0,
+                'total': conn.execute("SELECT COUNT(*) FROM projetos").fetchone()[0],
+                'concluido': False,
+                'resumo': None
+            })
+
+            ultimo_id = 0
+            while True:
+                # Paginação por id: cada lote é uma consulta curta, sem cursor aberto durante as escritas
+                referencias = conn.execute('''
+                    SELECT id, nome_arquivo, analise_hash, orcamento_hash
+                    FROM projetos
+                    WHERE id > ?
+                    ORDER BY id
+                    LIMIT ?
+                ''', (ultimo_id, self.tamanho_lote)).fetchall()
+                if not referencias:
+                    break
+                ultimo_id = referencias[-1][0]
+
+                # Análises iguais (uploads repetidos) são lidas e descomprimidas uma vez por lote
+                conteudos = self.blobs.ler(conn, [
+                    hash_blob for _, _, analise_hash, orcamento_hash in referencias
+                    for hash_blob in (analise_hash, orcamento_hash)
+                ])
+                linhas = [
+                    (projeto_id, nome, conteudos.get(analise_hash), conteudos.get(orcamento_hash))
+                    for projeto_id, nome, analise_hash, orcamento_hash in referencias
+                ]
+                atualizacoes = self._reprecificar_lote(linhas, versao, estatisticas)
+
+                if atualizacoes:
+                    preparados = {projeto_id: self.blobs.preparar(dados) for projeto_id, _, _, _, dados in atualizacoes}
+                    anteriores = {projeto_id: orcamento_hash for projeto_id, _, _, orcamento_hash in referencias}
+                    with self.banco.transacao() as conn:
+                        self.blobs.gravar(conn, preparados.values())
+                        # valor_final é a coluna de resumo que muda com os preços
+                        conn.executemany(
+                            "UPDATE projetos SET orcamento_hash = ?, valor_final = ? WHERE id = ?",
+                            [(preparados[projeto_id][0], novo, projeto_id) for projeto_id, _, _, novo, _ in atualizacoes]
+                        )
+                        self.blobs.remover_orfaos(conn, [anteriores[projeto_id] for projeto_id in preparados])
+                    for projeto_id, nome, anterior, novo, _ in atualizacoes:
+                        ids.append(projeto_id)
+                        nomes.append(nome)
+                        valores_anteriores.append(anterior)
+                        valores_novos.append(novo)
+
+                estatisticas['processados'] += len(linhas)
+                self.progresso['processados'] = estatisticas['processados']
+                if callback_progresso:
+                    callback_progresso(dict(self.progresso))
+
+        except sqlite3.Error as e:
+            print(f"Erro na reprecificação dos projetos: {e}")
+
+        resumo = self._resumir_variacoes(ids, nomes, valores_anteriores, valores_novos)
+        resumo.update(estatisticas)
+        resumo['versao_catalogo'] = versao
+        resumo['tempo_s'] = round(time.perf_counter() - inicio, 2)
+        resumo['projetos_por_s'] = round(estatisticas['processados'] / resumo['tempo_s'], 1) if resumo['tempo_s'] else 0
+
+        self.progresso.update({'concluido': True, 'resumo': resumo})
+        return resumo
+
+    def _reprecificar_lote(self, linhas: List[tuple], versao: str, estatisticas: Dict) -> List[tuple]:
+        """Recalcula um lote de projetos; retorna (id, nome, valor anterior, valor novo, json)
+
+        Projetos com as mesmas configurações (sem plano de corte nem modo de
+        risco) são custeados juntos: os componentes do grupo viram um único
+        conjunto de colunas e cada projeto é totalizado na sua fatia.
+        """
+        engine = self.engine
+        grupos = {}
+        individuais = []
+
+        for projeto_id, nome_arquivo, dados_analise, dados_orcamento in linhas:
+            try:
+                orcamento = json.loads(dados_orcamento) if dados_orcamento else {}
+                if orcamento.get('versao_catalogo') == versao:
+                    estatisticas['atualizados'] += 1
+                    continue
+
+                componentes = (json.loads(dados_analise) if dados_analise else {}).get('componentes')
+            except (ValueError, AttributeError) as e:
+                print(f"Erro ao ler projeto {projeto_id}: {e}")
+                estatisticas['erros'] += 1
+                continue
+
+            if not componentes:
+                estatisticas['sem_componentes'] += 1
+                continue
+
+            configuracoes = orcamento.get('configuracoes') or {}
+            projeto = (projeto_id, nome_arquivo, componentes, orcamento, configuracoes)
+            if configuracoes.get('usar_plano_corte') or configuracoes.get('modo_risco'):
+                individuais.append(projeto)
+            else:
+                chave = (
+                    configuracoes.get('material', 'mdf_15mm'),
+                    configuracoes.get('qualidade_acessorios', 'comum'),
+                    configuracoes.get('complexidade', 'media'),
+                    bool(configuracoes.get('centavos')),
+                    json.dumps(configuracoes.get('regras_materiais'))
+                )
+                grupos.setdefault(chave, []).append(projeto)
+
+        atualizacoes = []
+
+        for (material, qualidade, complexidade, centavos, regras), projetos in grupos.items():
+            componentes = [comp for projeto in projetos for comp in projeto[2]]
+            colunas = engine.montar_colunas_materiais(componentes, material, json.loads(regras))
+            custos = engine.calcular_custos_colunar(colunas, material, qualidade, complexidade, centavos=centavos)
+
+            limites = np.cumsum([0] + [len(projeto[2]) for projeto in projetos]).tolist()
+            for projeto, a, b in zip(projetos, limites[:-1], limites[1:]):
+                atualizacoes.append(self._atualizar_orcamento(
+                    projeto, _fatiar(colunas, a, b), _fatiar(custos, a, b), None, None, versao
+                ))
+
+        # Com plano de corte o desperdício depende do projeto inteiro, e a simulação de
+        # risco sorteia sobre os componentes do projeto: custeio individual
+        for projeto in individuais:
+            _, _, componentes, _, configuracoes = projeto
+            material = configuracoes.get('material', 'mdf_15mm')
+            qualidade = configuracoes.get('qualidade_acessorios', 'comum')
+            complexidade = configuracoes.get('complexidade', 'media')
+            colunas = engine.montar_colunas_materiais(componentes, material, configuracoes.get('regras_materiais'))
+            plano_corte = (
+                engine.calcular_plano_corte(componentes, material, colunas.get('codigo_material'))
+                if configuracoes.get('usar_plano_corte') else None
+            )
+            custos = engine.calcular_custos_colunar(
+                colunas, material, qualidade, complexidade, plano_corte, configuracoes.get('centavos', False)
+            )
+            risco = engine.simular_risco(
+                colunas, material, qualidade, complexidade, configuracoes.get('margem_lucro', 30) / 100,
+                plano_corte, configuracoes.get('amostras_risco', 10000)
+            ) if configuracoes.get('modo_risco') else None
+            atualizacoes.append(self._atualizar_orcamento(projeto, colunas, custos, plano_corte, risco, versao))
+
+        estatisticas['reprecificados'] += len(atualizacoes)
+        return atualizacoes
+
+    def _atualizar_orcamento(self, projeto: tuple, colunas: Dict, custos: Dict,
+                             plano_corte: Optional[Dict], risco: Optional[Dict], versao: str) -> tuple:
+        """Monta o orçamento recalculado mantendo as configurações originais
+
+        A simulação de risco salva é substituída pela dos novos preços, ou
+        removida se o projeto não usa o modo de risco.
+        """
+        engine = self.engine
+        projeto_id, nome_arquivo, componentes, orcamento, configuracoes = projeto
+        valor_anterior = float((orcamento.get('resumo') or {}).get('valor_final', 0.0))
+
+        resumo = engine.resumir_custos(colunas, custos, configuracoes.get('margem_lucro', 30) / 100)
+        orcamento.update({
+            'componentes': engine._detalhar_componentes(componentes, colunas, custos),
+            'resumo': resumo,
+            'materiais': engine.resumir_materiais(
+                colunas, custos, configuracoes.get('material', 'mdf_15mm'), plano_corte
+            ),
+            'plano_corte': plano_corte,
+            'risco': risco,
+            'configuracoes': configuracoes,
+            'data_calculo': datetime.now().strftime('%d/%m/%Y %H:%M'),
+            'fonte_precos': engine.obter_fonte_precos(),
+            'versao_catalogo': versao
+        })
+        if risco is None:
+            orcamento.pop('risco', None)
+
+        return projeto_id, nome_arquivo, valor_anterior, resumo['valor_final'], json.dumps(orcamento)
+
+    def _resumir_variacoes(self, ids: List[int], nomes: List[str], anteriores: List[float],
+                           novos: List[float], maiores: int = 10) -> Dict:
+        """Resumo das variações de preço entre os orçamentos antigos e os recalculados"""
+        if not ids:
+            return {
+                'valor_anterior_total': 0.0,
+                'valor_novo_total': 0.0,
+                'variacao_total': 0.0,
+                'variacao_pct': {},
+                'projetos_aumento': 0,
+                'projetos_reducao': 0,
+                'maiores_variacoes': []
+            }
+
+        anteriores = np.asarray(anteriores, dtype=np.float64)
+        novos = np.asarray(novos, dtype=np.float64)
+        diferencas = novos - anteriores
+        com_base = anteriores > 0
+        variacoes = np.divide(diferencas * 100, anteriores, out=np.zeros_like(diferencas), where=com_base)
+
+        ordem = np.argsort(-np.abs(diferencas))[:maiores]
+        validas = variacoes[com_base]
+
+        return {
+            'valor_anterior_total': round(float(anteriores.sum()), 2),
+            'valor_novo_total': round(float(novos.sum()), 2),
+            'variacao_total': round(float(diferencas.sum()), 2),
+            'variacao_pct': {
+                'media': round(float(validas.mean()), 2),
+                'p50': round(float(np.percentile(validas, 50)), 2),
+                'p90': round(float(np.percentile(validas, 90)), 2),
+                'minima': round(float(validas.min()), 2),
+                'maxima': round(float(validas.max()), 2)
+            } if len(validas) else {},
+            'projetos_aumento': int((diferencas > 0.005).sum()),
+            'projetos_reducao': int((diferencas < -0.005).sum()),
+            'maiores_variacoes': [
+                {
+                    'id': ids[i],
+                    'nome_arquivo': nomes[i],
+                    'valor_anterior': round(float(anteriores[i]), 2),
+                    'valor_novo': round(float(novos[i]), 2),
+                    'variacao_pct': round(float(variacoes[i]), 2)
+                }
+                for i in ordem.tolist()
+            ]
+        }
+
+
+def _fatiar(colunas: Dict, inicio: int, fim: int) -> Dict:
+    """Fatia as colunas (listas e arrays) de um lote; escalares são mantidos"""
+    return {
+        chave: valor[inicio:fim] if isinstance(valor, (list, np.ndarray)) else valor
+        for chave, valor in colunas.items()
+    }
+
+
+if __name__ == "__main__":
+    resumo = ReprecificadorProjetos(sys.argv[1] if len(sys.argv) > 1 else "usuarios.db").executar(
+        lambda progresso: print(f"{progresso['processados']}/{progresso['total']} projetos")
+    )
+    print(json.dumps(resumo, indent=2, ensure_ascii=False))
@@ -0,0 +1,64 @@
+"""
+Cache de Sessões - Orca Interiores SaaS
+Sessões validadas recentemente, em memória, na frente da tabela sessoes
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class CacheSessoes:
+    def __init__(self, capacidade: int = 10_000, ttl_s: float = 60.0):
+        """Cache LRU com expiração (TTL) de sessões já validadas no banco
+
+        Cada entrada guarda os dados do usuário da sessão até o menor entre
+        ttl_s e a expiração da própria sessão; depois disso a próxima validação
+        volta ao banco. O TTL curto limita por quanto tempo um logout feito em
+        outro processo ainda é aceito aqui. Acima da capacidade, saem as sessões
+        usadas há mais tempo.
+        """
+        self.capacidade = capacidade
+        self.ttl_s = ttl_s
+        self._entradas = OrderedDict()
+        self._trava = threading.Lock()
+
+    def obter(self, token: str) -> Optional[Dict]:
+        """Usuário da sessão em cache, ou None se ausente ou vencida"""
+        with self._trava:
+            entrada = self._entradas.get(token)
+            if entrada is None:
+                return None
+            usuario, vence_em = entrada
+            if vence_em <= time.time():
+                del self._entradas[token]
+                return None
+            self._entradas.move_to_end(token)
+        return dict(usuario)
+
+    def guardar(self, token: str, usuario: Dict, expiracao: float):
+        """Guarda a sessão validada; expiracao é o fim da sessão (epoch, em segundos)"""
+        vence_em = min(time.time() + self.ttl_s, expiracao)
+        with self._trava:
+            self._entradas[token] = (dict(usuario), vence_em)
+            self._entradas.move_to_end(token)
+            while len(self._entradas) > self.capacidade:
+                self._entradas.popitem(last=False)
+
+    def remover(self, token: str):
+        """Descarta a sessão do cache (logout)"""
+        with self._trava:
+            self._entradas.pop(token, None)
+
+    def remover_vencidas(self) -> int:
+        """Descarta as entradas vencidas e retorna quantas foram removidas"""
+        agora = time.time()
+        with self._trava:
+            vencidas = [token for token, (_, vence_em) in self._entradas.items() if vence_em <= agora]
+            for token in vencidas:
+                del self._entradas[token]
+        return len(vencidas)
+
+    def __len__(self) -> int:
+        return len(self._entradas)
@@ -0,0 +1,127 @@
+"""
+Pool de conexões do BancoDados: a conexão emprestada a uma thread volta ao
+pool quando ela termina e é reaproveitada pela próxima, sem reconectar, e
+fechar_todas fecha as emprestadas e as ociosas
+"""
+
+import gc
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from banco import BancoDados
+
+
+def _em_thread(banco: BancoDados):
+    """Conexão usada por uma thread de vida curta, como a de um rerun do Streamlit"""
+    usadas = []
+
+    def trabalhar():
+        conn = banco.conexao()
+        conn.execute("SELECT 1").fetchone()
+        usadas.append(conn)
+
+    thread = threading.Thread(target=trabalhar)
+    thread.start()
+    thread.join()
+    return usadas[0]
+
+
+def test_threads_seguidas_reaproveitam_a_conexao(tmp_path):
+    banco = BancoDados(str(tmp_path / 'teste.db'))
+    banco.conexao().execute("CREATE TABLE t (x INTEGER)")
+    primeira = _em_thread(banco)
+    gc.collect()
+    descritores = len(os.listdir('/proc/self/fd'))
+
+    usadas = {id(_em_thread(banco)) for _ in range(200)}
+    gc.collect()
+
+    assert usadas == {id(primeira)}
+    assert len(os.listdir('/proc/self/fd')) <= descritores
+    assert len(banco._conexoes) == 1
+    banco.fechar_todas()
+
+
+def test_pool_limita_conexoes_ociosas(tmp_path):
+    banco = BancoDados(str(tmp_path / 'teste.db'), tamanho_pool=2)
+    liberar = threading.Event()
+    abertas = threading.Barrier(6)
+    conexoes = []
+
+    def trabalhar():
+        conexoes.append(banco.conexao())
+        abertas.wait()
+        liberar.wait()
+
+    threads = [threading.Thread(target=trabalhar) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    abertas.wait()
+    liberar.set()
+    for thread in threads:
+        thread.join()
+    gc.collect()
+
+    assert len(banco._livres) == 2
+    fechadas = 0
+    for conn in conexoes:
+        try:
+            conn.execute("SELECT 1")
+        except sqlite3.ProgrammingError:
+            fechadas += 1
+    assert fechadas == 3
+    banco.fechar_todas()
+
+
+def test_transacao_aberta_nao_volta_ao_pool(tmp_path):
+    banco = BancoDados(str(tmp_path / 'teste.db'))
+    banco.conexao().execute("CREATE TABLE t (x INTEGER)")
+
+    def abandonar():
+        conn = banco.conexao()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("INSERT INTO t VALUES (1)")
+
+    thread = threading.Thread(target=abandonar)
+    thread.start()
+    thread.join()
+    gc.collect()
+
+    assert not any(conn.in_transaction for conn in banco._livres)
+    assert banco.conexao().execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    banco.fechar_todas()
+
+
+def test_fechar_todas_fecha_emprestadas_e_ociosas(tmp_path):
+    banco = BancoDados(str(tmp_path / 'teste.db'))
+    liberar = threading.Event()
+    abertas = threading.Barrier(4)
+
+    def trabalhar():
+        banco.conexao().execute("SELECT 1").fetchone()
+        abertas.wait()
+        liberar.wait()
+
+    threads = [threading.Thread(target=trabalhar) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    abertas.wait()
+    try:
+        ociosa = _em_thread(banco)
+        gc.collect()
+        assert banco._livres == [ociosa]
+        assert len(banco._conexoes) == 3
+        banco.fechar_todas()
+        assert len(banco._conexoes) == 0
+        assert not banco._livres
+        with pytest.raises(sqlite3.ProgrammingError):
+            ociosa.execute("SELECT 1")
+    finally:
+        liberar.set()
+        for thread in threads:
+            thread.join()
+    gc.collect()
+    assert not banco._livres
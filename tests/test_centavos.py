@@ -0,0 +1,146 @@
+"""
+Teste de propriedade do modo em centavos: totais do orçamento contra uma
+referência exata em Decimal, em projetos aleatórios de material único, de
+materiais mistos e com plano de corte
+"""
+
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, List
+
+import numpy as np
+import pytest
+
+from orcamento_engine import OrcamentoEngine
+
+CENTAVO = Decimal('0.01')
+MEDIDA = Decimal('0.0001')
+CHAVES = ['custo_material', 'custo_acessorios', 'custo_corte', 'subtotal', 'valor_lucro', 'valor_final']
+
+
+def _reais(valor) -> Decimal:
+    return Decimal(str(valor))
+
+
+def _medida(valor: float) -> Decimal:
+    """Medida quantizada em 0,0001 a partir do valor binário exato do float"""
+    return Decimal(valor).quantize(MEDIDA, ROUND_HALF_UP)
+
+
+def _area_paineis(dimensoes: List[float], espessura_maxima: float) -> float:
+    """Área (m²) dos painéis de um componente, pela mesma decomposição do plano de corte"""
+    a, b, c = sorted((abs(d) for d in dimensoes), reverse=True)
+    if c <= espessura_maxima:
+        return a * b / 1_000_000
+    return 2 * (a * b + a * c + b * c) / 1_000_000
+
+
+def orcamento_decimal(engine: OrcamentoEngine, componentes: List[Dict], configuracoes: Dict,
+                       plano_corte: Dict = None) -> Dict[str, Decimal]:
+    """Referência em Decimal da política de arredondamento do modo em centavos
+
+    Cada valor por componente é arredondado uma vez em centavos, metade para
+    cima. O material de cada componente é o do modelo quando está no catálogo
+    e o das configurações nos demais casos; com plano de corte, o desperdício
+    é o real do plano do material e incide sobre a área dos painéis.
+    """
+    material_padrao = configuracoes['material']
+    qualidade = configuracoes['qualidade_acessorios']
+    corte_reto = _reais(engine.custos_mao_obra['corte_reto'])
+    taxa_minima = _reais(engine.custos_mao_obra['taxa_minima'])
+    multiplicador = _reais(engine.multiplicadores_complexidade[configuracoes['complexidade']])
+    planos = {}
+    if plano_corte:
+        planos = plano_corte.get('por_material') or {plano_corte['material']: plano_corte}
+
+    totais = dict.fromkeys(['custo_material', 'custo_acessorios', 'custo_corte', 'subtotal'], Decimal(0))
+    for comp in componentes:
+        material = comp.get('material_modelo')
+        if material not in engine.precos_materiais:
+            material = material_padrao
+        preco = _reais(engine.precos_materiais[material])
+
+        area_float = max(comp['area_m2'], 0.1)
+        if material in planos:
+            desperdicio = _reais(planos[material]['fator_desperdicio'])
+            area = _medida(_area_paineis(comp['dimensoes_mm'], engine.espessura_maxima_painel_mm))
+        else:
+            desperdicio = _reais(engine.desperdicio[material])
+            area = _medida(area_float)
+        perimetro = _medida(comp.get('perimetro_m', 8 * area_float ** 0.5))
+        quantidade = comp.get('quantidade', 1)
+        itens = engine.custos_acessorios.get(comp['tipo'], {}).get(qualidade, {})
+
+        material_c = (area * quantidade * preco * (1 + desperdicio)).quantize(CENTAVO, ROUND_HALF_UP)
+        acessorios_c = sum((_reais(valor) for valor in itens.values()), Decimal(0)) * quantidade
+        corte_c = (max(perimetro * corte_reto, taxa_minima) * quantidade).quantize(CENTAVO, ROUND_HALF_UP)
+        total_c = ((material_c + acessorios_c + corte_c) * multiplicador).quantize(CENTAVO, ROUND_HALF_UP)
+
+        totais['custo_material'] += material_c
+        totais['custo_acessorios'] += acessorios_c
+        totais['custo_corte'] += corte_c
+        totais['subtotal'] += total_c
+
+    margem = Decimal(configuracoes['margem_lucro'])
+    totais['valor_lucro'] = (totais['subtotal'] * margem / 100).quantize(CENTAVO, ROUND_HALF_UP)
+    totais['valor_final'] = totais['subtotal'] + totais['valor_lucro']
+    return totais
+
+
+def _projeto_aleatorio(rng: np.random.Generator, engine: OrcamentoEngine, max_componentes: int,
+                       mistos: bool) -> List[Dict]:
+    """Componentes com tipos, áreas, quantidades, perímetros e dimensões aleatórios
+
+    Em projetos mistos o material do modelo é um do catálogo ou um nome que
+    nenhuma regra reconhece (fica com o material das configurações).
+    """
+    tipos = list(engine.codigos_tipos) + ['desconhecido']
+    materiais = list(engine.codigos_materiais) + ['acabamento_x', 'sem_regra_y']
+    n = int(rng.integers(1, max_componentes))
+    componentes = []
+    for _ in range(n):
+        espessura = float(rng.choice([15.0, 18.0, rng.uniform(61, 600)]))
+        comp = {
+            'nome': 'componente',
+            'tipo': str(rng.choice(tipos)),
+            'area_m2': float(rng.uniform(0.01, 6.0)),
+            'quantidade': int(rng.integers(1, 5)),
+            'dimensoes_mm': [float(rng.uniform(100, 1800)), float(rng.uniform(100, 900)), espessura]
+        }
+        if rng.random() < 0.5:
+            comp['perimetro_m'] = float(rng.uniform(0.5, 20))
+        if mistos:
+            comp['material_modelo'] = str(rng.choice(materiais))
+        componentes.append(comp)
+    return componentes
+
+
+@pytest.mark.parametrize('mistos, usar_plano_corte, projetos, max_componentes', [
+    (False, False, 150, 3000),
+    (True, False, 100, 2000),
+    (False, True, 40, 150),
+    (True, True, 40, 150),
+])
+def test_centavos_batem_com_referencia_decimal(mistos, usar_plano_corte, projetos, max_componentes):
+    engine = OrcamentoEngine()
+    rng = np.random.default_rng(42)
+
+    for _ in range(projetos):
+        componentes = _projeto_aleatorio(rng, engine, max_componentes, mistos)
+        configuracoes = {
+            'material': str(rng.choice(list(engine.codigos_materiais))),
+            'qualidade_acessorios': str(rng.choice(list(engine.codigos_qualidades))),
+            'complexidade': str(rng.choice(list(engine.multiplicadores_complexidade))),
+            'margem_lucro': int(rng.integers(10, 51)),
+            'usar_plano_corte': usar_plano_corte,
+            'centavos': True
+        }
+
+        orcamento = engine.calcular_orcamento_colunar({'componentes': componentes}, configuracoes)
+        referencia = orcamento_decimal(engine, componentes, configuracoes, orcamento['plano_corte'])
+
+        resumo = orcamento['resumo']
+        divergentes = {
+            chave: (resumo[chave], str(referencia[chave]))
+            for chave in CHAVES if Decimal(str(resumo[chave])) != referencia[chave]
+        }
+        assert not divergentes, f"{len(componentes)} componentes, {configuracoes}: {divergentes}"
@@ -0,0 +1,90 @@
+"""
+Reprecificação em lote: depois de mudar o catálogo, cada projeto salvo fica
+igual a um orçamento novo calculado com os novos preços, inclusive o bloco de
+risco e o plano de corte
+"""
+
+import json
+import os
+
+import pytest
+
+from auth_manager import AuthManager
+from catalogo_precos import CAMINHO_PADRAO, CatalogoPrecos
+from file_analyzer import FileAnalyzer
+from orcamento_engine import OrcamentoEngine
+from reprecificacao import ReprecificadorProjetos
+
+COZINHA = os.path.join(os.path.dirname(CAMINHO_PADRAO), 'cozinha_teste.obj')
+
+CONFIGURACOES = [
+    {'material': 'mdf_15mm', 'qualidade_acessorios': 'comum', 'complexidade': 'media', 'margem_lucro': 30},
+    {'material': 'mdf_15mm', 'qualidade_acessorios': 'comum', 'complexidade': 'media', 'margem_lucro': 30,
+     'modo_risco': True, 'amostras_risco': 2000},
+    {'material': 'melamina_18mm', 'qualidade_acessorios': 'premium', 'complexidade': 'complexa', 'margem_lucro': 25,
+     'usar_plano_corte': True},
+    {'material': 'compensado_18mm', 'qualidade_acessorios': 'premium', 'complexidade': 'simples', 'margem_lucro': 40,
+     'usar_plano_corte': True, 'modo_risco': True, 'amostras_risco': 2000, 'centavos': True},
+    {'material': 'mdf_18mm', 'qualidade_acessorios': 'comum', 'complexidade': 'premium', 'margem_lucro': 35,
+     'centavos': True}
+]
+
+
+def _reajustar(valores, fator: float):
+    """Preços (números nas folhas) multiplicados por fator"""
+    if isinstance(valores, dict):
+        return {chave: _reajustar(valor, fator) for chave, valor in valores.items()}
+    return round(valores * fator, 2)
+
+
+@pytest.fixture
+def ambiente(tmp_path):
+    with open(CAMINHO_PADRAO, encoding='utf-8') as arquivo:
+        dados = json.load(arquivo)
+    caminho_catalogo = str(tmp_path / 'catalogo_precos.json')
+    with open(caminho_catalogo, 'w', encoding='utf-8') as arquivo:
+        json.dump(dados, arquivo)
+
+    engine = OrcamentoEngine(CatalogoPrecos(caminho_catalogo))
+    db_path = str(tmp_path / 'usuarios.db')
+    auth = AuthManager(db_path)
+    auth.criar_usuarios_demo()
+    yield engine, auth, db_path, dados
+    auth.banco.fechar_todas()
+
+
+def test_projetos_reprecificados_batem_com_orcamento_novo(ambiente):
+    engine, auth, db_path, dados = ambiente
+    usuario = auth.fazer_login('demo@orcainteriores.com', 'demo123')
+    with open(COZINHA, 'rb') as arquivo:
+        analise = FileAnalyzer()._analisar_obj(arquivo.read(), 'cozinha_teste.obj')
+
+    ids = []
+    for i, configuracoes in enumerate(CONFIGURACOES):
+        orcamento = engine.calcular_orcamento_completo(analise, configuracoes)
+        salvo = auth.salvar_projeto_com_cota(usuario['id'], f'projeto_{i}.obj', analise, orcamento)
+        assert salvo['salvo']
+        ids.append(salvo['projeto_id'])
+
+    versao_anterior = engine.versao_catalogo
+    for secao in ('materiais', 'acessorios', 'mao_obra'):
+        dados[secao] = _reajustar(dados[secao], 1.1)
+    assert engine.catalogo.publicar(dados)
+    assert engine.versao_catalogo != versao_anterior
+
+    resumo = ReprecificadorProjetos(db_path, engine).executar()
+    assert resumo['reprecificados'] == len(CONFIGURACOES)
+
+    for projeto_id, configuracoes in zip(ids, CONFIGURACOES):
+        projeto = auth.carregar_projeto(projeto_id, usuario['id'])
+        reprecificado = projeto['orcamento']
+        novo = engine.calcular_orcamento_completo(projeto['analise'], configuracoes)
+
+        assert reprecificado['versao_catalogo'] == novo['versao_catalogo']
+        assert reprecificado['resumo'] == pytest.approx(novo['resumo'])
+        assert reprecificado['materiais'] == json.loads(json.dumps(novo['materiais']))
+        assert reprecificado['plano_corte'] == json.loads(json.dumps(novo['plano_corte']))
+        if configuracoes.get('modo_risco'):
+            assert reprecificado['risco'] == json.loads(json.dumps(novo['risco']))
+        else:
+            assert 'risco' not in reprecificado
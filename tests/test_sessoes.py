@@ -0,0 +1,37 @@
+"""
+Sessões: o token não sai do servidor e o ticket da URL vale uma única vez
+"""
+
+from auth_manager import AuthManager
+
+
+def _sessao(tmp_path):
+    auth = AuthManager(str(tmp_path / 'usuarios.db'))
+    auth.criar_usuarios_demo()
+    usuario = auth.fazer_login('demo@orcainteriores.com', 'demo123')
+    return auth, auth.criar_sessao(usuario['id'])
+
+
+def test_ticket_troca_uma_unica_vez(tmp_path):
+    auth, token = _sessao(tmp_path)
+    ticket = auth.criar_ticket(token)
+
+    assert auth.validar_sessao(ticket) is None
+    novo_token, novo_ticket = auth.trocar_ticket(ticket)
+    assert auth.trocar_ticket(ticket) is None
+    assert auth.validar_sessao(novo_token)['email'] == 'demo@orcainteriores.com'
+
+    auth.cache_sessoes.remover(token)
+    assert auth.validar_sessao(token) is None
+    auth.banco.fechar_todas()
+
+
+def test_logout_invalida_ticket(tmp_path):
+    auth, token = _sessao(tmp_path)
+    ticket = auth.criar_ticket(token)
+
+    auth.encerrar_sessao(token)
+
+    assert auth.trocar_ticket(ticket) is None
+    assert auth.criar_ticket(token) is None
+    auth.banco.fechar_todas()
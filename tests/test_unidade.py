@@ -0,0 +1,69 @@
+"""
+Inferência da unidade do modelo (FileAnalyzer._inferir_unidade): o mesmo
+projeto em metros, centímetros e milímetros dá as mesmas medidas, e uma
+unidade explícita tem precedência
+"""
+
+import os
+import re
+
+import numpy as np
+import pytest
+
+from file_analyzer import FileAnalyzer
+
+COZINHA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cozinha_teste.obj')
+
+
+def _cozinha(fator: float = 1.0) -> bytes:
+    """cozinha_teste.obj (em metros) com as coordenadas multiplicadas por fator"""
+    with open(COZINHA, 'rb') as arquivo:
+        texto = arquivo.read().decode('utf-8')
+
+    def escalar(linha):
+        return 'v ' + ' '.join(repr(float(valor) * fator) for valor in linha.group(1).split())
+
+    return re.sub(r'^v (.+)$', escalar, texto, flags=re.MULTILINE).encode('utf-8')
+
+
+def _medidas(analise):
+    return [(comp['nome'], comp['area_m2'], comp['dimensoes_mm']) for comp in analise['componentes']]
+
+
+@pytest.fixture
+def analisador():
+    return FileAnalyzer()
+
+
+def test_cozinha_teste_em_metros(analisador):
+    analise = analisador._analisar_obj(_cozinha(), 'cozinha_teste.obj')
+
+    assert analise['unidade'] == {'unidade': 'm', 'escala_m': 1.0, 'inferida': True}
+    assert [comp['dimensoes_mm'][0] for comp in analise['componentes']] == [2000.0, 2000.0, 800.0]
+
+
+@pytest.mark.parametrize('unidade, fator', [('mm', 1000.0), ('cm', 100.0)])
+def test_mesmo_projeto_em_outras_unidades(analisador, unidade, fator):
+    referencia = analisador._analisar_obj(_cozinha(), 'cozinha_teste.obj')
+
+    analise = analisador._analisar_obj(_cozinha(fator), 'cozinha_teste.obj')
+
+    assert analise['unidade']['unidade'] == unidade
+    assert analise['unidade']['inferida']
+    for (nome, area, dimensoes), (nome_ref, area_ref, dimensoes_ref) in zip(_medidas(analise), _medidas(referencia)):
+        assert nome == nome_ref
+        assert area == pytest.approx(area_ref)
+        assert dimensoes == pytest.approx(dimensoes_ref)
+
+
+def test_unidade_explicita_tem_precedencia(analisador):
+    analise = analisador._analisar_obj(_cozinha(), 'cozinha_teste.obj', 'mm')
+
+    assert analise['unidade'] == {'unidade': 'mm', 'escala_m': 0.001, 'inferida': False}
+    assert [comp['dimensoes_mm'][0] for comp in analise['componentes']] == pytest.approx([2.0, 2.0, 0.8])
+
+
+def test_sem_dimensoes_usa_milimetros(analisador):
+    vazio = np.zeros((0, 3))
+
+    assert analisador._inferir_unidade((vazio, vazio)) == {'unidade': 'mm', 'escala_m': 0.001, 'inferida': False}
@@ -0,0 +1,112 @@
+"""
+Validação e reparo da malha (FileAnalyzer._validar_malha): vértices NaN,
+índices negativos ou fora dos limites, faces degeneradas e duplicadas
+"""
+
+import math
+
+import pytest
+
+from file_analyzer import FileAnalyzer
+
+# Quadrado unitário no plano z = 0 e um quinto vértice colinear com os dois primeiros
+VERTICES = [[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [1.0, 1.0, 0.0], [0.0, 1.0, 0.0], [2.0, 0.0, 0.0]]
+
+
+@pytest.fixture
+def analisador():
+    return FileAnalyzer()
+
+
+def _validar(analisador, vertices, faces, objetos=None):
+    return analisador._validar_malha(vertices, faces, objetos or [])
+
+
+def test_malha_valida_fica_intacta(analisador):
+    faces = [[0, 1, 2], [0, 2, 3]]
+
+    vertices, coords, saida, relatorio = _validar(analisador, VERTICES, faces)
+
+    assert saida == faces
+    assert vertices == VERTICES
+    assert coords.shape == (5, 3)
+    assert relatorio['faces_removidas'] == 0
+    assert not relatorio['reparada']
+
+
+def test_vertice_nan_sai_e_indices_sao_remapeados(analisador):
+    vertices = [[math.nan, 0.0, 0.0]] + VERTICES
+    faces = [[0, 1, 2], [1, 2, 3], [1, 3, 4]]
+
+    vertices, coords, saida, relatorio = _validar(analisador, vertices, faces)
+
+    assert relatorio['vertices_invalidos'] == 1
+    assert relatorio['faces_fora_limite'] == 1
+    assert vertices == VERTICES
+    assert saida == [[0, 1, 2], [0, 2, 3]]
+    assert relatorio['reparada']
+
+
+@pytest.mark.parametrize('face', [[0, -1, 2], [0, 1, 5], [0, 1, 2, 99]])
+def test_indices_negativos_ou_fora_dos_limites(analisador, face):
+    _, _, saida, relatorio = _validar(analisador, VERTICES, [[0, 1, 2], face])
+
+    assert relatorio['faces_fora_limite'] == 1
+    assert saida == [[0, 1, 2]]
+
+
+@pytest.mark.parametrize('face', [[0, 1, 1], [2, 2, 2], [0, 1, 4]])
+def test_faces_degeneradas(analisador, face):
+    _, _, saida, relatorio = _validar(analisador, VERTICES, [[0, 1, 2], face])
+
+    assert relatorio['faces_degeneradas'] == 1
+    assert saida == [[0, 1, 2]]
+
+
+def test_faces_duplicadas_em_qualquer_orientacao(analisador):
+    faces = [[0, 1, 2], [2, 1, 0], [1, 2, 0], [0, 2, 3], [0, 1, 2, 3], [3, 2, 1, 0]]
+
+    _, _, saida, relatorio = _validar(analisador, VERTICES, faces)
+
+    assert relatorio['faces_duplicadas'] == 3
+    assert saida == [[0, 1, 2], [0, 2, 3], [0, 1, 2, 3]]
+
+
+def test_intervalos_dos_objetos_sao_ajustados(analisador):
+    vertices = VERTICES + [[math.nan] * 3, [0.0, 0.0, 1.0], [1.0, 0.0, 1.0], [1.0, 1.0, 1.0]]
+    faces = [[0, 1, 2], [0, 1, 2], [6, 7, 8], [5, 6, 7]]
+    objetos = [
+        {'inicio_vertice': 0, 'fim_vertice': 5, 'inicio_face': 0, 'fim_face': 2},
+        {'inicio_vertice': 5, 'fim_vertice': 9, 'inicio_face': 2, 'fim_face': 4}
+    ]
+
+    vertices, _, saida, _ = _validar(analisador, vertices, faces, objetos)
+
+    assert len(vertices) == 8
+    assert saida == [[0, 1, 2], [5, 6, 7]]
+    assert [(obj['inicio_vertice'], obj['fim_vertice']) for obj in objetos] == [(0, 5), (5, 8)]
+    assert [(obj['inicio_face'], obj['fim_face']) for obj in objetos] == [(0, 1), (1, 2)]
+
+
+def test_obj_com_vertice_invalido_e_indice_relativo_fora(analisador):
+    conteudo = b"""o Painel
+v 0 0 0
+v 1000 0 0
+v 1000 500 0
+v nao_numero 0 0
+v 0 500 0
+f 1 2 3
+f 1 3 5
+f 1 2 4
+f 1 2 -10
+f 1 2 3
+"""
+
+    analise = analisador._analisar_obj(conteudo, 'painel.obj', 'mm')
+
+    validacao = analise['validacao']
+    assert validacao['vertices_invalidos'] == 1
+    assert validacao['faces_fora_limite'] == 2
+    assert validacao['faces_duplicadas'] == 1
+    assert analise['total_vertices'] == 4
+    assert analise['total_faces'] == 2